@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import CONFIG
+from .mt5_api import mt5
+from .mt5_utils import get_mt5_current_time, positions_snapshot, deal_confirmations, POSITION_CLOSED
+from .execution import stop_manager
+from .risk import update_daily_pnl_from_closed_deals, check_daily_limits, equity_monitor
+from .portfolio import PortfolioRunner
+from .metrics import CycleTimer, register_gauge
+
+# Asyncio engine: candle-close signal evaluation and a fast position task run concurrently
+# on top of the PortfolioRunner state.
+#
+# The MetaTrader5 package is not thread-safe, so every blocking MT5 call runs on one
+# dedicated executor thread; the event loop only schedules work and sleeps. The position
+# task polls every TICK_INTERVAL_MS while positions are open (trailing stops coalesced by
+# execution.stop_manager, equity monitor, daily limit re-check after a close) and idles
+# on an event while the book is flat.
+
+class AsyncEngine:
+    """Runs a PortfolioRunner with a candle task and a tick-driven position task."""
+
+    def __init__(self, runner=None, tick_interval_ms=None):
+        self.runner = runner or PortfolioRunner()
+        self.tick_interval = (tick_interval_ms if tick_interval_ms is not None else CONFIG.TICK_INTERVAL_MS) / 1000.0
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mt5')
+        self.tick_cycles = 0
+        self.stop_updates = 0
+        self._book_changed = None
+        self._last_tick_msc = {} # symbol -> time_msc of the last tick used for its trailing stop
+        self.pending_calls = 0 # MT5 calls queued on or running in the executor
+        self.tick_timer = CycleTimer('async_tick')
+        # Own cursor on the position events: closes detected by the candle cycle's refresh count too
+        self._events_cursor = positions_snapshot.sequence
+
+    async def call(self, func, *args):
+        """Runs a blocking (MT5) function on the executor thread."""
+        self.pending_calls += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending_calls -= 1
+
+    async def run(self):
+        self._book_changed = asyncio.Event()
+        register_gauge('mt5_executor_queue_depth', lambda: self.pending_calls, "MT5 calls queued on or running in the executor.")
+        try:
+            if not await self.call(self.runner.setup):
+                logging.error("No tradable instruments configured. Exiting.")
+                return
+            logging.info(f"🚀 Async engine started. Position task interval: {self.tick_interval * 1000:.0f} ms.")
+            await asyncio.gather(self._candle_task(), self._tick_task())
+        finally:
+            self.executor.shutdown(wait=False)
+
+    async def _candle_task(self):
+        while True:
+            try:
+                await self.call(self._candle_cycle)
+                self._book_changed.set()
+                await asyncio.sleep(self.runner.seconds_until_next_candle(get_mt5_current_time()))
+            except Exception as e:
+                logging.error(f"An unexpected error occurred in the candle task: {e}")
+                logging.error(f"Traceback:\n{traceback.format_exc()}")
+                await asyncio.sleep(60) # Sleep longer on error to prevent rapid failures
+
+    async def _tick_task(self):
+        while True:
+            try:
+                # Cleared before the cycle so a trade opened by a concurrent candle cycle is not missed
+                self._book_changed.clear()
+                if await self.call(self._tick_cycle):
+                    await asyncio.sleep(self.tick_interval)
+                else:
+                    # Flat book: nothing to manage until the candle task may have opened a trade
+                    await self._book_changed.wait()
+            except Exception as e:
+                logging.error(f"An unexpected error occurred in the tick task: {e}")
+                logging.error(f"Traceback:\n{traceback.format_exc()}")
+                await asyncio.sleep(max(self.tick_interval, 1.0))
+
+    def _candle_cycle(self):
+        self.runner.run_cycle(get_mt5_current_time())
+
+    def _tick_cycle(self):
+        """Manages open positions at the current tick. Returns True while positions or deal confirmations are open."""
+        runner = self.runner
+        self.tick_timer.start()
+        self.tick_timer.stage('positions_snapshot')
+        runner.load_positions()
+        events, self._events_cursor = positions_snapshot.events_since(self._events_cursor)
+        self.tick_cycles += 1
+
+        if any(event.kind == POSITION_CLOSED for event in events):
+            # A position was closed (SL/TP or manually): realized P/L changed, re-check the daily limits
+            update_daily_pnl_from_closed_deals(runner.magic_numbers)
+            runner.limits_reached = check_daily_limits({})
+        if CONFIG.EQUITY_MONITOR_ENABLED and equity_monitor.update():
+            runner.limits_reached = True
+
+        self.tick_timer.stage('trailing_stops')
+        if CONFIG.ENABLE_TRAILING_STOP:
+            for instrument in runner.instruments:
+                position = instrument.position
+                if position is None or not instrument.engine.ready:
+                    continue
+                tick = mt5.symbol_info_tick(instrument.symbol)
+                if tick is None or self._last_tick_msc.get(instrument.symbol) == tick.time_msc:
+                    continue
+                self._last_tick_msc[instrument.symbol] = tick.time_msc
+                current_price = tick.bid if position.type == mt5.ORDER_TYPE_SELL else tick.ask
+                stop_manager.submit(position, instrument.symbol_info, current_price, instrument.engine.last_bar['atr'])
+            # Throttled targets are retried here even when no tick changed
+            self.stop_updates += stop_manager.flush(positions_snapshot.by_ticket)
+        self.tick_timer.finish()
+        # Pending deal confirmations keep the tick task polling even with a flat book
+        return len(positions_snapshot) > 0 or len(deal_confirmations) > 0
+
+def run_async_engine():
+    """Entry point of the asyncio engine; expects MT5 to be initialized."""
+    asyncio.run(AsyncEngine().run())
@@ -0,0 +1,319 @@
+import argparse
+import contextlib
+import datetime
+import logging
+import math
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from .config import CONFIG
+from .constants import SIGNAL_HOLD, SIGNAL_BUY, SIGNAL_SELL
+from . import execution, risk
+from .mt5_api import use_backend
+from .mt5_utils import invalidate_cache
+from .execution import execute_trade, update_trailing_stop
+from .risk import daily_profit_loss, check_daily_limits, check_atr_for_trade
+from .sim_broker import SimulatedBroker, make_symbol_info, DEAL_ENTRY_OUT, DEAL_REASON_SL, DEAL_REASON_TP, POSITION_TYPE_SELL
+from .strategy import evaluate_signal, sma_crossover
+from .streaming_indicators import IndicatorEngine
+from .trade_logger import TradeCsvLogger
+
+SECONDS_PER_DAY = 86400
+
+def load_ohlcv(source, sep=','):
+    """
+    Loads OHLCV bars from a CSV or Parquet file (or an existing DataFrame).
+    Column names are matched case-insensitively and MT5 export headers such as
+    <DATE>, <TIME>, <TICKVOL> are understood. `time` may be epoch seconds or a
+    datetime string. Returns a dict of contiguous numpy arrays sorted by time.
+    """
+    if isinstance(source, pd.DataFrame):
+        df = source.reset_index()
+    elif str(source).lower().endswith(('.parquet', '.pq')):
+        df = pd.read_parquet(source)
+    else:
+        df = pd.read_csv(source, sep=sep)
+
+    df.columns = [str(col).strip().strip('<>').lower() for col in df.columns]
+    df = df.rename(columns={'tickvol': 'tick_volume', 'vol': 'tick_volume', 'volume': 'tick_volume'})
+    if 'date' in df.columns and 'time' in df.columns:
+        df['time'] = df['date'].astype(str) + ' ' + df['time'].astype(str)
+    elif 'time' not in df.columns:
+        for candidate in ('date', 'datetime', 'timestamp'):
+            if candidate in df.columns:
+                df['time'] = df[candidate]
+                break
+        else:
+            raise ValueError("OHLCV data needs a 'time' (or 'date') column.")
+
+    missing = [col for col in ('open', 'high', 'low', 'close') if col not in df.columns]
+    if missing:
+        raise ValueError(f"OHLCV data is missing columns: {', '.join(missing)}")
+
+    if pd.api.types.is_numeric_dtype(df['time']):
+        times = df['time'].to_numpy(dtype=np.int64)
+    else:
+        times = pd.to_datetime(df['time']).to_numpy(dtype='datetime64[s]').astype(np.int64)
+
+    order = np.argsort(times, kind='stable')
+    bars = {'time': np.ascontiguousarray(times[order])}
+    for col in ('open', 'high', 'low', 'close'):
+        bars[col] = np.ascontiguousarray(df[col].to_numpy(dtype=np.float64)[order])
+    if 'tick_volume' in df.columns:
+        bars['tick_volume'] = np.ascontiguousarray(df['tick_volume'].to_numpy(dtype=np.float64)[order])
+    else:
+        bars['tick_volume'] = np.zeros(len(times))
+    return bars
+
+class _NullTradeLogger:
+    """Discards trade events; used when a backtest should not write a CSV log."""
+    def log_trade_event(self, *args, **kwargs):
+        pass
+
+@contextlib.contextmanager
+def use_broker(broker, trade_logger=None):
+    """
+    Temporarily installs `broker` as the MT5 backend (see mt5_api) and routes the
+    trade CSV logging of execution and risk to `trade_logger` (discarded if None).
+    The mt5_utils read cache is off meanwhile: simulated time does not follow its TTLs;
+    neither is the MT5 call instrumentation, which would only time the simulator.
+    """
+    trade_logger = trade_logger or _NullTradeLogger()
+    saved_loggers = [(module, module.trade_csv_logger) for module in (execution, risk)]
+    previous_backend = use_backend(broker)
+    invalidate_cache()
+    try:
+        for module, _ in saved_loggers:
+            module.trade_csv_logger = trade_logger
+        with config_overrides({'MT5_CACHE_TTL_MS': {}, 'MT5_INSTRUMENTATION': False}):
+            yield broker
+    finally:
+        use_backend(previous_backend)
+        invalidate_cache()
+        for module, original in saved_loggers:
+            module.trade_csv_logger = original
+
+@contextlib.contextmanager
+def config_overrides(overrides):
+    """Temporarily replaces CONFIG values, e.g. {'SMA_FAST_LENGTH': 8}."""
+    saved = {key: CONFIG._config_data.get(key) for key in overrides}
+    try:
+        CONFIG._config_data.update(overrides)
+        yield CONFIG
+    finally:
+        CONFIG._config_data.update(saved)
+
+def max_drawdown(equity):
+    """Largest peak-to-trough decline of an equity curve, in account currency."""
+    equity = np.asarray(equity, dtype=np.float64)
+    if equity.size == 0:
+        return 0.0
+    return float(np.max(np.maximum.accumulate(equity) - equity))
+
+def sharpe_ratio(returns, periods_per_year=252):
+    """Annualized Sharpe ratio of periodic returns (risk-free rate 0)."""
+    returns = np.asarray(returns, dtype=np.float64)
+    if returns.size < 2:
+        return 0.0
+    std = returns.std(ddof=1)
+    if std == 0 or not np.isfinite(std):
+        return 0.0
+    return float(returns.mean() / std * math.sqrt(periods_per_year))
+
+def summarize(trade_profits, equity_curve, daily_returns, initial_balance):
+    """Summary statistics shared by the event-driven and vectorized backtests."""
+    trade_profits = np.asarray(trade_profits, dtype=np.float64)
+    wins = trade_profits[trade_profits > 0]
+    losses = trade_profits[trade_profits < 0]
+    gross_loss = -losses.sum()
+    return {
+        'net_profit': float(trade_profits.sum()),
+        'return_percent': float(trade_profits.sum() / initial_balance * 100) if initial_balance else 0.0,
+        'trades': int(trade_profits.size),
+        'win_rate': float(wins.size / trade_profits.size * 100) if trade_profits.size else 0.0,
+        'profit_factor': float(wins.sum() / gross_loss) if gross_loss > 0 else (math.inf if wins.size else 0.0),
+        'max_drawdown': max_drawdown(equity_curve),
+        'sharpe': sharpe_ratio(daily_returns),
+    }
+
+def daily_returns(equity_times, equity_curve, initial_balance):
+    """Day-over-day returns of a balance curve sampled at `equity_times` (epoch seconds)."""
+    if len(equity_curve) == 0:
+        return np.empty(0)
+    days = np.asarray(equity_times, dtype=np.int64) // SECONDS_PER_DAY
+    balances = np.asarray(equity_curve, dtype=np.float64)
+    last_of_day = np.append(days[1:] != days[:-1], True)
+    daily_close = np.concatenate(([initial_balance], balances[last_of_day]))
+    return np.diff(daily_close) / daily_close[:-1]
+
+class BacktestResult:
+    """Closed trades, balance curve and summary statistics of a backtest run."""
+
+    def __init__(self, trades, equity_times, equity_curve, initial_balance, bars, elapsed_seconds):
+        self.trades = trades
+        self.equity_times = equity_times
+        self.equity_curve = equity_curve
+        self.initial_balance = initial_balance
+        self.bars = bars
+        self.elapsed_seconds = elapsed_seconds
+        self.stats = summarize([t['profit'] for t in trades], [initial_balance] + equity_curve,
+                               daily_returns(equity_times, equity_curve, initial_balance), initial_balance)
+
+    def trades_dataframe(self):
+        return pd.DataFrame(self.trades)
+
+    def report(self):
+        stats = self.stats
+        lines = [
+            f"Bars: {self.bars} in {self.elapsed_seconds:.2f}s ({self.bars / max(self.elapsed_seconds, 1e-9):,.0f} bars/s)",
+            f"Trades: {stats['trades']} | Win rate: {stats['win_rate']:.1f}% | Profit factor: {stats['profit_factor']:.2f}",
+            f"Net profit: {stats['net_profit']:.2f} ({stats['return_percent']:.2f}%) | Max drawdown: {stats['max_drawdown']:.2f} | Sharpe: {stats['sharpe']:.2f}",
+        ]
+        return '\n'.join(lines)
+
+def run_backtest(bars, symbol_info=None, initial_balance=10000.0, spread_points=None, trade_log_file=None):
+    """
+    Replays `bars` (see load_ohlcv) through the live decision code, one candle at a time.
+
+    Each bar runs the same stages as main.main_loop at the candle open: daily limits
+    (risk.check_daily_limits), trailing stop management (execution.update_trailing_stop)
+    or signal evaluation (strategy.evaluate_signal) on the closed bars, the ATR check,
+    and order placement through execution.execute_trade, which sizes the trade with
+    calculate_dynamic_tp_sl and calculate_position_size. Orders fill at the bar open on a
+    SimulatedBroker; SL/TP are then executed against the bar's high/low.
+    Indicators are updated incrementally, so each bar costs O(1).
+    """
+    symbol_info = symbol_info or make_symbol_info(CONFIG.SYMBOL)
+    spread = symbol_info.spread if spread_points is None else spread_points
+    broker = SimulatedBroker(symbol_info, initial_balance)
+    engine = IndicatorEngine()
+    trade_logger = TradeCsvLogger(trade_log_file) if trade_log_file else None
+
+    times = bars['time'].tolist()
+    opens = bars['open'].tolist()
+    highs = bars['high'].tolist()
+    lows = bars['low'].tolist()
+    closes = bars['close'].tolist()
+
+    trades = []
+    equity_times = []
+    equity_curve = []
+    open_entries = {}
+    current_day = None
+    limits_state = None # (daily P/L, result) of the last check_daily_limits call
+    processed_deals = 0
+    symbol = symbol_info.name
+    magic = CONFIG.MAGIC_NUMBER
+    saved_daily_pnl = daily_profit_loss[0]
+
+    set_price = broker.set_price
+    update_indicators = engine.update
+
+    started = time.perf_counter()
+    with use_broker(broker, trade_logger):
+        daily_profit_loss[0] = 0.0
+        for i in range(len(times)):
+            bar_time = times[i]
+            set_price(bar_time, opens[i], spread)
+
+            # --- 1. Daily P/L Management & Limits ---
+            day = bar_time // SECONDS_PER_DAY
+            if day != current_day:
+                current_day = day
+                daily_profit_loss[0] = 0.0
+                limits_state = None
+
+            # Only re-check the limits when the daily P/L moved; the result cannot change otherwise.
+            if limits_state is None or limits_state[0] != daily_profit_loss[0]:
+                limits_state = (daily_profit_loss[0], check_daily_limits({}))
+            limit_reached = limits_state[1]
+
+            if engine.ready:
+                current_atr = engine.last_bar['atr']
+                positions = broker.positions_get(symbol=symbol) if broker.positions else ()
+                if positions:
+                    # --- 3. Manage Open Positions ---
+                    position = positions[0]
+                    current_price = broker.bid if position.type == POSITION_TYPE_SELL else broker.ask
+                    update_trailing_stop(position, symbol_info, current_price, current_atr)
+                elif not limit_reached and any(sma_crossover(engine.last_bar, engine.prev_bar)):
+                    # --- 4. Generate Signal (only a fresh SMA cross can produce one) ---
+                    signal, indicator_data = evaluate_signal(engine.last_bar, engine.prev_bar, bar_time)
+                    # --- 5. Risk Check (ATR) and 6. Execute Trade ---
+                    if signal != SIGNAL_HOLD and check_atr_for_trade(current_atr):
+                        execute_trade(symbol_info, signal, current_atr, indicator_data, daily_profit_loss)
+                        for position in broker.positions_get(symbol=symbol):
+                            open_entries.setdefault(position.ticket, (bar_time, signal))
+
+            # --- Intrabar SL/TP execution, then close the bar ---
+            if broker.positions:
+                broker.check_stops(bar_time, opens[i], highs[i], lows[i], spread)
+            set_price(bar_time, closes[i], spread)
+            update_indicators(bar_time, highs[i], lows[i], closes[i])
+
+            if len(broker.deals) != processed_deals:
+                for deal in broker.deals[processed_deals:]:
+                    if deal.entry != DEAL_ENTRY_OUT or deal.magic != magic:
+                        continue
+                    daily_profit_loss[0] += deal.profit
+                    entry_time, signal = open_entries.pop(deal.position_id, (None, SIGNAL_HOLD))
+                    trades.append({
+                        'entry_time': entry_time,
+                        'exit_time': deal.time,
+                        'type': 'BUY' if signal == SIGNAL_BUY else 'SELL' if signal == SIGNAL_SELL else '',
+                        'volume': deal.volume,
+                        'exit_price': deal.price,
+                        'profit': deal.profit,
+                        'exit_reason': 'SL' if deal.reason == DEAL_REASON_SL else 'TP' if deal.reason == DEAL_REASON_TP else 'Close',
+                    })
+                    equity_times.append(deal.time)
+                    equity_curve.append(broker.balance)
+                processed_deals = len(broker.deals)
+        daily_profit_loss[0] = saved_daily_pnl
+
+    for position in broker.positions_get(symbol=symbol):
+        logging.info(f"Backtest ended with position {position.ticket} still open (floating P/L {position.profit:.2f}).")
+
+    return BacktestResult(trades, equity_times, equity_curve, initial_balance, len(times),
+                          time.perf_counter() - started)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Event-driven backtest of the live strategy on historical OHLCV data.")
+    parser.add_argument('data', help="CSV or Parquet file with time, open, high, low, close[, tick_volume] columns")
+    parser.add_argument('--symbol', default=CONFIG.SYMBOL)
+    parser.add_argument('--balance', type=float, default=10000.0)
+    parser.add_argument('--digits', type=int, default=3)
+    parser.add_argument('--point', type=float, default=0.001)
+    parser.add_argument('--spread', type=int, default=0, help="Spread in points")
+    parser.add_argument('--stops-level', type=int, default=0, help="Broker minimum stop distance in points")
+    parser.add_argument('--tick-value', type=float, default=0.1)
+    parser.add_argument('--tick-size', type=float, default=0.001)
+    parser.add_argument('--volume-min', type=float, default=0.01)
+    parser.add_argument('--volume-max', type=float, default=200.0)
+    parser.add_argument('--volume-step', type=float, default=0.01)
+    parser.add_argument('--sep', default=',', help="CSV separator")
+    parser.add_argument('--trade-log', default=None, help="Write backtest trade events to this CSV file")
+    parser.add_argument('--trades-out', default=None, help="Write the closed trades to this CSV file")
+    parser.add_argument('--log-level', default='WARNING')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper(), format='%(asctime)s | %(levelname)s | %(message)s')
+    symbol_info = make_symbol_info(args.symbol, digits=args.digits, point=args.point, spread=args.spread,
+                                   trade_stops_level=args.stops_level, trade_tick_value=args.tick_value,
+                                   trade_tick_size=args.tick_size, volume_min=args.volume_min,
+                                   volume_max=args.volume_max, volume_step=args.volume_step)
+    bars = load_ohlcv(args.data, sep=args.sep)
+    first, last = (datetime.datetime.fromtimestamp(int(bars['time'][i]), tz=datetime.timezone.utc) for i in (0, -1))
+    print(f"Backtesting {args.symbol} on {len(bars['time'])} bars from {first:%Y-%m-%d %H:%M} to {last:%Y-%m-%d %H:%M}")
+
+    result = run_backtest(bars, symbol_info, args.balance, trade_log_file=args.trade_log)
+    print(result.report())
+    if args.trades_out:
+        result.trades_dataframe().to_csv(args.trades_out, index=False)
+        print(f"Trades written to {os.path.abspath(args.trades_out)}")
+
+if __name__ == "__main__":
+    main()
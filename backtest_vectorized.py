@@ -0,0 +1,377 @@
+import argparse
+import logging
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from .config import CONFIG
+from .constants import SIGNAL_BUY, SIGNAL_SELL
+from . import numpy_indicators as npi
+from .backtest import load_ohlcv, summarize, daily_returns
+from .sim_broker import make_symbol_info
+
+# Columnar screening mode for the SMA crossover / trend / RSI rule set.
+#
+# Signals for every bar are computed in one NumPy pass with the same rules as
+# strategy.evaluate_signal, entries fill at the next bar's open (like the
+# event-driven backtest) and SL/TP exits are resolved with vectorized first-touch
+# searches over the high/low arrays. Trailing stops and daily P/L limits are not
+# modelled here; run backtest.run_backtest on the short-listed parameters for that.
+# Only STRATEGY_PARAM_KEYS can be overridden: the TRAILING_STOP_* factors can only be
+# swept in event-driven mode (backtest.run_backtest with backtest.config_overrides).
+
+# Config keys that parameterize the rule set; they double as parameter names for sweeps.
+STRATEGY_PARAM_KEYS = (
+    'SMA_FAST_LENGTH', 'SMA_SLOW_LENGTH', 'SMA_TREND_LENGTH', 'ATR_PERIOD',
+    'ATR_MULTIPLIER_SL', 'ATR_MULTIPLIER_TP', 'DEFAULT_RR_RATIO', 'MIN_ATR_FOR_TRADE',
+    'ENABLE_RSI_FILTER', 'RSI_PERIOD', 'RSI_OVERBOUGHT', 'RSI_OVERSOLD', 'RISK_PERCENT_PER_TRADE',
+)
+
+EXIT_NONE = 0
+EXIT_SL = 1
+EXIT_TP = 2
+_EXIT_REASONS = {EXIT_NONE: 'Open', EXIT_SL: 'SL', EXIT_TP: 'TP'}
+
+# Bars scanned per candidate in the first pass of the first-touch search, and the
+# largest candidate x bars window materialized at once.
+FIRST_TOUCH_HORIZON = 256
+FIRST_TOUCH_MAX_CELLS = 1 << 22
+
+def check_param_keys(keys):
+    """Raises ValueError for parameter names the vectorized engine does not model."""
+    unknown = sorted(set(keys) - set(STRATEGY_PARAM_KEYS))
+    if not unknown:
+        return
+    message = f"Not a vectorized strategy parameter: {', '.join(unknown)}."
+    if any(key.startswith('TRAILING_STOP_') for key in unknown):
+        message += " Trailing stops are not modelled here; sweep them with backtest.run_backtest."
+    raise ValueError(f"{message} Expected any of {', '.join(STRATEGY_PARAM_KEYS)}.")
+
+def strategy_params(overrides=None):
+    """Current CONFIG values of the strategy parameters, updated with `overrides`."""
+    params = {key: CONFIG.get(key) for key in STRATEGY_PARAM_KEYS}
+    if overrides:
+        check_param_keys(overrides)
+        params.update(overrides)
+    return params
+
+def compute_indicators(bars, params, cache=None):
+    """
+    Indicator columns for `params` as a dict of float64 arrays.
+    With an indicator_cache.IndicatorCache, series already computed for the same
+    dataset are reused instead of recomputed.
+    """
+    if cache is not None:
+        columns = {
+            'sma_fast': cache.get('sma', params['SMA_FAST_LENGTH'], bars),
+            'sma_slow': cache.get('sma', params['SMA_SLOW_LENGTH'], bars),
+            'sma_trend': cache.get('sma', params['SMA_TREND_LENGTH'], bars),
+            'atr': cache.get('atr', params['ATR_PERIOD'], bars),
+        }
+        if params['ENABLE_RSI_FILTER']:
+            columns['rsi'] = cache.get('rsi', params['RSI_PERIOD'], bars)
+        return columns
+
+    close, high, low = bars['close'], bars['high'], bars['low']
+    columns = {
+        'sma_fast': npi.sma(close, params['SMA_FAST_LENGTH']),
+        'sma_slow': npi.sma(close, params['SMA_SLOW_LENGTH']),
+        'sma_trend': npi.sma(close, params['SMA_TREND_LENGTH']),
+        'atr': npi.atr(high, low, close, params['ATR_PERIOD']),
+    }
+    if params['ENABLE_RSI_FILTER']:
+        columns['rsi'] = npi.rsi(close, params['RSI_PERIOD'])
+    return columns
+
+def signal_series(close, columns, params):
+    """
+    Signal of every closed bar (SIGNAL_BUY / SIGNAL_SELL / SIGNAL_HOLD) as an int8 array.
+    Bars whose indicators (or the previous bar's) are still warming up are HOLD, and so
+    are bars with an ATR below MIN_ATR_FOR_TRADE (the risk check in the live loop).
+    """
+    fast, slow, trend, atr = columns['sma_fast'], columns['sma_slow'], columns['sma_trend'], columns['atr']
+    n = close.shape[0]
+    signals = np.zeros(n, dtype=np.int8)
+    if n < 2:
+        return signals
+
+    valid = ~(np.isnan(fast) | np.isnan(slow) | np.isnan(trend) | np.isnan(atr))
+    if params['ENABLE_RSI_FILTER']:
+        valid &= ~np.isnan(columns['rsi'])
+    ready = valid[1:] & valid[:-1]
+
+    buy = (fast[:-1] < slow[:-1]) & (fast[1:] > slow[1:]) & (close[1:] > trend[1:])
+    sell = (fast[:-1] > slow[:-1]) & (fast[1:] < slow[1:]) & (close[1:] < trend[1:])
+    if params['ENABLE_RSI_FILTER']:
+        rsi = columns['rsi'][1:]
+        buy &= rsi < params['RSI_OVERBOUGHT']
+        sell &= rsi > params['RSI_OVERSOLD']
+    tradeable = ready & (atr[1:] >= params['MIN_ATR_FOR_TRADE'])
+
+    signals[1:][buy & tradeable] = SIGNAL_BUY
+    signals[1:][sell & tradeable] = SIGNAL_SELL
+    return signals
+
+def first_touch(open_, high, low, start, direction, sl, tp, spread,
+                horizon=FIRST_TOUCH_HORIZON, max_cells=FIRST_TOUCH_MAX_CELLS):
+    """
+    For each trade opened at the open of bar `start[j]`, finds the first bar (from the
+    entry bar on) whose range reaches its SL or TP. Bars are bid prices; short positions
+    are tested against bid + `spread`. If both levels are inside one bar the SL wins.
+
+    Candidates are scanned in windows of `horizon` bars, as (candidates x horizon) boolean
+    matrices; unresolved ones move on to the next window, which doubles in size.
+    Returns (exit_index, exit_price, exit_reason); unresolved trades get index -1.
+    """
+    n = high.shape[0]
+    m = start.shape[0]
+    exit_index = np.full(m, -1, dtype=np.int64)
+    exit_price = np.full(m, np.nan)
+    exit_reason = np.zeros(m, dtype=np.int8)
+    is_buy = direction > 0
+
+    pending = np.arange(m)
+    offset = 0
+    while pending.size and horizon > 0:
+        window_start = start[pending] + offset
+        in_range = window_start < n
+        pending, window_start = pending[in_range], window_start[in_range]
+        if not pending.size:
+            break
+
+        steps = np.arange(horizon)
+        rows_per_batch = max(1, max_cells // horizon)
+        unresolved = []
+        for b in range(0, pending.size, rows_per_batch):
+            rows = pending[b:b + rows_per_batch]
+            index = window_start[b:b + rows_per_batch, None] + steps
+            beyond = index >= n
+            index = np.minimum(index, n - 1)
+
+            buy = is_buy[rows, None]
+            shift = np.where(buy, 0.0, spread)
+            bar_high = high[index] + shift
+            bar_low = low[index] + shift
+            sl_level = sl[rows, None]
+            tp_level = tp[rows, None]
+            sl_hit = np.where(buy, bar_low <= sl_level, bar_high >= sl_level) & ~beyond
+            tp_hit = np.where(buy, bar_high >= tp_level, bar_low <= tp_level) & ~beyond
+
+            first_sl = np.where(sl_hit.any(axis=1), sl_hit.argmax(axis=1), horizon)
+            first_tp = np.where(tp_hit.any(axis=1), tp_hit.argmax(axis=1), horizon)
+            by_sl = (first_sl <= first_tp) & (first_sl < horizon)
+            by_tp = ~by_sl & (first_tp < horizon)
+
+            hit_step = np.where(by_sl, first_sl, first_tp)
+            hit_bar = window_start[b:b + rows_per_batch] + hit_step
+            resolved = by_sl | by_tp
+            rows_done, bars_done = rows[resolved], hit_bar[resolved]
+            sl_done = by_sl[resolved]
+            buy_done = is_buy[rows_done]
+            bar_open = open_[bars_done] + np.where(buy_done, 0.0, spread)
+
+            # Gaps through a level fill at the bar open
+            level = np.where(sl_done, sl[rows_done], tp[rows_done])
+            fill = np.where(buy_done == sl_done, np.minimum(bar_open, level), np.maximum(bar_open, level))
+            exit_index[rows_done] = bars_done
+            exit_price[rows_done] = fill
+            exit_reason[rows_done] = np.where(sl_done, EXIT_SL, EXIT_TP)
+            unresolved.append(rows[~resolved])
+
+        pending = np.concatenate(unresolved) if unresolved else pending[:0]
+        offset += horizon
+        horizon *= 2
+    return exit_index, exit_price, exit_reason
+
+def _stop_levels(entry, direction, atr, params, symbol_info):
+    """Vectorized execution.calculate_dynamic_tp_sl; invalid rows get NaN levels."""
+    point = symbol_info.point
+    min_distance = symbol_info.trade_stops_level * point
+    sl_distance = atr * params['ATR_MULTIPLIER_SL']
+    tp_distance = np.maximum(atr * params['ATR_MULTIPLIER_TP'], sl_distance * params['DEFAULT_RR_RATIO'])
+    sl_distance = np.where(sl_distance / point < symbol_info.trade_stops_level, min_distance, sl_distance)
+    tp_distance = np.where(tp_distance / point < symbol_info.trade_stops_level, min_distance, tp_distance)
+
+    sl = np.round(entry - direction * sl_distance, symbol_info.digits)
+    tp = np.round(entry + direction * tp_distance, symbol_info.digits)
+    valid = (sl > 0) & (tp > 0) & (direction * (entry - sl) > 0) & (direction * (tp - entry) > 0)
+    return np.where(valid, sl, np.nan), np.where(valid, tp, np.nan)
+
+def _position_sizes(entry, sl, risk_amount, symbol_info):
+    """Vectorized execution.calculate_position_size; rejected rows get NaN."""
+    price_diff_points = np.abs(entry - sl) / symbol_info.point
+    risk_per_standard_lot = price_diff_points * (symbol_info.trade_tick_value / symbol_info.trade_tick_size)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lot = np.clip(risk_amount / risk_per_standard_lot, symbol_info.volume_min, symbol_info.volume_max)
+    volume_precision = 0
+    if symbol_info.volume_step > 0:
+        volume_precision = max(0, -int(math.floor(math.log10(symbol_info.volume_step))))
+    lot = np.round(np.round(lot / symbol_info.volume_step) * symbol_info.volume_step, volume_precision)
+    rejected = (price_diff_points < symbol_info.trade_stops_level) | ~(risk_per_standard_lot > 0) | \
+               (lot < symbol_info.volume_min) | (price_diff_points == 0)
+    return np.where(rejected, np.nan, lot)
+
+def _size_trades(entry_index, exit_index, quote, sl, profit_per_lot, n, initial_balance, risk_percent, symbol_info):
+    """
+    Walks the candidate trades in entry order like the event-driven backtest: a trade that
+    starts while the previous one is open is skipped, and every kept trade is sized from
+    the balance after the trades closed before it (execute_trade risks a share of
+    account_info.balance). Returns the kept mask, the volumes and the profits.
+    """
+    keep = np.zeros(entry_index.shape[0], dtype=bool)
+    volume = np.full(entry_index.shape[0], np.nan)
+    profit = np.zeros(entry_index.shape[0])
+    # Scalar execution.calculate_position_size (rejections are already screened out)
+    risk_per_standard_lot = (np.abs(quote - sl) / symbol_info.point * (symbol_info.trade_tick_value / symbol_info.trade_tick_size)).tolist()
+    volume_min, volume_max, volume_step = symbol_info.volume_min, symbol_info.volume_max, symbol_info.volume_step
+    volume_precision = max(0, -int(math.floor(math.log10(volume_step)))) if volume_step > 0 else 0
+    profit_per_lot = profit_per_lot.tolist()
+
+    balance = initial_balance
+    busy_until = -1
+    last_bar = n - 1
+    for j, (entry, exit_) in enumerate(zip(entry_index.tolist(), exit_index.tolist())):
+        if entry <= busy_until:
+            continue
+        risk_amount = balance * (risk_percent / 100)
+        if risk_amount <= 0:
+            continue
+        lot = max(volume_min, min(volume_max, risk_amount / risk_per_standard_lot[j]))
+        lot = round(round(lot / volume_step) * volume_step, volume_precision)
+        volume[j] = lot
+        profit[j] = round(profit_per_lot[j] * lot, 2)
+        keep[j] = True
+        if exit_ >= 0:
+            balance += profit[j]
+        busy_until = exit_ if exit_ >= 0 else last_bar
+    return keep, volume, profit
+
+class VectorizedResult:
+    """Signal series, trades (as columns) and summary statistics of a vectorized run."""
+
+    def __init__(self, signals, trades, stats, bars, elapsed_seconds):
+        self.signals = signals
+        self.trades = trades
+        self.stats = stats
+        self.bars = bars
+        self.elapsed_seconds = elapsed_seconds
+
+    def trades_dataframe(self):
+        df = pd.DataFrame(self.trades)
+        if not df.empty:
+            df['exit_reason'] = df['exit_reason'].map(_EXIT_REASONS)
+            df['type'] = np.where(df['direction'] > 0, 'BUY', 'SELL')
+        return df
+
+    def report(self):
+        stats = self.stats
+        return '\n'.join([
+            f"Bars: {self.bars} in {self.elapsed_seconds:.3f}s ({self.bars / max(self.elapsed_seconds, 1e-9):,.0f} bars/s)",
+            f"Trades: {stats['trades']} | Win rate: {stats['win_rate']:.1f}% | Profit factor: {stats['profit_factor']:.2f}",
+            f"Net profit: {stats['net_profit']:.2f} ({stats['return_percent']:.2f}%) | Max drawdown: {stats['max_drawdown']:.2f} | Sharpe: {stats['sharpe']:.2f}",
+        ])
+
+def run_vectorized(bars, params=None, symbol_info=None, initial_balance=10000.0, spread_points=None,
+                   columns=None, cache=None):
+    """
+    Screens the rule set over `bars` (see backtest.load_ohlcv) without a per-bar loop.
+    `params` overrides the CONFIG strategy parameters; precomputed indicator `columns`
+    (see compute_indicators) can be passed in to skip the indicator stage, or an
+    IndicatorCache to share indicator series between runs.
+    Trades are sized from the running balance, as in the event-driven backtest.
+    """
+    started = time.perf_counter()
+    params = strategy_params(params)
+    symbol_info = symbol_info or make_symbol_info(CONFIG.SYMBOL)
+    spread = (symbol_info.spread if spread_points is None else spread_points) * symbol_info.point
+    open_, high, low, close, times = bars['open'], bars['high'], bars['low'], bars['close'], bars['time']
+    n = close.shape[0]
+
+    columns = columns or compute_indicators(bars, params, cache)
+    signals = signal_series(close, columns, params)
+
+    # A signal on closed bar i trades at the open of bar i + 1.
+    signal_bars = np.flatnonzero(signals[:-1])
+    entry_index = signal_bars + 1
+    direction = signals[signal_bars].astype(np.float64)
+    # Like execute_trade: stops and size come from the raw quote, the order price is rounded.
+    quote = open_[entry_index] + np.where(direction > 0, spread, 0.0)
+    sl, tp = _stop_levels(quote, direction, columns['atr'][signal_bars], params, symbol_info)
+    # Rejections do not depend on the risk amount, so they are screened at the initial balance
+    volume = _position_sizes(quote, sl, initial_balance * params['RISK_PERCENT_PER_TRADE'] / 100, symbol_info)
+    entry = quote
+
+    placeable = ~np.isnan(sl) & ~np.isnan(volume)
+    entry_index, direction, entry = entry_index[placeable], direction[placeable], entry[placeable]
+    sl, tp, signal_bars = sl[placeable], tp[placeable], signal_bars[placeable]
+
+    exit_index, exit_price, exit_reason = first_touch(open_, high, low, entry_index, direction, sl, tp, spread)
+
+    open_at_end = exit_index < 0
+    exit_price = np.where(open_at_end, close[-1] + np.where(direction > 0, 0.0, spread), exit_price)
+    profit_per_lot = direction * (exit_price - entry) * (symbol_info.trade_tick_value / symbol_info.trade_tick_size)
+    keep, volume, profit = _size_trades(entry_index, exit_index, entry, sl, profit_per_lot, n, initial_balance,
+                                        params['RISK_PERCENT_PER_TRADE'], symbol_info)
+    exit_index = np.where(open_at_end, n - 1, exit_index)
+
+    trades = {
+        'signal_index': signal_bars[keep],
+        'entry_index': entry_index[keep],
+        'exit_index': exit_index[keep],
+        'entry_time': times[entry_index[keep]],
+        'exit_time': times[exit_index[keep]],
+        'direction': direction[keep].astype(np.int8),
+        'volume': volume[keep],
+        'entry_price': entry[keep],
+        'sl_price': sl[keep],
+        'tp_price': tp[keep],
+        'exit_price': exit_price[keep],
+        'exit_reason': exit_reason[keep],
+        'profit': profit[keep],
+    }
+    closed = trades['exit_reason'] != EXIT_NONE
+    closed_profit = trades['profit'][closed]
+    equity_curve = initial_balance + np.cumsum(closed_profit)
+    stats = summarize(closed_profit, np.concatenate(([initial_balance], equity_curve)),
+                      daily_returns(trades['exit_time'][closed], equity_curve, initial_balance), initial_balance)
+    if (~closed).any():
+        logging.debug(f"Vectorized backtest ended with {int((~closed).sum())} open trade(s), excluded from the statistics.")
+    return VectorizedResult(signals, trades, stats, n, time.perf_counter() - started)
+
+def parse_param(item):
+    """Parses a KEY=VALUE override, converting VALUE to the type of the current CONFIG value."""
+    key, _, value = item.partition('=')
+    key = key.strip().upper()
+    current = CONFIG.get(key)
+    if isinstance(current, bool):
+        return key, value.strip().lower() in ('1', 'true', 'yes', 'on')
+    if isinstance(current, int):
+        return key, int(value)
+    if isinstance(current, float):
+        return key, float(value)
+    return key, value
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vectorized screening backtest of the SMA crossover rule set.")
+    parser.add_argument('data', help="CSV or Parquet file with time, open, high, low, close columns")
+    parser.add_argument('--symbol', default=CONFIG.SYMBOL)
+    parser.add_argument('--balance', type=float, default=10000.0)
+    parser.add_argument('--spread', type=int, default=0, help="Spread in points")
+    parser.add_argument('--sep', default=',', help="CSV separator")
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                        help="Override a strategy parameter, e.g. --set SMA_FAST_LENGTH=8")
+    parser.add_argument('--trades-out', default=None, help="Write the trades to this CSV file")
+    args = parser.parse_args(argv)
+
+    overrides = dict(parse_param(item) for item in args.set)
+
+    bars = load_ohlcv(args.data, sep=args.sep)
+    result = run_vectorized(bars, overrides, make_symbol_info(args.symbol), args.balance, args.spread)
+    print(result.report())
+    if args.trades_out:
+        result.trades_dataframe().to_csv(args.trades_out, index=False)
+
+if __name__ == "__main__":
+    main()
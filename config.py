@@ -36,7 +36,63 @@ class Config:
             "MIN_DEVIATION": 20,
             "ENABLE_TRAILING_STOP": False,
             "TRAILING_STOP_ATR_FACTOR": 1.0,
-            "TRAILING_STOP_MIN_PROFIT_POINTS": 50
+            "TRAILING_STOP_MIN_PROFIT_POINTS": 50,
+            "USE_STREAMING_INDICATORS": False,
+            "INDICATOR_BACKEND": "numpy",
+            "ENGINE": "loop",
+            "SYMBOLS": [],
+            "TICK_INTERVAL_MS": 250,
+            "RECONCILE_SECONDS": 60,
+            "PNL_RECONCILE_SECONDS": 300,
+            "EQUITY_MONITOR_ENABLED": True,
+            "EQUITY_MONITOR_FLATTEN": False,
+            "DEAL_CONFIRM_INITIAL_MS": 10,
+            "DEAL_CONFIRM_MAX_MS": 500,
+            "DEAL_CONFIRM_TIMEOUT_SECONDS": 30,
+            "ORDER_RETRY_MAX_ATTEMPTS": 4,
+            "ORDER_RETRY_BUDGET_MS": 1500,
+            "ORDER_RETRY_BACKOFF_MS": 50,
+            "ORDER_MAX_SLIPPAGE_POINTS": 100,
+            "STOP_MIN_STEP_POINTS": 50,
+            "STOP_MIN_INTERVAL_MS": 2000,
+            "TELEMETRY_HISTORY": 10000,
+            "TRADE_LOG_QUEUE_SIZE": 10000,
+            "TRADE_LOG_BATCH_SIZE": 100,
+            "TRADE_LOG_FLUSH_MS": 500,
+            "TRADE_LOG_FSYNC": "interval",
+            "TRADE_LOG_FSYNC_SECONDS": 5,
+            "EVENT_STORE_FILE": "trade_events.sqlite",
+            "LOG_FILE_LEVEL": "DEBUG",
+            "LOG_MAX_BYTES": 10485760,
+            "LOG_BACKUP_COUNT": 5,
+            "MT5_CACHE_TTL_MS": {
+                "symbol_info": 60000,
+                "account_info": 1000,
+                "tick": 100
+            },
+            "USE_CANDLE_CLOSE_DETECTOR": False,
+            "CANDLE_DETECTOR_LEAD_MS": 500,
+            "CANDLE_DETECTOR_POLL_MS": 20,
+            "MT5_BACKEND": "metatrader5",
+            "MT5_INSTRUMENTATION": True,
+            "METRICS_HOST": "127.0.0.1",
+            "METRICS_PORT": 9108,
+            "METRICS_WINDOW": 1000,
+            "SIM_BROKER": {
+                "FEED": "synthetic",
+                "REPLAY_FILE": "",
+                "SEED": 42,
+                "HISTORY_BARS": 100000,
+                "START_PRICE": 2000.0,
+                "VOLATILITY": 0.0002,
+                "SPREAD_POINTS": 200,
+                "INITIAL_BALANCE": 10000.0,
+                "LATENCY_MS": 0.0,
+                "LATENCY_JITTER_MS": 0.0,
+                "ORDER_LATENCY_MS": 0.0,
+                "SLIPPAGE_POINTS": 0,
+                "REQUOTE_PROBABILITY": 0.0
+            }
         }
 
         try:
@@ -1,4 +1,4 @@
-import MetaTrader5 as mt5
+from .mt5_api import mt5
 import datetime
 
 # Signal Constants
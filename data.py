@@ -1,29 +1,176 @@
-import MetaTrader5 as mt5
+from .mt5_api import mt5
+import numpy as np
 import pandas as pd
 import logging
 import datetime
+import time
 import pytz
 from .constants import TIMEFRAME_DURATIONS_SECONDS, MT5_TIMEZONE
 
-def get_historical_data(symbol, timeframe_mt5, timeframe_str, bars_to_fetch):
+# Additional bars fetched on top of the requested amount to absorb indicator warm-up.
+HISTORY_BUFFER_BARS = 100
+
+# Per-(symbol, timeframe) rolling bar caches, see get_bar_cache().
+_bar_caches = {}
+
+class BarCache:
+    """
+    Fixed-capacity buffer holding the most recent bars for one symbol/timeframe.
+
+    History is loaded once; every later refresh only pulls the bars from the last
+    cached bar onwards. Overlapping bars replace the cached ones, so a revised
+    last bar (the still-forming candle, or a broker correction) is repaired, and
+    newer bars are appended while the oldest ones fall off the front.
+    """
+
+    def __init__(self, symbol, timeframe_mt5, timeframe_str, capacity):
+        self.symbol = symbol
+        self.timeframe_mt5 = timeframe_mt5
+        self.timeframe_str = timeframe_str
+        self.capacity = capacity
+        self.revised_bars = 0 # Number of cached bars that were overwritten with different values
+        self._rates = None
+        self._last_refresh = None
+
+    def __len__(self):
+        return 0 if self._rates is None else len(self._rates)
+
+    @property
+    def rates(self):
+        """The cached MT5 rates as a numpy structured array (oldest first)."""
+        return self._rates
+
+    @property
+    def last_bar_time(self):
+        """Open time (epoch seconds) of the newest cached bar, or None if empty."""
+        if not len(self):
+            return None
+        return int(self._rates['time'][-1])
+
+    def ensure_capacity(self, capacity):
+        """Grows the buffer; a larger window needs a full reload on the next refresh."""
+        if capacity > self.capacity:
+            self.capacity = capacity
+            self._rates = None
+
+    def invalidate(self):
+        """Drops the cached bars so the next refresh reloads the full history."""
+        self._rates = None
+
+    def refresh(self):
+        """
+        Brings the cache up to date with the terminal.
+        Returns True if the cache holds data afterwards, False otherwise.
+        """
+        if not len(self):
+            return self._load_full()
+
+        # Estimate how many bars have appeared since the last refresh. The local
+        # monotonic clock is only used for a relative estimate, so broker clock
+        # skew does not matter. Two extra bars re-read the last cached bar.
+        duration = TIMEFRAME_DURATIONS_SECONDS.get(self.timeframe_str, 60)
+        elapsed = time.monotonic() - self._last_refresh
+        count = min(self.capacity, int(elapsed // duration) + 2)
+
+        rates = mt5.copy_rates_from_pos(self.symbol, self.timeframe_mt5, 0, count)
+        if rates is None or len(rates) == 0:
+            logging.error(f"Failed to get incremental rates for {self.symbol} on {self.timeframe_str}. Error: {mt5.last_error()}")
+            return True # Keep serving the cached bars
+
+        cached_times = self._rates['time']
+        first_new_time = rates['time'][0]
+        if first_new_time > cached_times[-1] or first_new_time < cached_times[0]:
+            # No overlap with the cache (gap longer than estimated) or the window
+            # reaches past the buffer: fall back to a full reload.
+            logging.debug(f"Bar cache for {self.symbol} on {self.timeframe_str} has no usable overlap. Reloading.")
+            return self._load_full()
+
+        overlap_start = int(np.searchsorted(cached_times, first_new_time))
+        overlap = self._rates[overlap_start:]
+        overlap_len = min(len(overlap), len(rates))
+        if overlap_len and not np.array_equal(overlap[:overlap_len], rates[:overlap_len]):
+            revised = int(np.count_nonzero(overlap[:overlap_len] != rates[:overlap_len]))
+            self.revised_bars += revised
+            logging.debug(f"Repaired {revised} revised bar(s) for {self.symbol} on {self.timeframe_str}.")
+
+        merged = np.concatenate((self._rates[:overlap_start], rates))
+        self._rates = merged[-self.capacity:]
+        self._last_refresh = time.monotonic()
+        return True
+
+    def to_dataframe(self, bars=None, closed_only=False):
+        """
+        Returns the newest `bars` cached bars (all if None) as an OHLCV DataFrame indexed by time.
+        With `closed_only` the newest cached bar, which is still forming, is left out.
+        """
+        rates = self._rates[:-1] if closed_only and self._rates is not None else self._rates
+        if rates is None or not len(rates):
+            return pd.DataFrame()
+        rates = rates if bars is None else rates[-bars:]
+        df = pd.DataFrame({
+            'open': rates['open'],
+            'high': rates['high'],
+            'low': rates['low'],
+            'close': rates['close'],
+            'tick_volume': rates['tick_volume'],
+        }, index=pd.to_datetime(rates['time'], unit='s'))
+        df.index.name = 'time'
+        return df
+
+    def _load_full(self):
+        rates = mt5.copy_rates_from_pos(self.symbol, self.timeframe_mt5, 0, self.capacity)
+        if rates is None or len(rates) == 0:
+            logging.error(f"Failed to get rates for {self.symbol} on {self.timeframe_str}. Error: {mt5.last_error()}")
+            self._rates = None
+            return False
+        self._rates = rates
+        self._last_refresh = time.monotonic()
+        logging.debug(f"Loaded {len(rates)} bars into cache for {self.symbol} on {self.timeframe_str}.")
+        return True
+
+def get_bar_cache(symbol, timeframe_mt5, timeframe_str, capacity):
+    """Returns the shared bar cache for (symbol, timeframe), creating or growing it as needed."""
+    key = (symbol, timeframe_mt5)
+    cache = _bar_caches.get(key)
+    if cache is None:
+        cache = BarCache(symbol, timeframe_mt5, timeframe_str, capacity)
+        _bar_caches[key] = cache
+    else:
+        cache.ensure_capacity(capacity)
+    return cache
+
+def get_historical_data(symbol, timeframe_mt5, timeframe_str, bars_to_fetch, use_cache=True, closed_only=False):
     """
     Fetches historical OHLCV data from MT5.
-    Adjusts the start time to ensure enough bars are fetched even after NaNs are dropped.
+    Fetches a buffer of extra bars so enough bars remain after NaNs are dropped.
+    By default the bars are served from the rolling bar cache, which only pulls
+    the bars that appeared since the previous call. The cache holds the forming bar
+    last; `closed_only` leaves it out, as streaming_indicators.IndicatorEngine does.
     """
+    total_bars_to_fetch = bars_to_fetch + HISTORY_BUFFER_BARS
+
+    if use_cache:
+        try:
+            cache = get_bar_cache(symbol, timeframe_mt5, timeframe_str, total_bars_to_fetch)
+            if not cache.refresh():
+                return pd.DataFrame()
+            df = cache.to_dataframe(total_bars_to_fetch, closed_only=closed_only)
+            logging.debug(f"Served {len(df)} cached bars for {symbol} on {timeframe_str}.")
+            return df
+        except Exception as e:
+            logging.error(f"Error fetching historical data for {symbol}: {e}")
+            return pd.DataFrame()
+
     try:
         timezone = pytz.timezone(MT5_TIMEZONE)
-        
-        # Fetch more bars than requested to account for indicator lag and ensure DATA_BARS_TO_FETCH valid bars
-        buffer_bars = 100 # Additional bars to fetch
-        total_bars_to_fetch = bars_to_fetch + buffer_bars
-        
+
         # Calculate utc_from based on timeframe duration
         # Example: For M5, (300 seconds/minute) * (300 bars + 50 buffer) = 105000 seconds
         utc_from = datetime.datetime.now(timezone) - \
                    datetime.timedelta(seconds=TIMEFRAME_DURATIONS_SECONDS.get(timeframe_str, 60) * total_bars_to_fetch)
-        
+
         rates = mt5.copy_rates_from(symbol, timeframe_mt5, utc_from, total_bars_to_fetch)
-        
+
         if rates is None or len(rates) == 0:
             logging.error(f"Failed to get rates for {symbol} on {timeframe_str}. Error: {mt5.last_error()}")
             return pd.DataFrame()
@@ -32,10 +179,10 @@ def get_historical_data(symbol, timeframe_mt5, timeframe_str, bars_to_fetch):
         df['time'] = pd.to_datetime(df['time'], unit='s')
         df.set_index('time', inplace=True)
         df = df[['open', 'high', 'low', 'close', 'tick_volume']]
-        
+
         logging.debug(f"Fetched {len(df)} raw bars for {symbol} on {timeframe_str}.")
         return df
 
     except Exception as e:
         logging.error(f"Error fetching historical data for {symbol}: {e}")
-        return pd.DataFrame()
\ No newline at end of file
+        return pd.DataFrame()
@@ -0,0 +1,186 @@
+import datetime
+import logging
+import sqlite3
+
+import pytz
+
+from .constants import MT5_TIMEZONE
+
+# Typed, queryable copy of the trade events, next to trade_events.csv. Rows go into one
+# SQLite table in WAL mode: numbers are stored as REAL, indicator conditions as 0/1 and the
+# time as epoch seconds plus the MT5-timezone day, indexed by time, (symbol, time) and
+# (event, time). Writes are append-only batches from the trade logger's writer thread;
+# queries open their own connection, which WAL lets run while the writer appends.
+
+# CSV header -> (column, SQL type); the column order of the table
+COLUMNS = {
+    'Timestamp': ('ts', 'REAL NOT NULL'),
+    'Event': ('event', 'TEXT NOT NULL'),
+    'Symbol': ('symbol', 'TEXT'),
+    'Trade Type': ('trade_type', 'TEXT'),
+    'Volume': ('volume', 'REAL'),
+    'Entry Price': ('entry_price', 'REAL'),
+    'SL Price': ('sl_price', 'REAL'),
+    'TP Price': ('tp_price', 'REAL'),
+    'Close Price': ('close_price', 'REAL'),
+    'Profit/Loss': ('profit_loss', 'REAL'),
+    'Daily P/L': ('daily_pnl', 'REAL'),
+    'SMA Fast': ('sma_fast', 'REAL'),
+    'SMA Slow': ('sma_slow', 'REAL'),
+    'SMA Trend': ('sma_trend', 'REAL'),
+    'ATR': ('atr', 'REAL'),
+    'RSI': ('rsi', 'REAL'),
+    'SMA Buy Cond': ('sma_buy_cond', 'INTEGER'),
+    'SMA Sell Cond': ('sma_sell_cond', 'INTEGER'),
+    'Trend Buy Cond': ('trend_buy_cond', 'INTEGER'),
+    'Trend Sell Cond': ('trend_sell_cond', 'INTEGER'),
+    'RSI Buy Cond': ('rsi_buy_cond', 'INTEGER'),
+    'RSI Sell Cond': ('rsi_sell_cond', 'INTEGER'),
+    'Comment': ('comment', 'TEXT'),
+}
+INDICATOR_COLUMNS = ['sma_fast', 'sma_slow', 'sma_trend', 'atr', 'rsi', 'sma_buy_cond', 'sma_sell_cond',
+                     'trend_buy_cond', 'trend_sell_cond', 'rsi_buy_cond', 'rsi_sell_cond']
+
+_SCHEMA = [
+    f"CREATE TABLE IF NOT EXISTS trade_events (id INTEGER PRIMARY KEY, day TEXT NOT NULL, "
+    f"{', '.join(f'{column} {sql_type}' for column, sql_type in COLUMNS.values())})",
+    "CREATE INDEX IF NOT EXISTS trade_events_ts ON trade_events (ts)",
+    "CREATE INDEX IF NOT EXISTS trade_events_symbol_ts ON trade_events (symbol, ts)",
+    "CREATE INDEX IF NOT EXISTS trade_events_event_ts ON trade_events (event, ts)",
+]
+_INSERT = (f"INSERT INTO trade_events (day, {', '.join(column for column, _ in COLUMNS.values())}) "
+           f"VALUES ({', '.join('?' * (len(COLUMNS) + 1))})")
+
+def _number(value):
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _flag(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        return 1 if value.strip().lower() in ('true', '1') else 0
+    return 1 if value else 0
+
+def _epoch(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.timestamp()
+    if isinstance(value, datetime.date):
+        return datetime.datetime.combine(value, datetime.time(), tzinfo=pytz.timezone(MT5_TIMEZONE)).timestamp()
+    return float(value)
+
+class EventStore:
+    """SQLite (WAL) store of trade events with a small query API."""
+
+    def __init__(self, path):
+        self.path = path
+        self.timezone = pytz.timezone(MT5_TIMEZONE)
+        self._writer = None # connection of the appending thread
+        with self._connect() as connection:
+            for statement in _SCHEMA:
+                connection.execute(statement)
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    # --- Writing ------------------------------------------------------------------
+
+    def append(self, events):
+        """
+        Appends events in one transaction. An event is (timestamp, values) with values keyed
+        by the CSV header names, holding the raw (unformatted) numbers and flags.
+        """
+        rows = []
+        for timestamp, values in events:
+            row = [datetime.datetime.fromtimestamp(timestamp, tz=self.timezone).strftime('%Y-%m-%d')]
+            for header, (column, sql_type) in COLUMNS.items():
+                value = timestamp if header == 'Timestamp' else values.get(header)
+                if sql_type == 'REAL':
+                    value = _number(value)
+                elif sql_type == 'INTEGER':
+                    value = _flag(value)
+                elif value is not None:
+                    value = str(value)
+                row.append(value)
+            rows.append(row)
+        if self._writer is None:
+            self._writer = self._connect()
+        with self._writer:
+            self._writer.executemany(_INSERT, rows)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    # --- Queries ------------------------------------------------------------------
+
+    def _query(self, sql, params):
+        connection = self._connect()
+        try:
+            return connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _where(event=None, symbol=None, start=None, end=None):
+        clauses, params = [], []
+        if event is not None:
+            clauses.append("event = ?")
+            params.append(event)
+        if symbol is not None:
+            clauses.append("symbol = ?")
+            params.append(symbol)
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(_epoch(start))
+        if end is not None:
+            clauses.append("ts < ?")
+            params.append(_epoch(end))
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def events(self, event=None, symbol=None, start=None, end=None, limit=None):
+        """Events as dicts, oldest first. start/end are datetimes, dates or epoch seconds."""
+        where, params = self._where(event, symbol, start, end)
+        sql = f"SELECT * FROM trade_events{where} ORDER BY ts"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(row) for row in self._query(sql, params)]
+
+    def daily_pnl(self, symbol=None, start=None, end=None):
+        """[(day, realized P/L, closed trades)] from 'Trade Closed' events, per MT5 day."""
+        where, params = self._where('Trade Closed', symbol, start, end)
+        rows = self._query(f"SELECT day, COALESCE(SUM(profit_loss), 0), COUNT(*) FROM trade_events{where} "
+                           f"GROUP BY day ORDER BY day", params)
+        return [tuple(row) for row in rows]
+
+    def win_rate(self, symbol=None, start=None, end=None):
+        """Closed trades, wins (profit > 0), win rate and total P/L from 'Trade Closed' events."""
+        where, params = self._where('Trade Closed', symbol, start, end)
+        trades, wins, total = self._query(f"SELECT COUNT(*), COALESCE(SUM(profit_loss > 0), 0), "
+                                          f"COALESCE(SUM(profit_loss), 0) FROM trade_events{where}", params)[0]
+        return {'trades': trades, 'wins': wins, 'win_rate': wins / trades if trades else 0.0, 'profit_loss': total}
+
+    def entry_snapshots(self, symbol=None, start=None, end=None):
+        """Indicator values and conditions recorded with every 'Trade Opened' event."""
+        where, params = self._where('Trade Opened', symbol, start, end)
+        columns = ', '.join(['ts', 'symbol', 'trade_type', 'entry_price', 'sl_price', 'tp_price'] + INDICATOR_COLUMNS)
+        return [dict(row) for row in self._query(f"SELECT {columns} FROM trade_events{where} ORDER BY ts", params)]
+
+def open_event_store(path):
+    """EventStore at `path`, or None (with an error logged) if it cannot be opened."""
+    try:
+        return EventStore(path)
+    except sqlite3.Error as e:
+        logging.error(f"Could not open the trade event store {path}: {e}")
+        return None
@@ -1,20 +1,24 @@
-import MetaTrader5 as mt5
+from .mt5_api import mt5
 import logging
 import datetime
-import time # Added for sleep in close_position
 import math # Import math module
+import time
 
 from .config import CONFIG
-from .mt5_utils import get_account_info, get_current_tick
+from .mt5_utils import get_account_info, get_current_tick, send_order, deal_confirmations
 from .trade_logger import trade_csv_logger
+from .metrics import observe, register_gauge
+from .telemetry import execution_telemetry
 from .constants import SIGNAL_BUY, SIGNAL_SELL, ORDER_FILLING_TYPE, ORDER_TIME_TYPE
 
-def calculate_position_size(symbol_info, signal_type, sl_price, risk_amount):
+def calculate_position_size(symbol_info, signal_type, sl_price, risk_amount, tick_info=None):
     """
     Calculates the optimal lot size based on risk amount, stop loss distance,
     and symbol properties (tick value, point, volume limits).
+    tick_info is the quote the order will be sent at; fetched if not given.
     """
-    tick_info = get_current_tick(symbol_info.name)
+    if tick_info is None:
+        tick_info = get_current_tick(symbol_info.name)
     if tick_info is None:
         return None
 
@@ -150,74 +154,160 @@ def calculate_dynamic_tp_sl(symbol_info, current_atr, signal_type, entry_price):
         
     return sl_price, tp_price
 
-def execute_trade(symbol_info, signal, current_atr, indicator_data_at_signal, daily_profit_loss_ref):
-    """
-    Executes a trade based on the signal, applies risk management,
-    and logs the trade event.
-    daily_profit_loss_ref is a list/mutable object to reflect changes in main loop.
-    """
-    account_info = get_account_info()
-    if account_info is None:
-        return
-
-    # Daily limits check is performed in `risk.py` before calling this.
-    # ATR minimum check is also performed in `risk.py`.
-
+# order_send retcodes worth another attempt in execute_trade: re-priced at once from a fresh
+# tick, or after a short backoff when the terminal/server is the problem. Resolved by name
+# on the active backend; anything else fails the order.
+_REPRICE_RETCODES = {
+    'TRADE_RETCODE_REQUOTE': 'requote',
+    'TRADE_RETCODE_PRICE_CHANGED': 'price changed',
+    'TRADE_RETCODE_PRICE_OFF': 'off quotes',
+    'TRADE_RETCODE_INVALID_STOPS': 'invalid stops',
+}
+_BACKOFF_RETCODES = {
+    'TRADE_RETCODE_CONNECTION': 'no connection',
+    'TRADE_RETCODE_TIMEOUT': 'timeout',
+    'TRADE_RETCODE_TOO_MANY_REQUESTS': 'too many requests',
+}
+
+def classify_retcode(retcode):
+    """('reprice' | 'backoff' | None, reason) for an order_send retcode; None means not retryable."""
+    if retcode is None:
+        return 'backoff', 'no result'
+    for kind, names in (('reprice', _REPRICE_RETCODES), ('backoff', _BACKOFF_RETCODES)):
+        for name, reason in names.items():
+            if getattr(mt5, name, None) == retcode:
+                return kind, reason
+    return None, str(retcode)
+
+def _price_entry(symbol_info, signal, current_atr, risk_amount):
+    """Entry price, SL, TP and lot at a fresh tick, or None if the trade cannot be priced."""
     tick_info = get_current_tick(symbol_info.name)
     if tick_info is None:
-        return
+        return None
 
     entry_price = tick_info.ask if signal == SIGNAL_BUY else tick_info.bid
     if entry_price is None or entry_price == 0:
         logging.error(f"Failed to get current entry price for {symbol_info.name} before sending order.")
-        return
+        return None
 
     sl_price, tp_price = calculate_dynamic_tp_sl(symbol_info, current_atr, signal, entry_price)
     if sl_price is None or tp_price is None:
         logging.error("Failed to calculate valid Stop Loss or Take Profit prices. Trade aborted.")
+        return None
+
+    lot = calculate_position_size(symbol_info, signal, sl_price, risk_amount, tick_info)
+    if lot is None or lot <= 0:
+        logging.error("Calculated lot size is None or invalid. Trade aborted.")
+        return None
+
+    # Round entry price to symbol's digits for the request
+    return round(entry_price, symbol_info.digits), sl_price, tp_price, lot
+
+def execute_trade(symbol_info, signal, current_atr, indicator_data_at_signal, daily_profit_loss_ref, magic=None,
+                  signal_price=None, signal_time=None):
+    """
+    Executes a trade based on the signal, applies risk management,
+    and logs the trade event.
+    daily_profit_loss_ref is a list/mutable object to reflect changes in main loop.
+    magic defaults to CONFIG.MAGIC_NUMBER. signal_price (the signal bar's close) and
+    signal_time (epoch seconds) feed the execution telemetry.
+
+    Requotes, price changes, off quotes and invalid stops are retried right away with
+    SL/TP and volume recomputed from a fresh tick; connection problems after a short
+    backoff. Retries stop after ORDER_RETRY_MAX_ATTEMPTS attempts, ORDER_RETRY_BUDGET_MS,
+    or once the price has moved more than ORDER_MAX_SLIPPAGE_POINTS against the first attempt.
+    """
+    account_info = get_account_info()
+    if account_info is None:
         return
 
+    # Daily limits check is performed in `risk.py` before calling this.
+    # ATR minimum check is also performed in `risk.py`.
+
     risk_amount = account_info.balance * (CONFIG.RISK_PERCENT_PER_TRADE / 100)
     if risk_amount <= 0:
         logging.error("Calculated risk amount is zero or negative. Cannot open trade.")
         return
 
-    lot = calculate_position_size(symbol_info, signal, sl_price, risk_amount)
-
-    if lot is None or lot <= 0:
-        logging.error("Calculated lot size is None or invalid. Trade aborted.")
-        return
-
     trade_type = mt5.ORDER_TYPE_BUY if signal == SIGNAL_BUY else mt5.ORDER_TYPE_SELL
     trade_type_str = "BUY" if signal == SIGNAL_BUY else "SELL"
     request_comment = f"{trade_type_str} Signal Bot"
 
-    # Round entry price to symbol's digits for the request
-    entry_price = round(entry_price, symbol_info.digits)
-
-    request = {
-        "action": mt5.TRADE_ACTION_DEAL,
-        "symbol": symbol_info.name,
-        "volume": lot,
-        "type": trade_type,
-        "price": entry_price,
-        "sl": sl_price,
-        "tp": tp_price,
-        "deviation": CONFIG.MIN_DEVIATION,
-        "magic": CONFIG.MAGIC_NUMBER,
-        "comment": request_comment,
-        "type_time": ORDER_TIME_TYPE,
-        "type_filling": ORDER_FILLING_TYPE,
-    }
-
-    logging.info(f"Attempting to send order: {request}")
-    result = mt5.order_send(request)
-
-    if result.retcode != mt5.TRADE_RETCODE_DONE:
-        logging.error(f"Order failed for {symbol_info.name}: retcode={result.retcode}, comment='{result.comment}'")
+    record = execution_telemetry.start(symbol_info.name, 1 if signal == SIGNAL_BUY else -1, symbol_info.point,
+                                       signal_time, signal_price)
+    started = time.monotonic()
+    deadline = started + CONFIG.ORDER_RETRY_BUDGET_MS / 1000.0
+    first_price = None
+    attempts = [] # (retcode, latency in ms) per order_send
+    invalid_stops_retried = False
+    while True:
+        priced = _price_entry(symbol_info, signal, current_atr, risk_amount)
+        if priced is None:
+            if not attempts:
+                return
+            # A retry could not be priced: the order failed, recorded like any other failure
+            failure_comment = "No price for the retry"
+            break
+        entry_price, sl_price, tp_price, lot = priced
+        record.tick_time = time.time()
+
+        if first_price is None:
+            first_price = entry_price
+        else:
+            slippage_points = (entry_price - first_price if signal == SIGNAL_BUY else first_price - entry_price) / symbol_info.point
+            if slippage_points > CONFIG.ORDER_MAX_SLIPPAGE_POINTS:
+                failure_comment = f"Price moved {slippage_points:.0f} points against the first attempt"
+                break
+
+        request = {
+            "action": mt5.TRADE_ACTION_DEAL,
+            "symbol": symbol_info.name,
+            "volume": lot,
+            "type": trade_type,
+            "price": entry_price,
+            "sl": sl_price,
+            "tp": tp_price,
+            "deviation": CONFIG.MIN_DEVIATION,
+            "magic": CONFIG.MAGIC_NUMBER if magic is None else magic,
+            "comment": request_comment,
+            "type_time": ORDER_TIME_TYPE,
+            "type_filling": ORDER_FILLING_TYPE,
+        }
+
+        logging.info(f"Attempting to send order: {request}")
+        record.send_started = time.time()
+        send_started = time.perf_counter()
+        result = send_order(request)
+        latency = time.perf_counter() - send_started
+        record.send_ended = record.send_started + latency
+        observe('execution', 'order_send', latency)
+        retcode = result.retcode if result is not None else None
+        attempts.append((retcode, latency * 1000.0))
+        record.attempts = len(attempts)
+        if retcode == mt5.TRADE_RETCODE_DONE:
+            break
+
+        kind, reason = classify_retcode(retcode)
+        failure_comment = (f"Retcode: {retcode}, {result.comment}" if result is not None
+                           else f"No result from order_send: {mt5.last_error()}")
+        if kind == 'reprice' and reason == 'invalid stops':
+            if invalid_stops_retried:
+                kind = None
+            invalid_stops_retried = True
+        remaining = deadline - time.monotonic()
+        if kind is None or len(attempts) >= CONFIG.ORDER_RETRY_MAX_ATTEMPTS or remaining <= 0:
+            break
+        logging.warning(f"Order attempt {len(attempts)} for {symbol_info.name} failed ({reason}, {latency * 1000:.1f} ms). Retrying.")
+        if kind == 'backoff':
+            time.sleep(min(CONFIG.ORDER_RETRY_BACKOFF_MS / 1000.0 * 2 ** (len(attempts) - 1), remaining))
+
+    attempts_str = ', '.join(f"{code}/{ms:.1f}ms" for code, ms in attempts)
+    if not attempts or attempts[-1][0] != mt5.TRADE_RETCODE_DONE:
+        logging.error(f"Order failed for {symbol_info.name}: {failure_comment} after {len(attempts)} attempt(s) [{attempts_str}]")
         logging.debug(f"Order request: {request}")
-        if result.request:
+        if result is not None and result.request:
             logging.debug(f"Request details: {result.request}")
+        execution_telemetry.failed(record, attempts[-1][0] if attempts else None)
         
         trade_csv_logger.log_trade_event(
             event='Trade Failed',
@@ -230,10 +320,15 @@ def execute_trade(symbol_info, signal, current_atr, indicator_data_at_signal, da
             profit_loss='', # N/A for failed trade
             daily_pnl=daily_profit_loss_ref[0],
             indicator_data=indicator_data_at_signal,
-            comment=f"Retcode: {result.retcode}, {result.comment}"
+            comment=f"{failure_comment}; attempts: {len(attempts)}"
         )
     else:
         logging.info(f"Order placed successfully for {symbol_info.name}. Deal: {result.deal}, Position: {result.order}")
+        execution_telemetry.filled(record, result.retcode, entry_price, result.price, result.deal)
+        if result.deal:
+            deal_confirmations.expect(result.deal, lambda deal: execution_telemetry.confirmed(record, deal))
+        if len(attempts) > 1:
+            logging.info(f"  Filled on attempt {len(attempts)} after {(time.monotonic() - started) * 1000:.0f} ms [{attempts_str}]")
         # Need to determine `volume_precision` for logging formatting here too
         volume_precision = 0
         if symbol_info.volume_step > 0:
@@ -257,7 +352,8 @@ def execute_trade(symbol_info, signal, current_atr, indicator_data_at_signal, da
 
 def close_position(position, symbol_info, daily_profit_loss_ref):
     """
-    Closes an open position and logs the closing event.
+    Closes an open position; a failed close is logged as a 'Close Failed' event (the
+    'Trade Closed' event is logged from the closing deal, see risk.log_closing_deal).
     daily_profit_loss_ref is a list/mutable object to reflect changes in main loop.
     """
     tick_info = get_current_tick(position.symbol)
@@ -275,14 +371,14 @@ def close_position(position, symbol_info, daily_profit_loss_ref):
         "position": position.ticket,
         "price": close_price_request,
         "deviation": CONFIG.MIN_DEVIATION,
-        "magic": CONFIG.MAGIC_NUMBER,
+        "magic": position.magic,
         "comment": "Close by Bot",
         "type_time": ORDER_TIME_TYPE,
         "type_filling": ORDER_FILLING_TYPE,
     }
 
     logging.info(f"Attempting to close position {position.ticket}: {request}")
-    result = mt5.order_send(request)
+    result = send_order(request)
 
     if result.retcode != mt5.TRADE_RETCODE_DONE:
         logging.error(f"Position close failed for {position.ticket}: retcode={result.retcode}, comment='{result.comment}'")
@@ -300,110 +396,145 @@ def close_position(position, symbol_info, daily_profit_loss_ref):
         )
     else:
         logging.info(f"Position {position.ticket} closed successfully. Deal: {result.deal}")
-        
-        realized_profit_loss = 0.0
-        close_price_actual = 0.0
-        
-        # Give MT5 a moment to process the deal history, especially on fast closing
-        time.sleep(0.5) 
-        # For closing a specific position, mt5.history_deals_get(position=position.ticket) is best.
-        # But if you need the specific closing deal's profit, it's better to look at the 'result' object directly.
-        # The result of order_send for a closing deal usually contains 'profit' and 'price' if it's a direct deal.
-        # Let's refine this to directly get info from the result object for the closing deal.
-        
-        # Check if result contains deal details directly.
+
+        def log_closed(deal_info):
+            if deal_info is not None:
+                logging.info(f"  Realized P/L from deal {result.deal}: {deal_info.profit:.2f} at {deal_info.price}.")
+
+        # The 'Trade Closed' event is logged from the closing deal by the daily P/L update
+        # (risk.update_daily_pnl_from_closed_deals), like SL/TP exits. The closing deal may take
+        # a moment to reach the history: deal_confirmations resolves it right away if visible,
+        # otherwise on a later poll, without blocking here.
         if hasattr(result, 'deal') and result.deal > 0:
-            deal_info = mt5.history_deal_get(result.deal)
-            if deal_info:
-                realized_profit_loss = deal_info.profit
-                close_price_actual = deal_info.price
-                logging.info(f"  Realized P/L from deal {result.deal}: {realized_profit_loss:.2f}.")
-            else:
-                logging.warning(f"Could not retrieve deal info for deal {result.deal} after close.")
+            deal_confirmations.expect(result.deal, log_closed)
         else:
             logging.warning(f"Order send result did not contain a valid 'deal' ticket for position {position.ticket}.")
 
-        trade_csv_logger.log_trade_event(
-            event='Trade Closed',
-            symbol=position.symbol,
-            trade_type='BUY' if position.type == mt5.ORDER_TYPE_BUY else 'SELL',
-            volume=position.volume,
-            entry_price=position.price_open,
-            sl_price=position.sl,
-            tp_price=position.tp,
-            close_price=close_price_actual,
-            profit_loss=realized_profit_loss,
-            daily_pnl=daily_profit_loss_ref[0], # Updated in main loop
-            comment=f"Deal: {result.deal}"
-        )
-
-def update_trailing_stop(position, symbol_info, current_tick_price, current_atr):
+def compute_trailing_stop(position, symbol_info, current_tick_price, current_atr):
     """
-    Updates the trailing stop loss for an open position.
+    New trailing SL price for an open position, or None if the stop should stay where it is
+    (not enough profit yet, or the new level does not improve on position.sl).
     """
-    if not CONFIG.ENABLE_TRAILING_STOP:
-        return False
-
-    # Need to determine `volume_precision` for logging formatting here too
-    volume_precision = 0
-    if symbol_info.volume_step > 0:
-        volume_precision = max(0, -int(math.floor(math.log10(symbol_info.volume_step))))
-
     if position.type == mt5.ORDER_TYPE_BUY:
         # For BUY: trailing stop moves up as price goes up
         profit_points = (current_tick_price - position.price_open) / symbol_info.point
+        if profit_points < CONFIG.TRAILING_STOP_MIN_PROFIT_POINTS:
+            return None
         new_sl_price = current_tick_price - (current_atr * CONFIG.TRAILING_STOP_ATR_FACTOR)
-        
-        if profit_points >= CONFIG.TRAILING_STOP_MIN_PROFIT_POINTS:
-            new_sl_price = max(new_sl_price, position.sl) # Only move SL up
-            new_sl_price = round(new_sl_price, symbol_info.digits)
-
-            if new_sl_price > position.sl:
-                logging.info(f"Updating BUY position {position.ticket} SL from {position.sl:.{symbol_info.digits}f} to {new_sl_price:.{symbol_info.digits}f}")
-                request = {
-                    "action": mt5.TRADE_ACTION_SLTP,
-                    "symbol": position.symbol,
-                    "position": position.ticket,
-                    "sl": new_sl_price,
-                    "tp": position.tp,
-                    "magic": CONFIG.MAGIC_NUMBER,
-                    "deviation": CONFIG.MIN_DEVIATION,
-                    "comment": "Trailing SL"
-                }
-                result = mt5.order_send(request)
-                if result.retcode == mt5.TRADE_RETCODE_DONE:
-                    logging.info(f"SL updated successfully for position {position.ticket}.")
-                    return True
-                else:
-                    logging.error(f"Failed to update SL for position {position.ticket}: {result.comment}")
-                    return False
-    
-    elif position.type == mt5.ORDER_TYPE_SELL:
+        new_sl_price = round(max(new_sl_price, position.sl), symbol_info.digits) # Only move SL up
+        return new_sl_price if new_sl_price > position.sl else None
+
+    if position.type == mt5.ORDER_TYPE_SELL:
         # For SELL: trailing stop moves down as price goes down
         profit_points = (position.price_open - current_tick_price) / symbol_info.point
+        if profit_points < CONFIG.TRAILING_STOP_MIN_PROFIT_POINTS:
+            return None
         new_sl_price = current_tick_price + (current_atr * CONFIG.TRAILING_STOP_ATR_FACTOR)
-        
-        if profit_points >= CONFIG.TRAILING_STOP_MIN_PROFIT_POINTS:
-            new_sl_price = min(new_sl_price, position.sl) # Only move SL down
-            new_sl_price = round(new_sl_price, symbol_info.digits)
-
-            if new_sl_price < position.sl:
-                logging.info(f"Updating SELL position {position.ticket} SL from {position.sl:.{symbol_info.digits}f} to {new_sl_price:.{symbol_info.digits}f}")
-                request = {
-                    "action": mt5.TRADE_ACTION_SLTP,
-                    "symbol": position.symbol,
-                    "position": position.ticket,
-                    "sl": new_sl_price,
-                    "tp": position.tp,
-                    "magic": CONFIG.MAGIC_NUMBER,
-                    "deviation": CONFIG.MIN_DEVIATION,
-                    "comment": "Trailing SL"
-                }
-                result = mt5.order_send(request)
-                if result.retcode == mt5.TRADE_RETCODE_DONE:
-                    logging.info(f"SL updated successfully for position {position.ticket}.")
-                    return True
-                else:
-                    logging.error(f"Failed to update SL for position {position.ticket}: {result.comment}")
-                    return False
-    return False
\ No newline at end of file
+        new_sl_price = round(min(new_sl_price, position.sl), symbol_info.digits) # Only move SL down
+        return new_sl_price if new_sl_price < position.sl else None
+    return None
+
+def send_stop_update(position, symbol_info, new_sl_price):
+    """Sends a TRADE_ACTION_SLTP moving the position's SL to new_sl_price. Returns True on success."""
+    logging.info(f"Updating {'BUY' if position.type == mt5.ORDER_TYPE_BUY else 'SELL'} position {position.ticket} SL from {position.sl:.{symbol_info.digits}f} to {new_sl_price:.{symbol_info.digits}f}")
+    request = {
+        "action": mt5.TRADE_ACTION_SLTP,
+        "symbol": position.symbol,
+        "position": position.ticket,
+        "sl": new_sl_price,
+        "tp": position.tp,
+        "magic": position.magic,
+        "deviation": CONFIG.MIN_DEVIATION,
+        "comment": "Trailing SL"
+    }
+    result = send_order(request)
+    if result is not None and result.retcode == mt5.TRADE_RETCODE_DONE:
+        logging.info(f"SL updated successfully for position {position.ticket}.")
+        return True
+    logging.error(f"Failed to update SL for position {position.ticket}: {result.comment if result is not None else mt5.last_error()}")
+    return False
+
+def update_trailing_stop(position, symbol_info, current_tick_price, current_atr):
+    """
+    Updates the trailing stop loss for an open position.
+    """
+    if not CONFIG.ENABLE_TRAILING_STOP:
+        return False
+    new_sl_price = compute_trailing_stop(position, symbol_info, current_tick_price, current_atr)
+    if new_sl_price is None:
+        return False
+    return send_stop_update(position, symbol_info, new_sl_price)
+
+class StopManager:
+    """
+    Coalesces trailing-stop updates for all open positions. submit() records the latest
+    target SL per position (a newer target supersedes a pending one); flush() sends the
+    pending targets that tighten the stop by at least STOP_MIN_STEP_POINTS, at most one
+    modification per position every STOP_MIN_INTERVAL_MS. Throttled targets stay pending
+    until their interval has passed; targets below the step are dropped, and so are targets
+    that would not tighten the stop beyond the last one sent (the snapshot can be older).
+    """
+
+    def __init__(self, min_step_points=None, min_interval_ms=None, clock=time.monotonic):
+        self.min_step_points = CONFIG.STOP_MIN_STEP_POINTS if min_step_points is None else min_step_points
+        self.min_interval = (CONFIG.STOP_MIN_INTERVAL_MS if min_interval_ms is None else min_interval_ms) / 1000.0
+        self.clock = clock
+        self._pending = {} # ticket -> (position, symbol_info, target SL)
+        self._last_sent = {} # ticket -> (send time, SL sent)
+        self.counters = {'submitted': 0, 'superseded': 0, 'below_step': 0, 'throttled': 0, 'sent': 0, 'failed': 0}
+
+    def submit(self, position, symbol_info, current_tick_price, current_atr):
+        """Computes the position's trailing SL and queues it. Returns True if a target is pending."""
+        new_sl_price = compute_trailing_stop(position, symbol_info, current_tick_price, current_atr)
+        if new_sl_price is None:
+            return position.ticket in self._pending
+        self.counters['submitted'] += 1
+        if position.ticket in self._pending:
+            self.counters['superseded'] += 1
+        self._pending[position.ticket] = (position, symbol_info, new_sl_price)
+        return True
+
+    def flush(self, open_tickets=None):
+        """Sends the due pending updates. Returns the number of modifications sent successfully."""
+        if open_tickets is not None:
+            for ticket in [ticket for ticket in self._last_sent if ticket not in open_tickets]:
+                del self._last_sent[ticket]
+        now = self.clock()
+        sent = 0
+        for ticket, (position, symbol_info, new_sl_price) in list(self._pending.items()):
+            if open_tickets is not None and ticket not in open_tickets:
+                del self._pending[ticket]
+                continue
+            last = self._last_sent.get(ticket)
+            current_sl = position.sl
+            if last is not None:
+                # The snapshot may predate our last modification
+                current_sl = max(current_sl, last[1]) if position.type == mt5.ORDER_TYPE_BUY else min(current_sl, last[1])
+            improvement = new_sl_price - current_sl if position.type == mt5.ORDER_TYPE_BUY else current_sl - new_sl_price
+            if improvement <= 0:
+                # Computed from a stale snapshot: a stop already sent is at least as tight
+                self.counters['superseded'] += 1
+                del self._pending[ticket]
+                continue
+            if improvement / symbol_info.point < self.min_step_points:
+                self.counters['below_step'] += 1
+                del self._pending[ticket]
+                continue
+            if last is not None and now - last[0] < self.min_interval:
+                self.counters['throttled'] += 1
+                continue
+            del self._pending[ticket]
+            if send_stop_update(position, symbol_info, new_sl_price):
+                self._last_sent[ticket] = (now, new_sl_price)
+                self.counters['sent'] += 1
+                sent += 1
+            else:
+                self.counters['failed'] += 1
+        return sent
+
+    def __len__(self):
+        return len(self._pending)
+
+# Shared by the engines that manage stops on every tick
+stop_manager = StopManager()
+register_gauge('pending_stop_updates', lambda: len(stop_manager), "Trailing-stop updates waiting for their step or rate limit.")
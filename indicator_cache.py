@@ -0,0 +1,92 @@
+import hashlib
+import logging
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+from . import numpy_indicators as npi
+
+# Indicator columns keyed by (indicator, length, data hash), shared by every parameter
+# set and fold evaluated on the same dataset. Bounded by total array bytes with LRU eviction.
+# The data hash of a close array is remembered through a weak reference, so the cache never
+# keeps a dataset (e.g. a walk-forward window) alive after its caller dropped it.
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_INDICATORS = {
+    'sma': lambda bars, length: npi.sma(bars['close'], length),
+    'atr': lambda bars, length: npi.atr(bars['high'], bars['low'], bars['close'], length),
+    'rsi': lambda bars, length: npi.rsi(bars['close'], length),
+}
+
+def dataset_hash(bars):
+    """Content hash of the OHLC columns of `bars` (see backtest.load_ohlcv)."""
+    digest = hashlib.blake2b(digest_size=16)
+    for col in ('time', 'open', 'high', 'low', 'close'):
+        digest.update(memoryview(np.ascontiguousarray(bars[col])).cast('B'))
+    return digest.hexdigest()
+
+class IndicatorCache:
+    """LRU cache of read-only indicator arrays, bounded to `max_bytes`."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._hashes = {} # id(close array) -> (weakref to the array, hash); dropped with the array
+
+    def get(self, indicator, length, bars):
+        """Returns the `indicator` ('sma', 'atr' or 'rsi') series of `length` over `bars`."""
+        key = (indicator, int(length), self._hash(bars))
+        values = self._entries.get(key)
+        if values is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return values
+
+        self.misses += 1
+        values = _INDICATORS[indicator](bars, int(length))
+        values.flags.writeable = False
+        self._entries[key] = values
+        self.bytes += values.nbytes
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= evicted.nbytes
+            self.evictions += 1
+        return values
+
+    def clear(self):
+        self._entries.clear()
+        self._hashes.clear()
+        self.bytes = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def _hash(self, bars):
+        close = bars['close']
+        key = id(close)
+        known = self._hashes.get(key)
+        if known is not None and known[0]() is close:
+            return known[1]
+        data_hash = dataset_hash(bars)
+
+        def forget(ref, hashes=self._hashes):
+            if hashes.get(key, (None,))[0] is ref:
+                del hashes[key]
+
+        self._hashes[key] = (weakref.ref(close, forget), data_hash)
+        logging.debug(f"Indicator cache registered dataset {data_hash} ({len(close)} bars).")
+        return data_hash
@@ -1,26 +1,69 @@
 import pandas as pd
-import pandas_ta as ta
+import numpy as np
 import logging
 from .config import CONFIG
+from . import numpy_indicators as npi
 
-def calculate_all_indicators(df):
-    """Calculates all required technical indicators and adds them to the DataFrame."""
+# pandas_ta is slow to import and only needed when INDICATOR_BACKEND is "pandas_ta"
+# (or for parity checks), so it is loaded on first use.
+_pandas_ta = None
+
+def _get_pandas_ta():
+    global _pandas_ta
+    if _pandas_ta is None:
+        import pandas_ta
+        _pandas_ta = pandas_ta
+    return _pandas_ta
+
+def _add_indicators_pandas_ta(df):
+    ta = _get_pandas_ta()
+
+    # Simple Moving Averages (SMA)
+    df['sma_fast'] = ta.sma(df['close'], length=CONFIG.SMA_FAST_LENGTH)
+    df['sma_slow'] = ta.sma(df['close'], length=CONFIG.SMA_SLOW_LENGTH)
+    df['sma_trend'] = ta.sma(df['close'], length=CONFIG.SMA_TREND_LENGTH)
+
+    # Average True Range (ATR)
+    df['atr'] = ta.atr(df['high'], df['low'], df['close'], length=CONFIG.ATR_PERIOD)
+
+    # Relative Strength Index (RSI) if enabled
+    if CONFIG.ENABLE_RSI_FILTER:
+        df['rsi'] = ta.rsi(df['close'], length=CONFIG.RSI_PERIOD)
+
+def _add_indicators_numpy(df):
+    close = df['close'].to_numpy(dtype=np.float64)
+    high = df['high'].to_numpy(dtype=np.float64)
+    low = df['low'].to_numpy(dtype=np.float64)
+
+    df['sma_fast'] = npi.sma(close, CONFIG.SMA_FAST_LENGTH)
+    df['sma_slow'] = npi.sma(close, CONFIG.SMA_SLOW_LENGTH)
+    df['sma_trend'] = npi.sma(close, CONFIG.SMA_TREND_LENGTH)
+    df['atr'] = npi.atr(high, low, close, CONFIG.ATR_PERIOD)
+    if CONFIG.ENABLE_RSI_FILTER:
+        df['rsi'] = npi.rsi(close, CONFIG.RSI_PERIOD)
+
+_BACKENDS = {
+    'numpy': _add_indicators_numpy,
+    'pandas_ta': _add_indicators_pandas_ta,
+}
+
+def calculate_all_indicators(df, backend=None):
+    """
+    Calculates all required technical indicators and adds them to the DataFrame.
+    `backend` defaults to CONFIG.INDICATOR_BACKEND ("numpy" or "pandas_ta").
+    """
     if df.empty:
         logging.warning("DataFrame is empty, cannot calculate indicators.")
         return df
 
-    try:
-        # Simple Moving Averages (SMA)
-        df['sma_fast'] = ta.sma(df['close'], length=CONFIG.SMA_FAST_LENGTH)
-        df['sma_slow'] = ta.sma(df['close'], length=CONFIG.SMA_SLOW_LENGTH)
-        df['sma_trend'] = ta.sma(df['close'], length=CONFIG.SMA_TREND_LENGTH)
-
-        # Average True Range (ATR)
-        df['atr'] = ta.atr(df['high'], df['low'], df['close'], length=CONFIG.ATR_PERIOD)
+    backend = backend or CONFIG.INDICATOR_BACKEND
+    add_indicators = _BACKENDS.get(backend)
+    if add_indicators is None:
+        logging.error(f"Unknown indicator backend '{backend}'. Expected one of: {', '.join(_BACKENDS)}.")
+        return pd.DataFrame()
 
-        # Relative Strength Index (RSI) if enabled
-        if CONFIG.ENABLE_RSI_FILTER:
-            df['rsi'] = ta.rsi(df['close'], length=CONFIG.RSI_PERIOD)
+    try:
+        add_indicators(df)
 
         # Drop rows with NaN values resulting from indicator calculations
         df.dropna(inplace=True)
@@ -28,7 +71,7 @@ def calculate_all_indicators(df):
         if df.empty:
             logging.warning("DataFrame became empty after dropping NaN rows. Not enough data for indicators.")
             return df
-        
+
         # Validate that essential columns exist after calculation and dropping NaNs
         required_cols = ['sma_fast', 'sma_slow', 'sma_trend', 'atr']
         if CONFIG.ENABLE_RSI_FILTER:
@@ -39,9 +82,36 @@ def calculate_all_indicators(df):
                 logging.error(f"Indicator calculation failed: Required column '{col}' is missing or all NaN values after calculation.")
                 return pd.DataFrame() # Return empty DataFrame to signal failure
 
-        logging.debug(f"Indicators calculated. DataFrame tail:\n{df.tail(2)}")
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            # Rendering the tail is expensive; skipped unless DEBUG output is enabled
+            logging.debug("Indicators calculated. DataFrame tail:\n%s", df.tail(2).to_string())
         return df.copy() # Return a copy to prevent SettingWithCopyWarning
-    
+
     except Exception as e:
         logging.error(f"Error calculating indicators: {e}")
-        return pd.DataFrame()
\ No newline at end of file
+        return pd.DataFrame()
+
+def compare_backends(df, tolerance=1e-9):
+    """
+    Parity check of the NumPy backend against the pandas_ta reference implementation.
+    Returns a dict of the maximum absolute difference per indicator column and logs
+    an error for every column that differs by more than `tolerance` (or in NaN layout).
+    """
+    reference = df[['open', 'high', 'low', 'close']].copy()
+    candidate = reference.copy()
+    _add_indicators_pandas_ta(reference)
+    _add_indicators_numpy(candidate)
+
+    differences = {}
+    for col in reference.columns.difference(['open', 'high', 'low', 'close']):
+        ref_values = reference[col].to_numpy(dtype=np.float64)
+        new_values = candidate[col].to_numpy(dtype=np.float64)
+        if not np.array_equal(np.isnan(ref_values), np.isnan(new_values)):
+            logging.error(f"Indicator backend parity: '{col}' has a different NaN layout.")
+            differences[col] = float('inf')
+            continue
+        diff = np.abs(ref_values - new_values)
+        differences[col] = float(np.nanmax(diff)) if np.isfinite(diff).any() else 0.0
+        if differences[col] > tolerance:
+            logging.error(f"Indicator backend parity: '{col}' differs by {differences[col]:.3e} (tolerance {tolerance:.1e}).")
+    return differences
@@ -1,13 +1,50 @@
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
 import os
 
+from .config import CONFIG
+
+# Logging is non-blocking for the trading threads: the root logger only has a QueueHandler,
+# and a QueueListener thread does the formatting and the console/file writes. The log file
+# rotates at LOG_MAX_BYTES, keeping LOG_BACKUP_COUNT old files. The root level is the lowest
+# handler level, so with LOG_FILE_LEVEL above DEBUG, debug calls are dropped before a record
+# is even created; hot paths guard their debug output with isEnabledFor(logging.DEBUG).
+
+_listener = None
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queues the record itself; its message is formatted on the listener thread.
+    (The stdlib QueueHandler formats in the logging thread.) Arguments passed to a
+    logging call must therefore not be mutated after the call.
+    """
+
+    def prepare(self, record):
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None # Tracebacks keep frames alive; the text is enough
+        return record
+
+def stop_logging():
+    """Stops the listener thread after it has written every queued record."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
 def setup_logging(log_file='bot_log.log'):
     """
     Sets up the logging configuration for the bot.
-    Logs INFO and above to console, DEBUG and above to file.
+    Logs INFO and above to console, LOG_FILE_LEVEL (DEBUG) and above to a rotating file,
+    both written by a background thread.
     Ensures no duplicate handlers on re-run in environments like notebooks.
     """
+    global _listener
     logger = logging.getLogger()
 
     # Remove all existing handlers to prevent duplicate logs on re-runs
@@ -15,21 +52,32 @@ def setup_logging(log_file='bot_log.log'):
         logger.removeHandler(handler)
         if isinstance(handler, logging.FileHandler):
             handler.close() # Close file handlers to release file locks
-
-    logger.setLevel(logging.DEBUG) # Overall lowest level for the logger
+    stop_logging()
 
     # Console Handler (INFO and above)
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
     console_formatter = logging.Formatter('%(asctime)s | %(levelname)s | %(message)s')
     console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
 
-    # File Handler (DEBUG and above)
-    file_handler = logging.FileHandler(log_file, mode='a', encoding='utf-8')
-    file_handler.setLevel(logging.DEBUG)
+    # File Handler (LOG_FILE_LEVEL and above), rotated by size
+    file_level = logging.getLevelName(str(CONFIG.get('LOG_FILE_LEVEL', 'DEBUG')).upper())
+    if not isinstance(file_level, int):
+        file_level = logging.DEBUG
+    file_handler = logging.handlers.RotatingFileHandler(log_file, mode='a', encoding='utf-8',
+                                                        maxBytes=CONFIG.get('LOG_MAX_BYTES', 10485760),
+                                                        backupCount=CONFIG.get('LOG_BACKUP_COUNT', 5))
+    file_handler.setLevel(file_level)
     file_formatter = logging.Formatter('%(asctime)s | %(levelname)s | %(filename)s:%(lineno)d | %(message)s')
     file_handler.setFormatter(file_formatter)
-    logger.addHandler(file_handler)
 
-    logging.info("Logging configured successfully.")
\ No newline at end of file
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    _listener.start()
+    logger.addHandler(_DeferredQueueHandler(log_queue))
+    logger.setLevel(min(console_handler.level, file_handler.level)) # Overall lowest level for the logger
+
+    logging.info("Logging configured successfully.")
+
+# Registered after logging's own shutdown hook, so it runs first and drains the queue
+atexit.register(stop_logging)
@@ -1,21 +1,26 @@
 import time
+import datetime
 import traceback
 import logging
-import MetaTrader5 as mt5
+from .mt5_api import mt5
 
 
 # Import modules from your project structure
 from .logger import setup_logging
 from .config import CONFIG
-from .constants import SIGNAL_HOLD, SIGNAL_BUY, SIGNAL_SELL, MT5_TIMEZONE
-from .mt5_utils import initialize_mt5, shutdown_mt5, get_symbol_info, get_open_position, get_current_tick, get_mt5_timeframe, get_mt5_current_time
-from .data import get_historical_data
+from .constants import SIGNAL_HOLD, SIGNAL_BUY, SIGNAL_SELL, MT5_TIMEZONE, TIMEFRAME_DURATIONS_SECONDS
+from .mt5_utils import initialize_mt5, shutdown_mt5, get_symbol_info, get_open_position, get_current_tick, get_mt5_timeframe, get_mt5_current_time, positions_snapshot, deal_confirmations
+from .data import get_historical_data, get_bar_cache, HISTORY_BUFFER_BARS
 from .indicators import calculate_all_indicators
-from .strategy import generate_signal
+from .streaming_indicators import IndicatorEngine
+from .strategy import generate_signal, evaluate_signal
 from .execution import execute_trade, close_position, update_trailing_stop
-from .risk import daily_profit_loss, check_and_reset_daily_pnl, update_daily_pnl_from_closed_deals, check_daily_limits, check_atr_for_trade
+from .risk import daily_profit_loss, check_and_reset_daily_pnl, update_daily_pnl_from_closed_deals, check_daily_limits, check_atr_for_trade, equity_monitor
 from .trade_logger import trade_csv_logger
-from .utils import sleep_until_next_candle
+from .utils import sleep_until_next_candle, CandleCloseDetector
+from .portfolio import run_portfolio
+from .async_engine import run_async_engine
+from .metrics import CycleTimer, inc, register_gauge, start_metrics_server
 
 def main_loop():
     """Main loop for the trading bot."""
@@ -33,14 +38,60 @@ def main_loop():
         shutdown_mt5()
         return
 
+    # Streaming mode keeps indicator state across cycles and only feeds newly closed bars.
+    indicator_engine = IndicatorEngine() if CONFIG.USE_STREAMING_INDICATORS else None
+
+    # The candle-close detector waits for the server's new bar instead of the local clock.
+    candle_detector = CandleCloseDetector(CONFIG.SYMBOL, mt5_timeframe, CONFIG.TIMEFRAME) if CONFIG.USE_CANDLE_CLOSE_DETECTOR else None
+
+    # Stage timings for the metrics endpoint; a cycle longer than the candle interval is an overrun
+    cycle_timer = CycleTimer('main_loop', TIMEFRAME_DURATIONS_SECONDS.get(CONFIG.TIMEFRAME))
+    register_gauge('open_positions', lambda: len(positions_snapshot), "Open positions in the last snapshot.")
+
+    # While waiting for the next candle the loop keeps watching the open positions every
+    # TICK_INTERVAL_MS (on this thread: MT5 calls are not thread-safe), so the equity
+    # monitor reacts to floating losses within a tick interval instead of a candle.
+    tick_interval = CONFIG.TICK_INTERVAL_MS / 1000.0
+    next_tick_at = 0.0
+
+    def between_candles():
+        nonlocal next_tick_at
+        now = time.monotonic()
+        try:
+            deal_confirmations.poll() # Resolves sent deals as soon as they are in the history
+            if now >= next_tick_at:
+                next_tick_at = now + tick_interval
+                if CONFIG.EQUITY_MONITOR_ENABLED:
+                    positions_snapshot.refresh()
+                    equity_monitor.update()
+        except Exception as e:
+            logging.error(f"Error while monitoring positions between candles: {e}")
+        wait = next_tick_at - time.monotonic()
+        confirmation_due = deal_confirmations.seconds_until_due()
+        return wait if confirmation_due is None else min(wait, confirmation_due)
+
+    def wait_for_next_candle(current_mt5_time):
+        cycle_timer.finish()
+        if candle_detector is not None:
+            candle_detector.wait_for_close(between_candles)
+        else:
+            sleep_until_next_candle(current_mt5_time, CONFIG.TIMEFRAME, between_candles)
+
     logging.info(f"🚀 Bot started for {CONFIG.SYMBOL} on {CONFIG.TIMEFRAME} timeframe.")
     logging.info("Waiting for the next candle to check for a trading signal...")
 
     while True:
         try:
+            cycle_timer.start()
             current_mt5_time = get_mt5_current_time()
 
+            # One positions_get per cycle; get_open_position reads from this snapshot
+            cycle_timer.stage('positions_snapshot')
+            positions_snapshot.refresh()
+            deal_confirmations.poll()
+
             # --- 1. Daily P/L Management & Limits ---
+            cycle_timer.stage('daily_pnl')
             # Check and reset P/L at start of new day.
             # `indicator_data_at_signal` is passed empty here as no signal is generated yet.
             check_and_reset_daily_pnl(current_mt5_time, {}) 
@@ -48,11 +99,14 @@ def main_loop():
             # Always update daily P/L from closed deals at the start of each cycle
             # This ensures it's current for risk checks and logging.
             update_daily_pnl_from_closed_deals()
+            if CONFIG.EQUITY_MONITOR_ENABLED:
+                equity_monitor.update() # Floating P/L of open positions counts towards the loss limit
             
             # Check if daily loss/profit limits are reached before proceeding
             # `indicator_data_at_signal` is passed empty here as no signal is generated yet.
             if check_daily_limits({}):
                 logging.info("Daily limits reached. No new trades today. Monitoring existing positions if any.")
+                cycle_timer.stage('position_management')
                 # If a limit is reached, we still want to manage existing positions and trail stops
                 open_pos = get_open_position(CONFIG.SYMBOL, CONFIG.MAGIC_NUMBER)
                 if open_pos:
@@ -61,32 +115,57 @@ def main_loop():
                         current_price = tick_info.bid if open_pos.type == mt5.ORDER_TYPE_SELL else tick_info.ask
                         # Update trailing stop for the existing position
                         # We need current ATR for trailing stop. Fetch minimal data for it.
-                        df_minimal = get_historical_data(CONFIG.SYMBOL, mt5_timeframe, CONFIG.TIMEFRAME, 50)
+                        df_minimal = get_historical_data(CONFIG.SYMBOL, mt5_timeframe, CONFIG.TIMEFRAME, 50, closed_only=True)
                         df_processed_minimal = calculate_all_indicators(df_minimal)
                         if not df_processed_minimal.empty:
                             current_atr_for_ts = df_processed_minimal['atr'].iloc[-1]
                             update_trailing_stop(open_pos, symbol_info, current_price, current_atr_for_ts)
                 
-                sleep_until_next_candle(current_mt5_time, CONFIG.TIMEFRAME)
+                wait_for_next_candle(current_mt5_time)
                 continue # Skip to next iteration
 
+            # Symbol properties can change during the session; refreshed within the cache TTL
+            symbol_info = get_symbol_info(CONFIG.SYMBOL) or symbol_info
+
             # --- 2. Fetch Data and Calculate Indicators ---
-            df = get_historical_data(CONFIG.SYMBOL, mt5_timeframe, CONFIG.TIMEFRAME, CONFIG.DATA_BARS_TO_FETCH)
-            if df.empty:
-                logging.error("No valid data for signal check. Retrying in next cycle.")
-                sleep_until_next_candle(current_mt5_time, CONFIG.TIMEFRAME)
-                continue
-            
-            df_processed = calculate_all_indicators(df.copy())
-            if df_processed.empty:
-                logging.error("Failed to process indicators. Retrying in next cycle.")
-                sleep_until_next_candle(current_mt5_time, CONFIG.TIMEFRAME)
-                continue
+            cycle_timer.stage('data_fetch')
+            if indicator_engine is not None:
+                bar_cache = get_bar_cache(CONFIG.SYMBOL, mt5_timeframe, CONFIG.TIMEFRAME,
+                                          CONFIG.DATA_BARS_TO_FETCH + HISTORY_BUFFER_BARS)
+                if not bar_cache.refresh():
+                    logging.error("No valid data for signal check. Retrying in next cycle.")
+                    wait_for_next_candle(current_mt5_time)
+                    continue
+
+                cycle_timer.stage('indicators')
+                indicator_engine.sync(bar_cache)
+                if not indicator_engine.ready:
+                    logging.error("Not enough closed bars for streaming indicators. Retrying in next cycle.")
+                    wait_for_next_candle(current_mt5_time)
+                    continue
+
+                current_price = indicator_engine.last_bar['close']
+                current_atr = indicator_engine.last_bar['atr']
+            else:
+                # Closed bars only, like the streaming engine: both paths evaluate the same bar
+                df = get_historical_data(CONFIG.SYMBOL, mt5_timeframe, CONFIG.TIMEFRAME, CONFIG.DATA_BARS_TO_FETCH, closed_only=True)
+                if df.empty:
+                    logging.error("No valid data for signal check. Retrying in next cycle.")
+                    wait_for_next_candle(current_mt5_time)
+                    continue
+
+                cycle_timer.stage('indicators')
+                df_processed = calculate_all_indicators(df.copy())
+                if df_processed.empty:
+                    logging.error("Failed to process indicators. Retrying in next cycle.")
+                    wait_for_next_candle(current_mt5_time)
+                    continue
 
-            current_price = df_processed['close'].iloc[-1]
-            current_atr = df_processed['atr'].iloc[-1]
+                current_price = df_processed['close'].iloc[-1]
+                current_atr = df_processed['atr'].iloc[-1]
             
             # --- 3. Manage Open Positions (if any) ---
+            cycle_timer.stage('position_management')
             open_pos = get_open_position(CONFIG.SYMBOL, CONFIG.MAGIC_NUMBER)
             if open_pos:
                 logging.info(f"Position {open_pos.ticket} is open by this bot. Current daily P/L: {daily_profit_loss[0]:.2f}.")
@@ -99,28 +178,44 @@ def main_loop():
 
                 # We could add logic here to close position on reversal signal,
                 # but for this iteration, we'll keep it simple and let SL/TP manage it.
-                sleep_until_next_candle(current_mt5_time, CONFIG.TIMEFRAME)
+                wait_for_next_candle(current_mt5_time)
                 continue # Skip signal generation and new trade execution if a position is already open
 
             # --- 4. Generate Signal ---
-            signal, indicator_data_at_signal = generate_signal(df_processed)
+            cycle_timer.stage('signal')
+            if indicator_engine is not None:
+                bar_label = datetime.datetime.fromtimestamp(indicator_engine.last_time, tz=datetime.timezone.utc)
+                signal, indicator_data_at_signal = evaluate_signal(indicator_engine.last_bar, indicator_engine.prev_bar, bar_label)
+            else:
+                signal, indicator_data_at_signal = generate_signal(df_processed)
+            signal_time = time.time()
+
+            if candle_detector is not None:
+                latency = candle_detector.record_signal()
+                if latency is not None:
+                    logging.debug(f"Close-to-signal latency: {latency * 1000:.0f} ms.")
             
             logging.info(f"Signal Check: {'BUY' if signal == SIGNAL_BUY else 'SELL' if signal == SIGNAL_SELL else 'HOLD'} | Current Price: {current_price:.5f} | ATR: {current_atr:.5f}")
 
             # --- 5. Risk Check (ATR) ---
+            cycle_timer.stage('risk_check')
             if not check_atr_for_trade(current_atr):
-                sleep_until_next_candle(current_mt5_time, CONFIG.TIMEFRAME)
+                wait_for_next_candle(current_mt5_time)
                 continue
 
             # --- 6. Execute Trade if Signal is BUY or SELL ---
+            cycle_timer.stage('execution')
             if signal != SIGNAL_HOLD:
-                execute_trade(symbol_info, signal, current_atr, indicator_data_at_signal, daily_profit_loss)
+                execute_trade(symbol_info, signal, current_atr, indicator_data_at_signal, daily_profit_loss,
+                              signal_price=current_price, signal_time=signal_time)
             
             # --- 7. Wait for next candle ---
-            sleep_until_next_candle(current_mt5_time, CONFIG.TIMEFRAME)
+            wait_for_next_candle(current_mt5_time)
 
         except Exception as e:
             logging.error(f"An unexpected error occurred in the main loop: {e}")
+            cycle_timer.finish()
+            inc('cycle_errors_total', cycle='main_loop')
             logging.error(f"Traceback:\n{traceback.format_exc()}")
             
             # Log unhandled exception to CSV
@@ -140,12 +235,28 @@ def main_loop():
             time.sleep(60) # Sleep longer on error to prevent rapid failures
 
 
+def run_engine():
+    """
+    Runs the engine selected by CONFIG.ENGINE: "loop" (CONFIG.SYMBOL only), "portfolio"
+    (CONFIG.SYMBOLS) or "async" (CONFIG.SYMBOLS with tick-driven position management).
+    """
+    start_metrics_server()
+    if CONFIG.ENGINE == 'portfolio':
+        if initialize_mt5():
+            run_portfolio()
+    elif CONFIG.ENGINE == 'async':
+        if initialize_mt5():
+            run_async_engine()
+    else:
+        main_loop()
+
+
 if __name__ == "__main__":
     setup_logging() # Configure logging first
     trade_csv_logger._ensure_header() # Ensure CSV header is present at startup
 
     try:
-        main_loop()
+        run_engine()
     except KeyboardInterrupt:
         logging.info("Bot stopped by user (KeyboardInterrupt).")
     finally:
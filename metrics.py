@@ -0,0 +1,204 @@
+import logging
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .config import CONFIG
+from .mt5_api import get_call_stats
+
+# Process metrics in Prometheus text format, served on a local HTTP endpoint
+# (METRICS_HOST:METRICS_PORT/metrics, port 0 disables it).
+#
+# - Stage timers: CycleTimer splits one engine cycle into named stages measured with
+#   time.perf_counter; every stage keeps a rolling window of METRICS_WINDOW samples for
+#   percentiles plus a running sum/count. A cycle whose work exceeds its budget (the
+#   candle interval) counts as an overrun.
+# - Counters and gauges: inc() / register_gauge(), e.g. scheduler and executor queue depths.
+# - MT5 API call latencies from mt5_api.get_call_stats().
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+_timers = {} # (cycle, stage) -> StageStats
+_counters = {} # (name, labels) -> value
+_gauges = {} # name -> (func, help, label)
+_server = None
+
+def percentile(ordered, q):
+    """Nearest-rank q-quantile (0 <= q <= 1) of a non-empty sorted sequence."""
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class StageStats:
+    """Rolling window and running totals of one stage's durations (seconds)."""
+    __slots__ = ('window', 'count', 'total')
+
+    def __init__(self, window):
+        self.window = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.window.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def quantiles(self):
+        ordered = sorted(self.window)
+        if not ordered:
+            return {}
+        return {q: percentile(ordered, q) for q in QUANTILES}
+
+def observe(cycle, stage, seconds):
+    """Records one duration of `stage` in `cycle`."""
+    stats = _timers.get((cycle, stage))
+    if stats is None:
+        stats = _timers[(cycle, stage)] = StageStats(CONFIG.get('METRICS_WINDOW', 1000))
+    stats.observe(seconds)
+
+def inc(name, value=1, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    _counters[key] = _counters.get(key, 0) + value
+
+def register_gauge(name, func, help_text='', label=None):
+    """
+    Registers a gauge read at scrape time. `func()` returns a number, or a dict
+    {label value: number} when `label` names the label.
+    """
+    _gauges[name] = (func, help_text, label)
+
+class CycleTimer:
+    """
+    Times the stages of one engine cycle: stage(name) ends the running stage and starts
+    the next, finish() ends the cycle and records its total and any budget overrun.
+    """
+
+    def __init__(self, cycle, budget_seconds=None):
+        self.cycle = cycle
+        self.budget = budget_seconds
+        self.started = None
+        self._stage = None
+        self._stage_started = None
+
+    def start(self):
+        """Starts a cycle; an unfinished previous cycle (e.g. after an exception) is discarded."""
+        self.started = self._stage_started = time.perf_counter()
+        self._stage = None
+
+    def stage(self, name):
+        now = time.perf_counter()
+        if self.started is None:
+            self.started = now
+        elif self._stage is not None:
+            observe(self.cycle, self._stage, now - self._stage_started)
+        self._stage = name
+        self._stage_started = now
+
+    def finish(self):
+        """Ends the cycle; returns its duration in seconds (None if it was not started)."""
+        if self.started is None:
+            return None
+        now = time.perf_counter()
+        if self._stage is not None:
+            observe(self.cycle, self._stage, now - self._stage_started)
+        elapsed = now - self.started
+        observe(self.cycle, 'total', elapsed)
+        if self.budget is not None and elapsed > self.budget:
+            inc('cycle_overruns_total', cycle=self.cycle)
+            logging.warning(f"{self.cycle} cycle took {elapsed:.2f}s, over its {self.budget:.0f}s budget.")
+        self.started = self._stage = None
+        return elapsed
+
+def _labels(pairs):
+    return '{' + ','.join(f'{key}="{value}"' for key, value in pairs) + '}' if pairs else ''
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format."""
+    lines = ['# HELP bot_stage_duration_seconds Duration of engine cycle stages (rolling window quantiles).',
+             '# TYPE bot_stage_duration_seconds summary']
+    for (cycle, stage), stats in sorted(_timers.items()):
+        labels = (('cycle', cycle), ('stage', stage))
+        for q, value in stats.quantiles().items():
+            lines.append(f"bot_stage_duration_seconds{_labels(labels + (('quantile', q),))} {value:.6f}")
+        lines.append(f"bot_stage_duration_seconds_sum{_labels(labels)} {stats.total:.6f}")
+        lines.append(f"bot_stage_duration_seconds_count{_labels(labels)} {stats.count}")
+
+    for name in sorted({name for name, _ in _counters}):
+        lines.append(f"# TYPE bot_{name} counter")
+        for (counter, labels), value in sorted(_counters.items()):
+            if counter == name:
+                lines.append(f"bot_{name}{_labels(labels)} {value}")
+
+    for name, (func, help_text, label) in sorted(_gauges.items()):
+        try:
+            value = func()
+        except Exception as e:
+            logging.debug(f"Gauge {name} failed: {e}")
+            continue
+        if help_text:
+            lines.append(f"# HELP bot_{name} {help_text}")
+        lines.append(f"# TYPE bot_{name} gauge")
+        if isinstance(value, dict):
+            for label_value, number in sorted(value.items(), key=lambda item: str(item[0])):
+                lines.append(f"bot_{name}{_labels(((label, label_value),))} {number}")
+        else:
+            lines.append(f"bot_{name} {value}")
+
+    call_stats = get_call_stats()
+    if call_stats:
+        lines += ['# HELP bot_mt5_call_duration_seconds Latency of MetaTrader5 API calls (histogram quantiles).',
+                  '# TYPE bot_mt5_call_duration_seconds summary']
+        for call, row in sorted(call_stats.items()):
+            for q, key in ((0.5, 'p50_ms'), (0.9, 'p90_ms'), (0.99, 'p99_ms')):
+                lines.append(f"bot_mt5_call_duration_seconds{_labels((('call', call), ('quantile', q)))} {row[key] / 1000.0:.6f}")
+            lines.append(f"bot_mt5_call_duration_seconds_sum{_labels((('call', call),))} {row['mean_ms'] * row['calls'] / 1000.0:.6f}")
+            lines.append(f"bot_mt5_call_duration_seconds_count{_labels((('call', call),))} {row['calls']}")
+        lines.append('# TYPE bot_mt5_call_failures_total counter')
+        for call, row in sorted(call_stats.items()):
+            lines.append(f"bot_mt5_call_failures_total{_labels((('call', call),))} {row['failures']}")
+        lines.append('# TYPE bot_mt5_call_retcodes_total counter')
+        for call, row in sorted(call_stats.items()):
+            for retcode, count in sorted(row['retcodes'].items()):
+                lines.append(f"bot_mt5_call_retcodes_total{_labels((('call', call), ('retcode', retcode)))} {count}")
+    return '\n'.join(lines) + '\n'
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Scrapes would flood the bot log
+
+def start_metrics_server(host=None, port=None):
+    """Serves /metrics on a daemon thread. Returns the server, or None if disabled or the port is taken."""
+    global _server
+    if _server is not None:
+        return _server
+    host = host or CONFIG.get('METRICS_HOST', '127.0.0.1')
+    port = CONFIG.get('METRICS_PORT', 0) if port is None else port
+    if not port:
+        return None
+    try:
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logging.warning(f"Metrics endpoint not started on {host}:{port}: {e}")
+        return None
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name='metrics-http', daemon=True).start()
+    logging.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    return _server
+
+def stop_metrics_server():
+    global _server
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
@@ -0,0 +1,180 @@
+import importlib
+import logging
+import math
+import os
+import time
+
+from .config import CONFIG
+
+# Single access point to the MetaTrader5 API. Modules use `from .mt5_api import mt5`
+# instead of importing MetaTrader5 directly, so the backend can be the real terminal
+# package, the local simulator (mt5_sim) or any object with the same API
+# (e.g. a sim_broker.SimulatedBroker in the backtester).
+#
+# The backend is chosen by the MT5_BACKEND environment variable or config key:
+#   "metatrader5" - the MetaTrader5 package (Windows terminal), the default
+#   "sim"         - mt5_sim, a local stand-in with synthetic or replayed prices
+# The simulator is only ever used when selected: a missing or broken MetaTrader5
+# install is an error, never a silent switch to simulated trading.
+#
+# With MT5_INSTRUMENTATION enabled every API function is wrapped to record its latency
+# in a log-linear (HDR-style) histogram, plus call counts, result retcodes and the
+# last_error() codes of failed (None) calls. Recording is a few list/dict increments
+# without locks; get_call_stats() / dump_call_stats() read the numbers on demand.
+
+BACKENDS = ('metatrader5', 'sim')
+
+# Latency buckets: LATENCY_SUB_BUCKETS per power of two of microseconds (at most 6.25% wide)
+LATENCY_SUB_BUCKETS = 16
+_MAX_EXPONENT = 40
+
+_backend = None
+_call_stats = {} # function name -> CallStats
+
+class CallStats:
+    """Latency histogram and result counters of one MT5 API function."""
+    __slots__ = ('name', 'calls', 'failures', 'total_us', 'max_us', 'buckets', 'retcodes', 'last_errors')
+
+    def __init__(self, name):
+        self.name = name
+        self.reset()
+
+    def reset(self):
+        """Clears the counters and the histogram (the instrumented wrappers keep this object)."""
+        self.calls = 0
+        self.failures = 0 # calls that returned None
+        self.total_us = 0.0
+        self.max_us = 0.0
+        self.buckets = [0] * ((_MAX_EXPONENT + 1) * LATENCY_SUB_BUCKETS)
+        self.retcodes = {} # retcode -> count, for results with a retcode (order_send, order_check)
+        self.last_errors = {} # last_error() code -> count, for failed calls
+
+    def record(self, elapsed_us):
+        self.calls += 1
+        self.total_us += elapsed_us
+        if elapsed_us > self.max_us:
+            self.max_us = elapsed_us
+        mantissa, exponent = math.frexp(elapsed_us if elapsed_us > 1.0 else 1.0)
+        if exponent > _MAX_EXPONENT:
+            exponent, mantissa = _MAX_EXPONENT, 0.999
+        self.buckets[exponent * LATENCY_SUB_BUCKETS + int((mantissa - 0.5) * 2 * LATENCY_SUB_BUCKETS)] += 1
+
+    def percentile(self, q):
+        """Upper bound (microseconds) of the bucket holding the q-th percentile (0-100)."""
+        if not self.calls:
+            return 0.0
+        rank = max(1, math.ceil(self.calls * q / 100.0))
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                exponent, sub = divmod(index, LATENCY_SUB_BUCKETS)
+                return min(math.ldexp(0.5 + (sub + 1) / (2.0 * LATENCY_SUB_BUCKETS), exponent), self.max_us)
+        return self.max_us
+
+    def summary(self):
+        return {
+            'calls': self.calls,
+            'failures': self.failures,
+            'mean_ms': self.total_us / self.calls / 1000.0 if self.calls else 0.0,
+            'p50_ms': self.percentile(50) / 1000.0,
+            'p90_ms': self.percentile(90) / 1000.0,
+            'p99_ms': self.percentile(99) / 1000.0,
+            'max_ms': self.max_us / 1000.0,
+            'retcodes': dict(self.retcodes),
+            'last_errors': dict(self.last_errors),
+        }
+
+class _Mt5Proxy:
+    """Forwards attribute access to the active backend. Resolved attributes are cached on the proxy until the backend changes."""
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        backend = get_backend()
+        value = getattr(backend, name)
+        if callable(value) and not isinstance(value, type) and CONFIG.get('MT5_INSTRUMENTATION', False):
+            value = _instrument(backend, name, value)
+        self.__dict__[name] = value
+        return value
+
+    def __repr__(self):
+        return f"<mt5 proxy for {_backend!r}>"
+
+mt5 = _Mt5Proxy()
+
+def _instrument(backend, name, func):
+    stats = _call_stats.get(name)
+    if stats is None:
+        stats = _call_stats[name] = CallStats(name)
+    perf_counter = time.perf_counter
+
+    def instrumented(*args, **kwargs):
+        started = perf_counter()
+        result = func(*args, **kwargs)
+        stats.record((perf_counter() - started) * 1e6)
+        if result is None:
+            stats.failures += 1
+            if name != 'last_error':
+                error = backend.last_error()
+                code = error[0] if error else None
+                stats.last_errors[code] = stats.last_errors.get(code, 0) + 1
+        else:
+            retcode = getattr(result, 'retcode', None)
+            if retcode is not None:
+                stats.retcodes[retcode] = stats.retcodes.get(retcode, 0) + 1
+        return result
+
+    instrumented.__name__ = name
+    instrumented.__wrapped__ = func
+    return instrumented
+
+def _load_backend(name):
+    if name == 'metatrader5':
+        try:
+            return importlib.import_module('MetaTrader5')
+        except ImportError as e:
+            raise ImportError(f"MetaTrader5 package not available ({e}). Install it, or set MT5_BACKEND=sim "
+                              f"to run against the simulated terminal.") from e
+    if name == 'sim':
+        return importlib.import_module(f'{__package__}.mt5_sim')
+    raise ValueError(f"Unknown MT5_BACKEND '{name}'. Expected one of {', '.join(BACKENDS)}.")
+
+def get_backend():
+    """Returns the active backend, resolving it from MT5_BACKEND on first use."""
+    global _backend
+    if _backend is None:
+        name = os.environ.get('MT5_BACKEND') or CONFIG.get('MT5_BACKEND', 'metatrader5')
+        _backend = _load_backend(name.strip().lower())
+        logging.info(f"MT5 backend: {getattr(_backend, '__name__', type(_backend).__name__)}")
+    return _backend
+
+def use_backend(backend):
+    """Installs `backend` (a module or object with the MetaTrader5 API) and returns the previous one."""
+    global _backend
+    previous = _backend
+    _backend = backend
+    mt5.__dict__.clear()
+    return previous
+
+def get_call_stats():
+    """Per-function call statistics: counts, latency percentiles (ms), retcodes and last_error codes."""
+    return {name: stats.summary() for name, stats in list(_call_stats.items()) if stats.calls}
+
+def reset_call_stats():
+    for stats in list(_call_stats.values()):
+        stats.reset()
+
+def dump_call_stats(level=logging.INFO):
+    """Logs a table of the MT5 call statistics, slowest total time first."""
+    rows = sorted(get_call_stats().items(), key=lambda item: item[1]['mean_ms'] * item[1]['calls'], reverse=True)
+    if not rows:
+        logging.log(level, "MT5 call stats: no instrumented calls recorded.")
+        return
+    lines = [f"{'call':<22} {'calls':>8} {'fail':>6} {'mean ms':>9} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>9}  retcodes / last_error"]
+    for name, row in rows:
+        codes = ' '.join(f"{code}:{count}" for code, count in row['retcodes'].items())
+        errors = ' '.join(f"{code}:{count}" for code, count in row['last_errors'].items())
+        lines.append(f"{name:<22} {row['calls']:>8} {row['failures']:>6} {row['mean_ms']:>9.3f} {row['p50_ms']:>8.3f} "
+                     f"{row['p90_ms']:>8.3f} {row['p99_ms']:>8.3f} {row['max_ms']:>9.3f}  {codes} {'/ ' + errors if errors else ''}")
+    logging.log(level, "MT5 call stats:\n" + '\n'.join(lines))
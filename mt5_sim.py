@@ -0,0 +1,460 @@
+import logging
+import math
+import random
+import time
+import zlib
+
+import numpy as np
+
+from . import sim_broker
+from .config import CONFIG
+from .sim_broker import SimulatedBroker, make_symbol_info, _to_epoch
+
+# Local stand-in for the MetaTrader5 package (select it with MT5_BACKEND=sim, see mt5_api).
+# The module-level functions mirror the MetaTrader5 calls used by the bot and are served
+# by one SimulatedTerminal built from the "SIM_BROKER" config section on first use.
+#
+# Prices come from a base-timeframe bar feed anchored to the wall clock: a seeded random
+# walk (FEED "synthetic") or a recorded OHLC file shifted to end its history at start-up
+# (FEED "replay"). Inside a bar the price moves open -> low -> high -> close (bullish bars)
+# or open -> high -> low -> close (bearish bars), so ticks, forming bars and SL/TP hits are
+# reproducible for a given seed. Latency, slippage and requotes are injected per call.
+
+# MT5 constants (TIMEFRAME_*, ORDER_*, TRADE_RETCODE_*, ...), as on the MetaTrader5 module
+globals().update({name: value for name, value in vars(sim_broker).items() if name.isupper()})
+
+RATES_DTYPE = np.dtype([('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+                        ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8')])
+
+# Bar length per timeframe; W1 and MN1 are the longest spans used to size history windows.
+TIMEFRAME_SECONDS = {
+    sim_broker.TIMEFRAME_M1: 60,
+    sim_broker.TIMEFRAME_M5: 300,
+    sim_broker.TIMEFRAME_M15: 900,
+    sim_broker.TIMEFRAME_M30: 1800,
+    sim_broker.TIMEFRAME_H1: 3600,
+    sim_broker.TIMEFRAME_H4: 14400,
+    sim_broker.TIMEFRAME_D1: 86400,
+    sim_broker.TIMEFRAME_W1: 604800,
+    sim_broker.TIMEFRAME_MN1: 31 * 86400,
+}
+
+_WEEK_OFFSET = 3 * 86400 # Weekly bars open on Sunday; 1970-01-04 was a Sunday
+_PATH_FRACTIONS = (0.0, 1.0 / 3.0, 2.0 / 3.0, 1.0)
+_SYNTHETIC_CHUNK_BARS = 1440
+
+_terminal = None
+
+def bar_start(times, timeframe):
+    """Open time of the `timeframe` bar containing each epoch time in `times`."""
+    times = np.asarray(times, dtype=np.int64)
+    if timeframe == sim_broker.TIMEFRAME_MN1:
+        return times.astype('datetime64[s]').astype('datetime64[M]').astype('datetime64[s]').astype(np.int64)
+    if timeframe == sim_broker.TIMEFRAME_W1:
+        return (times - _WEEK_OFFSET) // 604800 * 604800 + _WEEK_OFFSET
+    seconds = TIMEFRAME_SECONDS[timeframe]
+    return times // seconds * seconds
+
+class PriceFeed:
+    """
+    Base-timeframe bars of one symbol (dict of time/open/high/low/close/tick_volume arrays).
+    With a `generator` the feed is extended on demand; without one it ends at its last bar.
+    """
+
+    def __init__(self, bars, seconds, digits, generator=None):
+        self.seconds = seconds
+        self.digits = digits
+        self.bars = {key: np.asarray(bars[key]) for key in ('time', 'open', 'high', 'low', 'close', 'tick_volume')}
+        self._generator = generator
+
+    @property
+    def start(self):
+        return int(self.bars['time'][0])
+
+    @property
+    def end(self):
+        return int(self.bars['time'][-1]) + self.seconds
+
+    def finished(self, t):
+        return self._generator is None and t >= self.end
+
+    def index(self, t):
+        """Index of the bar containing (or last closed before) time `t`; -1 before the first bar."""
+        self._ensure(t)
+        return int(np.searchsorted(self.bars['time'], t, side='right')) - 1
+
+    def price_at(self, t):
+        k = self.index(t)
+        if k < 0:
+            return float(self.bars['open'][0])
+        return self._path(k, self._fraction(k, t))
+
+    def range_between(self, t1, t2):
+        """(price at t1, high, low) of the intrabar path between two times."""
+        k1, k2 = self.index(t1), self.index(t2)
+        f1, f2 = self._fraction(k1, t1), self._fraction(k2, t2)
+        if k1 == k2:
+            points = self._segment(k1, f1, f2)
+            return points[0], max(points), min(points)
+        points = self._segment(k1, f1, 1.0) + self._segment(k2, 0.0, f2)
+        high, low = max(points), min(points)
+        if k2 - k1 > 1:
+            high = max(high, float(self.bars['high'][k1 + 1:k2].max()))
+            low = min(low, float(self.bars['low'][k1 + 1:k2].min()))
+        return points[0], high, low
+
+    def forming_bar(self, t):
+        """(open, high, low, close) of the bar containing `t` up to that moment."""
+        k = self.index(t)
+        points = self._segment(k, 0.0, self._fraction(k, t))
+        return points[0], max(points), min(points), points[-1]
+
+    def _fraction(self, k, t):
+        if k < 0:
+            return 0.0
+        return min(max((t - self.bars['time'][k]) / self.seconds, 0.0), 1.0)
+
+    def _vertices(self, k):
+        bars = self.bars
+        o, h, l, c = bars['open'][k], bars['high'][k], bars['low'][k], bars['close'][k]
+        return (o, l, h, c) if c >= o else (o, h, l, c)
+
+    def _path(self, k, f):
+        return round(float(np.interp(f, _PATH_FRACTIONS, self._vertices(max(k, 0)))), self.digits)
+
+    def _segment(self, k, f_from, f_to):
+        vertices = self._vertices(max(k, 0))
+        points = [self._path(k, f_from)]
+        points.extend(float(v) for frac, v in zip(_PATH_FRACTIONS, vertices) if f_from < frac < f_to)
+        points.append(self._path(k, f_to))
+        return points
+
+    def _ensure(self, t):
+        if self._generator is None or t < self.end:
+            return
+        count = max(_SYNTHETIC_CHUNK_BARS, int((t - self.end) // self.seconds) + 1)
+        chunk = self._generator(count, float(self.bars['close'][-1]))
+        chunk['time'] = self.end + self.seconds * np.arange(count, dtype=np.int64)
+        for key, values in self.bars.items():
+            self.bars[key] = np.concatenate((values, chunk[key]))
+
+def random_walk(seed, volatility, digits):
+    """Generator of lognormal random-walk bars for PriceFeed; `volatility` is the per-bar return std."""
+    rng = np.random.default_rng(seed)
+
+    def generate(count, last_close):
+        close = np.round(last_close * np.exp(np.cumsum(rng.normal(0.0, volatility, count))), digits)
+        open_ = np.concatenate(([last_close], close[:-1]))
+        wicks = np.abs(rng.normal(0.0, volatility * 0.5, (2, count))) * close
+        return {
+            'open': open_,
+            'high': np.round(np.maximum(open_, close) + wicks[0], digits),
+            'low': np.round(np.minimum(open_, close) - wicks[1], digits),
+            'close': close,
+            'tick_volume': rng.integers(20, 200, count).astype(np.float64),
+        }
+    return generate
+
+def synthetic_feed(start_time, history_bars, start_price, volatility, digits, seed=None, seconds=60):
+    """Random-walk feed whose history ends at the bar containing `start_time`."""
+    generator = random_walk(seed, volatility, digits)
+    first = int(start_time) // seconds * seconds - history_bars * seconds
+    bars = generator(history_bars + 1, start_price)
+    bars['time'] = first + seconds * np.arange(history_bars + 1, dtype=np.int64)
+    return PriceFeed(bars, seconds, digits, generator)
+
+def replay_feed(bars, start_time, history_bars, digits):
+    """
+    Feed replaying recorded `bars` (see backtest.load_ohlcv), time-shifted so that the
+    first `history_bars` bars are history and the next one opens at `start_time`.
+    """
+    times = bars['time']
+    seconds = int(np.median(np.diff(times))) if len(times) > 1 else 60
+    pivot = min(history_bars, len(times) - 1)
+    shift = int(start_time) // seconds * seconds - int(times[pivot])
+    shifted = dict(bars, time=times + shift)
+    return PriceFeed(shifted, seconds, digits)
+
+class SimulatedTerminal(SimulatedBroker):
+    """
+    SimulatedBroker driven by PriceFeeds and the wall clock. Every API call first
+    waits the configured latency, then moves quotes to the current time and executes
+    SL/TP hits on the path since the previous call. Market orders may slip by up to
+    `slippage_points`, are requoted with `requote_probability` and when the fill
+    deviates from the request price by more than its `deviation`.
+    """
+
+    def __init__(self, feeds, symbol_infos, initial_balance=10000.0, latency_ms=0.0, latency_jitter_ms=0.0,
+                 order_latency_ms=0.0, slippage_points=0, requote_probability=0.0, seed=None,
+                 clock=time.time, sleep=time.sleep):
+        super().__init__(symbol_infos, initial_balance)
+        self.feeds = feeds
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.order_latency_ms = order_latency_ms
+        self.slippage_points = slippage_points
+        self.requote_probability = requote_probability
+        self.clock = clock
+        self.sleep = sleep
+        self.requotes = 0
+        self._rng = random.Random(seed)
+        self._error = (sim_broker.RES_S_OK, 'Success')
+        self._last_update = None
+
+    # --- MetaTrader5 API ----------------------------------------------------------
+
+    def initialize(self, *args, **kwargs):
+        self._enter()
+        return True
+
+    def last_error(self):
+        return self._error
+
+    def symbol_select(self, symbol, enable=True):
+        self._enter()
+        return super().symbol_select(symbol, enable)
+
+    def symbol_info(self, symbol):
+        self._enter()
+        return self._checked(super().symbol_info(symbol), f"Unknown symbol {symbol}")
+
+    def symbol_info_tick(self, symbol):
+        self._enter()
+        return self._checked(super().symbol_info_tick(symbol), f"Unknown symbol {symbol}")
+
+    def account_info(self):
+        self._enter()
+        return super().account_info()
+
+    def positions_total(self):
+        self._enter()
+        return super().positions_total()
+
+    def positions_get(self, symbol=None, ticket=None, group=None):
+        self._enter()
+        return super().positions_get(symbol, ticket, group)
+
+    def history_deals_get(self, date_from=None, date_to=None, group=None, ticket=None, position=None):
+        self._enter()
+        return super().history_deals_get(date_from, date_to, group, ticket, position)
+
+    def history_deal_get(self, ticket):
+        self._enter()
+        return super().history_deal_get(ticket)
+
+    def order_send(self, request):
+        self._enter(self.order_latency_ms)
+        symbol = request.get('symbol')
+        feed = self.feeds.get(symbol)
+        if feed is not None and feed.finished(self.time):
+            return self._result(sim_broker.TRADE_RETCODE_MARKET_CLOSED, request, symbol=symbol, comment='Market closed')
+        return super().order_send(request)
+
+    def copy_rates_from_pos(self, symbol, timeframe, start_pos, count):
+        """`count` bars of `timeframe` ending `start_pos` bars before the forming one (position 0)."""
+        self._enter()
+        feed = self._feed(symbol, timeframe)
+        if feed is None:
+            return None
+        per_bar = self._base_bars(feed, timeframe)
+        k = feed.index(self.time)
+        rates = self._aggregate(symbol, feed, timeframe, k + 1 - (start_pos + count + 1) * per_bar, k)
+        end = len(rates) - start_pos
+        return rates[max(0, end - count):max(0, end)]
+
+    def copy_rates_from(self, symbol, timeframe, date_from, count):
+        """`count` bars of `timeframe` whose open time is at or before `date_from`."""
+        self._enter()
+        feed = self._feed(symbol, timeframe)
+        if feed is None:
+            return None
+        date_from = _to_epoch(date_from)
+        per_bar = self._base_bars(feed, timeframe)
+        k = feed.index(self.time)
+        lo = min(feed.index(date_from), k) + 1 - (count + 1) * per_bar
+        rates = self._aggregate(symbol, feed, timeframe, lo, k)
+        rates = rates[rates['time'] <= date_from]
+        return rates[-count:] if count > 0 else rates[:0]
+
+    def copy_rates_range(self, symbol, timeframe, date_from, date_to):
+        """Bars of `timeframe` opened between `date_from` and `date_to` (inclusive)."""
+        self._enter()
+        feed = self._feed(symbol, timeframe)
+        if feed is None:
+            return None
+        date_from, date_to = _to_epoch(date_from), _to_epoch(date_to)
+        lo = int(np.searchsorted(feed.bars['time'], bar_start([date_from], timeframe)[0]))
+        rates = self._aggregate(symbol, feed, timeframe, lo, feed.index(self.time))
+        return rates[(rates['time'] >= date_from) & (rates['time'] <= date_to)]
+
+    # --- Internals ---------------------------------------------------------------
+
+    def _enter(self, latency_ms=None):
+        latency_ms = self.latency_ms if latency_ms is None else latency_ms
+        if self.latency_jitter_ms:
+            latency_ms += self._rng.uniform(0.0, self.latency_jitter_ms)
+        if latency_ms > 0:
+            self.sleep(latency_ms / 1000.0)
+        self._error = (sim_broker.RES_S_OK, 'Success')
+        self._update(self.clock())
+
+    def _update(self, now):
+        """Executes SL/TP hits since the previous update and moves every quote to `now`."""
+        for symbol, feed in self.feeds.items():
+            if self.positions and self._last_update is not None:
+                first, high, low = feed.range_between(self._last_update, now)
+                self.check_stops(now, first, high, low, symbol=symbol)
+            self.set_price(now, feed.price_at(now), symbol=symbol)
+        self._last_update = now
+
+    def _fill_price(self, symbol, order_type, request):
+        price, retcode = super()._fill_price(symbol, order_type, request)
+        if self.requote_probability and self._rng.random() < self.requote_probability:
+            self.requotes += 1
+            return price, sim_broker.TRADE_RETCODE_REQUOTE
+        info = self.symbols[symbol]
+        if self.slippage_points:
+            price = round(price + self._rng.randint(-self.slippage_points, self.slippage_points) * info.point, info.digits)
+        requested = request.get('price')
+        deviation = request.get('deviation')
+        if requested and deviation is not None and abs(price - requested) > deviation * info.point + 1e-9:
+            self.requotes += 1
+            return price, sim_broker.TRADE_RETCODE_REQUOTE
+        return price, retcode
+
+    def _checked(self, value, message):
+        if value is None:
+            self._error = (sim_broker.RES_E_NOT_FOUND, message)
+        return value
+
+    def _feed(self, symbol, timeframe):
+        feed = self.feeds.get(symbol)
+        if feed is None:
+            self._error = (sim_broker.RES_E_NOT_FOUND, f"Unknown symbol {symbol}")
+            return None
+        if timeframe not in TIMEFRAME_SECONDS or TIMEFRAME_SECONDS[timeframe] < feed.seconds:
+            self._error = (sim_broker.RES_E_INVALID_PARAMS, f"Timeframe {timeframe} is not available from {feed.seconds}s bars")
+            return None
+        return feed
+
+    @staticmethod
+    def _base_bars(feed, timeframe):
+        return math.ceil(TIMEFRAME_SECONDS[timeframe] / feed.seconds)
+
+    def _aggregate(self, symbol, feed, timeframe, lo, k):
+        """Bars of `timeframe` built from base bars lo..k, the last one cut at the current time."""
+        lo = max(0, lo)
+        if k < lo:
+            return np.zeros(0, dtype=RATES_DTYPE)
+        bars = {key: values[lo:k + 1].copy() for key, values in feed.bars.items()}
+        if not feed.finished(self.time):
+            bars['open'][-1], bars['high'][-1], bars['low'][-1], bars['close'][-1] = feed.forming_bar(self.time)
+
+        keys = bar_start(bars['time'], timeframe)
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        if lo > 0 and bars['time'][0] != keys[0]:
+            starts = starts[1:] # The first group is cut by the window start
+        if len(starts) == 0:
+            return np.zeros(0, dtype=RATES_DTYPE)
+        ends = np.concatenate((starts[1:], [len(keys)])) - 1
+
+        rates = np.zeros(len(starts), dtype=RATES_DTYPE)
+        rates['time'] = keys[starts]
+        rates['open'] = bars['open'][starts]
+        rates['high'] = np.maximum.reduceat(bars['high'], starts)
+        rates['low'] = np.minimum.reduceat(bars['low'], starts)
+        rates['close'] = bars['close'][ends]
+        rates['tick_volume'] = np.add.reduceat(bars['tick_volume'], starts)
+        rates['spread'] = self.symbols[symbol].spread
+        return rates
+
+def create_terminal(settings=None, symbols=None, clock=time.time):
+    """Builds a SimulatedTerminal from a SIM_BROKER settings dict (defaults to the config section)."""
+    settings = settings if settings is not None else CONFIG.get('SIM_BROKER', {})
+    if not symbols:
+        from .portfolio import load_instruments
+        symbols = list(dict.fromkeys(symbol for symbol, _, _ in load_instruments()))
+    seed = settings.get('SEED')
+    now = clock()
+    history_bars = int(settings.get('HISTORY_BARS', 100000))
+    spread_points = int(settings.get('SPREAD_POINTS', 0))
+
+    feeds = {}
+    infos = []
+    for symbol in symbols:
+        info = make_symbol_info(symbol, spread=spread_points)
+        infos.append(info)
+        symbol_seed = None if seed is None else seed + zlib.crc32(symbol.encode())
+        if settings.get('FEED', 'synthetic') == 'replay':
+            from .backtest import load_ohlcv
+            feeds[symbol] = replay_feed(load_ohlcv(settings['REPLAY_FILE']), now, history_bars, info.digits)
+        else:
+            feeds[symbol] = synthetic_feed(now, history_bars, float(settings.get('START_PRICE', 2000.0)),
+                                           float(settings.get('VOLATILITY', 0.0002)), info.digits, symbol_seed)
+
+    terminal = SimulatedTerminal(feeds, infos, float(settings.get('INITIAL_BALANCE', 10000.0)),
+                                 float(settings.get('LATENCY_MS', 0.0)), float(settings.get('LATENCY_JITTER_MS', 0.0)),
+                                 float(settings.get('ORDER_LATENCY_MS', 0.0)), int(settings.get('SLIPPAGE_POINTS', 0)),
+                                 float(settings.get('REQUOTE_PROBABILITY', 0.0)), seed, clock)
+    logging.info(f"Simulated terminal ready: {settings.get('FEED', 'synthetic')} feed for {', '.join(symbols)} "
+                 f"({history_bars} bars of history, seed {seed}).")
+    return terminal
+
+def get_terminal():
+    """The terminal behind the module-level API, created from the config on first use."""
+    global _terminal
+    if _terminal is None:
+        _terminal = create_terminal()
+    return _terminal
+
+def reset(terminal=None):
+    """Replaces the module's terminal; None rebuilds it from the config on next use."""
+    global _terminal
+    _terminal = terminal
+
+# --- MetaTrader5 module API ------------------------------------------------------
+
+def initialize(*args, **kwargs):
+    return get_terminal().initialize(*args, **kwargs)
+
+def shutdown():
+    return True
+
+def last_error():
+    return get_terminal().last_error() if _terminal is not None else (sim_broker.RES_S_OK, 'Success')
+
+def symbol_select(symbol, enable=True):
+    return get_terminal().symbol_select(symbol, enable)
+
+def symbol_info(symbol):
+    return get_terminal().symbol_info(symbol)
+
+def symbol_info_tick(symbol):
+    return get_terminal().symbol_info_tick(symbol)
+
+def account_info():
+    return get_terminal().account_info()
+
+def positions_total():
+    return get_terminal().positions_total()
+
+def positions_get(symbol=None, ticket=None, group=None):
+    return get_terminal().positions_get(symbol=symbol, ticket=ticket, group=group)
+
+def history_deals_get(date_from=None, date_to=None, group=None, ticket=None, position=None):
+    return get_terminal().history_deals_get(date_from, date_to, group=group, ticket=ticket, position=position)
+
+def history_deal_get(ticket):
+    return get_terminal().history_deal_get(ticket)
+
+def order_send(request):
+    return get_terminal().order_send(request)
+
+def copy_rates_from(symbol, timeframe, date_from, count):
+    return get_terminal().copy_rates_from(symbol, timeframe, date_from, count)
+
+def copy_rates_from_pos(symbol, timeframe, start_pos, count):
+    return get_terminal().copy_rates_from_pos(symbol, timeframe, start_pos, count)
+
+def copy_rates_range(symbol, timeframe, date_from, date_to):
+    return get_terminal().copy_rates_range(symbol, timeframe, date_from, date_to)
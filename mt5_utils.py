@@ -1,8 +1,58 @@
-import MetaTrader5 as mt5
+from .mt5_api import mt5, dump_call_stats
 import logging
 import pytz
 import datetime
+import time
+from collections import deque, namedtuple
+from .config import CONFIG
 from .constants import TIMEFRAME_MAP, MT5_TIMEZONE
+from .metrics import observe, register_gauge
+
+# Short-lived cache of terminal reads, one TTL per data kind (MT5_CACHE_TTL_MS, 0 = off).
+# Several calls on one cycle or one order path then share a single round-trip. Ticks and
+# account info are dropped after every order_send made through send_order().
+_cache = {} # (kind, key) -> (expires_at, value)
+_cache_counters = {} # kind -> [hits, misses]
+_ORDER_SENSITIVE_KINDS = ('tick', 'account_info')
+
+def _cached(kind, key, fetch):
+    ttl_ms = CONFIG.MT5_CACHE_TTL_MS.get(kind, 0)
+    if ttl_ms <= 0:
+        return fetch()
+    counters = _cache_counters.setdefault(kind, [0, 0])
+    now = time.monotonic()
+    entry = _cache.get((kind, key))
+    if entry is not None and entry[0] > now:
+        counters[0] += 1
+        return entry[1]
+    counters[1] += 1
+    value = fetch()
+    if value is not None:
+        _cache[(kind, key)] = (now + ttl_ms / 1000.0, value)
+    return value
+
+def invalidate_cache(kinds=None):
+    """Drops cached entries of the given kinds (all kinds if None)."""
+    if kinds is None:
+        _cache.clear()
+        return
+    for cache_key in [cache_key for cache_key in _cache if cache_key[0] in kinds]:
+        del _cache[cache_key]
+
+def get_cache_stats():
+    """Hit/miss counts and hit rate per cached data kind."""
+    stats = {}
+    for kind, (hits, misses) in _cache_counters.items():
+        total = hits + misses
+        stats[kind] = {'hits': hits, 'misses': misses, 'hit_rate': hits / total if total else 0.0}
+    return stats
+
+def send_order(request):
+    """mt5.order_send that invalidates the cached ticks and account info afterwards."""
+    try:
+        return mt5.order_send(request)
+    finally:
+        invalidate_cache(_ORDER_SENSITIVE_KINDS)
 
 def initialize_mt5():
     """Initializes MetaTrader 5 connection."""
@@ -14,12 +64,13 @@ def initialize_mt5():
 
 def shutdown_mt5():
     """Shuts down MetaTrader 5 connection."""
+    dump_call_stats()
     mt5.shutdown()
     logging.info("MT5 connection shut down.")
 
 def get_symbol_info(symbol):
-    """Retrieves symbol information, ensuring it's visible."""
-    symbol_info = mt5.symbol_info(symbol)
+    """Retrieves symbol information (cached), ensuring it's visible."""
+    symbol_info = _cached('symbol_info', symbol, lambda: mt5.symbol_info(symbol))
     if symbol_info is None:
         logging.error(f"Failed to get symbol info for {symbol}. Error: {mt5.last_error()}")
         return None
@@ -31,27 +82,187 @@ def get_symbol_info(symbol):
     return symbol_info
 
 def get_account_info():
-    """Retrieves account information."""
-    account_info = mt5.account_info()
+    """Retrieves account information (cached)."""
+    account_info = _cached('account_info', None, mt5.account_info)
     if account_info is None:
         logging.error(f"Failed to get account info. Error: {mt5.last_error()}")
         return None
     return account_info
 
+PositionEvent = namedtuple('PositionEvent', ['kind', 'position', 'previous'])
+POSITION_OPENED = 'opened'
+POSITION_CLOSED = 'closed'
+POSITION_SL_MODIFIED = 'sl_modified'
+POSITION_TP_MODIFIED = 'tp_modified'
+
+# Position events kept for PositionsSnapshot.events_since()
+POSITION_EVENT_HISTORY = 1000
+
+class PositionsSnapshot:
+    """
+    All open positions from one positions_get call, indexed by ticket and by (symbol, magic).
+    refresh() replaces the snapshot and returns what changed since the previous one as
+    PositionEvents: opened, closed (with the last seen position), sl_modified, tp_modified.
+
+    Every event also gets a sequence number, so a consumer that does not refresh the
+    snapshot itself keeps its own cursor and reads everything that happened since with
+    events_since(cursor), whichever caller's refresh detected it.
+    """
+
+    def __init__(self):
+        self.by_ticket = {}
+        self.by_key = {} # (symbol, magic) -> first position, like the old get_open_position scan
+        self.last_events = []
+        self.refreshed_at = None
+        self.sequence = 0 # sequence number of the newest event
+        self._history = deque(maxlen=POSITION_EVENT_HISTORY)
+
+    def refresh(self):
+        """Fetches every open position once. On failure the previous snapshot is kept and [] returned."""
+        positions = mt5.positions_get()
+        if positions is None:
+            logging.error(f"Failed to get positions. Error: {mt5.last_error()}")
+            return []
+
+        by_ticket = {}
+        by_key = {}
+        events = []
+        previous_positions = self.by_ticket
+        for pos in positions:
+            by_ticket[pos.ticket] = pos
+            by_key.setdefault((pos.symbol, pos.magic), pos)
+            previous = previous_positions.get(pos.ticket)
+            if previous is None:
+                events.append(PositionEvent(POSITION_OPENED, pos, None))
+                continue
+            if pos.sl != previous.sl:
+                events.append(PositionEvent(POSITION_SL_MODIFIED, pos, previous))
+            if pos.tp != previous.tp:
+                events.append(PositionEvent(POSITION_TP_MODIFIED, pos, previous))
+        for ticket, previous in previous_positions.items():
+            if ticket not in by_ticket:
+                events.append(PositionEvent(POSITION_CLOSED, previous, previous))
+
+        self.by_ticket = by_ticket
+        self.by_key = by_key
+        self.last_events = events
+        self.refreshed_at = time.monotonic()
+        for event in events:
+            self.sequence += 1
+            self._history.append((self.sequence, event))
+            logging.debug(f"Position {event.position.ticket} ({event.position.symbol}, magic {event.position.magic}) {event.kind}.")
+        return events
+
+    def events_since(self, cursor):
+        """Returns (events after sequence number `cursor`, new cursor); a new consumer starts at self.sequence."""
+        if cursor >= self.sequence:
+            return [], self.sequence
+        missed = self.sequence - cursor - len(self._history)
+        if missed > 0:
+            logging.warning(f"{missed} position event(s) dropped out of the history before they were read.")
+        events = [event for sequence, event in self._history if sequence > cursor]
+        return events, self.sequence
+
+    def get(self, symbol, magic_number):
+        return self.by_key.get((symbol, magic_number))
+
+    def __len__(self):
+        return len(self.by_ticket)
+
+    def __iter__(self):
+        return iter(self.by_ticket.values())
+
+# Shared snapshot; refreshed once per cycle/tick by the engines
+positions_snapshot = PositionsSnapshot()
+
+def deal_time(deal):
+    """Execution time of a deal in epoch seconds, to the millisecond when the deal has time_msc."""
+    time_msc = getattr(deal, 'time_msc', 0)
+    return time_msc / 1000.0 if time_msc else float(deal.time)
+
+class DealConfirmations:
+    """
+    Resolves deal tickets returned by order_send against the deal history without sleeping.
+    expect() looks the deal up at once; if it is not visible yet it is re-checked by poll()
+    with exponential backoff from DEAL_CONFIRM_INITIAL_MS up to DEAL_CONFIRM_MAX_MS, and
+    given up after DEAL_CONFIRM_TIMEOUT_SECONDS. `on_confirmed(deal)` gets the deal, or
+    None on timeout. The engines call poll() whenever seconds_until_due() has elapsed,
+    including while they wait for the next candle.
+
+    The confirmation latency is measured from the deal's own execution time (time_msc),
+    so it does not depend on how often poll() runs; if the server clock disagrees with
+    ours, it falls back to the time since expect().
+    """
+
+    def __init__(self):
+        self._pending = {} # deal ticket -> [on_confirmed, expected_at, next_check, delay, expected_wall]
+        self.confirmed = 0
+        self.timeouts = 0
+
+    def expect(self, deal_ticket, on_confirmed):
+        now = time.monotonic()
+        wall = time.time()
+        if self._resolve(deal_ticket, on_confirmed, wall):
+            return
+        delay = CONFIG.DEAL_CONFIRM_INITIAL_MS / 1000.0
+        self._pending[deal_ticket] = [on_confirmed, now, now + delay, delay, wall]
+
+    def seconds_until_due(self):
+        """Seconds until the next pending deal is due for a re-check (None if nothing is pending)."""
+        if not self._pending:
+            return None
+        return max(0.0, min(entry[2] for entry in self._pending.values()) - time.monotonic())
+
+    def poll(self):
+        """Re-checks the pending deals that are due. Returns the number still pending."""
+        if not self._pending:
+            return 0
+        now = time.monotonic()
+        for deal_ticket, entry in list(self._pending.items()):
+            on_confirmed, expected_at, next_check, delay, expected_wall = entry
+            if next_check > now:
+                continue
+            if self._resolve(deal_ticket, on_confirmed, expected_wall):
+                del self._pending[deal_ticket]
+            elif now - expected_at >= CONFIG.DEAL_CONFIRM_TIMEOUT_SECONDS:
+                del self._pending[deal_ticket]
+                self.timeouts += 1
+                logging.warning(f"Deal {deal_ticket} not visible in the history after {now - expected_at:.1f}s.")
+                on_confirmed(None)
+            else:
+                delay = min(delay * 2, CONFIG.DEAL_CONFIRM_MAX_MS / 1000.0)
+                entry[2], entry[3] = now + delay, delay
+        return len(self._pending)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _resolve(self, deal_ticket, on_confirmed, expected_wall):
+        deals = mt5.history_deals_get(ticket=deal_ticket)
+        if not deals:
+            return False
+        now = time.time()
+        latency = now - deal_time(deals[0])
+        # The deal executed before order_send returned; allow 1 s for the round trip
+        if not 0.0 <= latency <= now - expected_wall + 1.0:
+            latency = now - expected_wall
+        self.confirmed += 1
+        observe('execution', 'deal_confirmation', latency)
+        logging.debug(f"Deal {deal_ticket} confirmed {latency * 1000:.1f} ms after its execution.")
+        on_confirmed(deals[0])
+        return True
+
+# Shared by every order path; polled by the engines
+deal_confirmations = DealConfirmations()
+register_gauge('pending_deal_confirmations', lambda: len(deal_confirmations), "Deals sent but not yet visible in the history.")
+
 def get_open_position(symbol, magic_number):
-    """Returns the first open position for the given symbol and magic number, or None."""
-    positions = mt5.positions_get(symbol=symbol)
-    if positions is None:
-        logging.error(f"Failed to get positions. Error: {mt5.last_error()}")
-        return None
-    for pos in positions:
-        if pos.magic == magic_number:
-            return pos
-    return None
+    """Returns the open position for the given symbol and magic number from positions_snapshot, or None."""
+    return positions_snapshot.get(symbol, magic_number)
 
 def get_current_tick(symbol):
-    """Fetches current tick data for a symbol."""
-    tick = mt5.symbol_info_tick(symbol)
+    """Fetches current tick data for a symbol (cached)."""
+    tick = _cached('tick', symbol, lambda: mt5.symbol_info_tick(symbol))
     if tick is None:
         logging.error(f"Failed to get tick data for {symbol}. Error: {mt5.last_error()}")
     return tick
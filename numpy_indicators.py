@@ -0,0 +1,95 @@
+import numpy as np
+
+# Vectorized NumPy implementations of the indicators used by the strategy.
+# They operate on contiguous float64 arrays and reproduce the pandas_ta results
+# (non TA-Lib code path): leading values that pandas_ta reports as NaN are NaN here too.
+
+# Largest exponent used when rescaling a block of the Wilder recursion (e**300 ~ 1e130),
+# which keeps the scaled cumulative sums far away from float64 overflow.
+_MAX_LOG_SCALE = 300.0
+
+def _as_float_array(values):
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+def sma(close, length):
+    """Simple moving average; the first `length - 1` values are NaN."""
+    close = _as_float_array(close)
+    length = int(length)
+    out = np.full(close.shape[0], np.nan)
+    if length <= 0 or close.shape[0] < length:
+        return out
+    out[length - 1:] = np.convolve(close, np.ones(length), mode='valid') / length
+    return out
+
+def wilder_smooth(values, length):
+    """
+    Wilder smoothing (alpha = 1/length) as pandas_ta's "rma" computes it:
+    `Series.ewm(alpha=1/length, min_periods=length).mean()` (adjusted weights).
+
+    The recursion y[t] = x[t] + decay * y[t-1] is evaluated block by block as a
+    rescaled cumulative sum, so the whole series is computed without a Python loop
+    per element. Blocks are sized so the rescaling factors stay finite.
+    """
+    values = _as_float_array(values)
+    n = values.shape[0]
+    length = int(length)
+    out = np.full(n, np.nan)
+    if length <= 0 or n < length:
+        return out
+    if length == 1:
+        out[:] = values
+        return out
+
+    decay = 1.0 - 1.0 / length
+    log_decay = np.log(decay)
+    block = max(1, int(_MAX_LOG_SCALE / -log_decay))
+
+    numerator = np.empty(n)
+    carry = 0.0
+    for start in range(0, n, block):
+        chunk = values[start:start + block]
+        steps = np.arange(chunk.shape[0], dtype=np.float64)
+        shrink = np.exp(steps * log_decay) # decay ** k
+        grow = np.exp(-steps * log_decay) # decay ** -k
+        chunk_num = shrink * np.cumsum(chunk * grow) + shrink * decay * carry
+        numerator[start:start + chunk.shape[0]] = chunk_num
+        carry = chunk_num[-1]
+
+    # Sum of the adjusted weights after t + 1 observations: (1 - decay ** (t + 1)) / alpha.
+    denominator = (1.0 - np.exp(np.arange(1, n + 1, dtype=np.float64) * log_decay)) * length
+    out[length - 1:] = numerator[length - 1:] / denominator[length - 1:]
+    return out
+
+def true_range(high, low, close):
+    """True range; the first value is NaN because it needs a previous close."""
+    high = _as_float_array(high)
+    low = _as_float_array(low)
+    close = _as_float_array(close)
+    out = np.full(close.shape[0], np.nan)
+    if close.shape[0] < 2:
+        return out
+    prev_close = close[:-1]
+    out[1:] = np.maximum(high[1:] - low[1:],
+                         np.maximum(np.abs(high[1:] - prev_close), np.abs(prev_close - low[1:])))
+    return out
+
+def atr(high, low, close, length):
+    """Average True Range with Wilder smoothing."""
+    tr = true_range(high, low, close)
+    out = np.full(tr.shape[0], np.nan)
+    if tr.shape[0] > 1:
+        out[1:] = wilder_smooth(tr[1:], length)
+    return out
+
+def rsi(close, length):
+    """Relative Strength Index with Wilder smoothing of gains and losses."""
+    close = _as_float_array(close)
+    out = np.full(close.shape[0], np.nan)
+    if close.shape[0] < 2:
+        return out
+    change = np.diff(close)
+    avg_gain = wilder_smooth(np.where(change > 0, change, 0.0), length)
+    avg_loss = wilder_smooth(np.where(change < 0, -change, 0.0), length)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[1:] = 100.0 * avg_gain / (avg_gain + avg_loss)
+    return out
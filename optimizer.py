@@ -0,0 +1,222 @@
+import argparse
+import itertools
+import logging
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from .config import CONFIG
+from .backtest import load_ohlcv
+from .backtest_vectorized import run_vectorized, parse_param, check_param_keys
+from .indicator_cache import IndicatorCache
+from .sim_broker import make_symbol_info
+
+# Parameter sweeps over the vectorized backtest.
+#
+# The price arrays are copied once into a shared memory block; worker processes map
+# it read-only at start-up, so only the parameter dicts and result stats are pickled.
+# Each process keeps an IndicatorCache, so an SMA/ATR/RSI series shared by several
+# parameter sets is computed once per worker. Only the vectorized strategy parameters
+# (backtest_vectorized.STRATEGY_PARAM_KEYS) can be swept; trailing-stop factors are not
+# modelled by that engine and are rejected.
+
+_PRICE_COLUMNS = ('open', 'high', 'low', 'close')
+RANK_METRICS = ('net_profit', 'max_drawdown', 'sharpe')
+
+# Per-process state set up by _init_worker
+_worker_shm = None
+_worker_bars = None
+_worker_settings = None
+_worker_cache = None
+
+class SharedBars:
+    """
+    Bars (see backtest.load_ohlcv) copied into one shared memory block:
+    an int64 time column followed by a (4, n) float64 OHLC matrix.
+    """
+
+    def __init__(self, bars):
+        n = len(bars['time'])
+        self.length = n
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, 8 * n * (1 + len(_PRICE_COLUMNS))))
+        times, prices = _views(self.shm, n)
+        times[:] = bars['time']
+        for row, col in enumerate(_PRICE_COLUMNS):
+            prices[row] = bars[col]
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+def _views(shm, n):
+    times = np.ndarray((n,), dtype=np.int64, buffer=shm.buf, offset=0)
+    prices = np.ndarray((len(_PRICE_COLUMNS), n), dtype=np.float64, buffer=shm.buf, offset=8 * n)
+    return times, prices
+
+def _bars_from_views(times, prices):
+    bars = {'time': times}
+    for row, col in enumerate(_PRICE_COLUMNS):
+        bars[col] = prices[row]
+    return bars
+
+def _init_worker(shm_name, n, settings):
+    global _worker_shm, _worker_bars, _worker_settings, _worker_cache
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    times, prices = _views(_worker_shm, n)
+    times.flags.writeable = False
+    prices.flags.writeable = False
+    _worker_bars = _bars_from_views(times, prices)
+    _worker_settings = settings
+    _worker_cache = IndicatorCache()
+
+def _evaluate(params):
+    symbol_info, initial_balance, spread_points = _worker_settings
+    try:
+        result = run_vectorized(_worker_bars, params, symbol_info, initial_balance, spread_points,
+                                cache=_worker_cache)
+        return dict(params, **result.stats)
+    except Exception as e:
+        logging.error(f"Sweep evaluation failed for {params}: {e}")
+        return dict(params, error=str(e))
+
+def grid(space):
+    """All combinations of a {param: [values]} space, skipping fast >= slow SMA pairs."""
+    keys = list(space)
+    for values in itertools.product(*(space[key] for key in keys)):
+        params = dict(zip(keys, values))
+        if _valid(params):
+            yield params
+
+def random_samples(space, count, seed=None):
+    """
+    `count` random parameter sets. A list value is sampled uniformly from its items;
+    a (low, high) tuple is sampled uniformly from the range (integers if both ends are ints).
+    """
+    rng = random.Random(seed)
+    samples = []
+    attempts = 0
+    while len(samples) < count and attempts < count * 100:
+        attempts += 1
+        params = {}
+        for key, values in space.items():
+            if isinstance(values, tuple):
+                low, high = values
+                params[key] = rng.randint(low, high) if isinstance(low, int) and isinstance(high, int) else rng.uniform(low, high)
+            else:
+                params[key] = rng.choice(values)
+        if _valid(params):
+            samples.append(params)
+    return samples
+
+def _valid(params):
+    fast = params.get('SMA_FAST_LENGTH', CONFIG.SMA_FAST_LENGTH)
+    slow = params.get('SMA_SLOW_LENGTH', CONFIG.SMA_SLOW_LENGTH)
+    return fast < slow
+
+def rank_results(results, metrics=RANK_METRICS):
+    """
+    Orders sweep results best first by their mean rank over `metrics`
+    (higher is better except for max_drawdown). Adds the ranks as columns.
+    """
+    df = pd.DataFrame(results)
+    if df.empty or ('error' in df.columns and df['error'].notna().all()):
+        return df
+    for metric in metrics:
+        df[f'rank_{metric}'] = df[metric].rank(ascending=(metric == 'max_drawdown'), method='min')
+    df['score'] = df[[f'rank_{metric}' for metric in metrics]].mean(axis=1)
+    return df.sort_values(['score', 'net_profit'], ascending=[True, False]).reset_index(drop=True)
+
+def run_sweep(bars, param_sets, symbol_info=None, initial_balance=10000.0, spread_points=None,
+              workers=None, chunksize=None):
+    """
+    Evaluates every parameter set in `param_sets` with the vectorized backtest across a
+    process pool and returns the ranked results as a DataFrame. Raises ValueError if a
+    set names a parameter the vectorized backtest does not model.
+    """
+    param_sets = list(param_sets)
+    check_param_keys({key for params in param_sets for key in params})
+    symbol_info = symbol_info or make_symbol_info(CONFIG.SYMBOL)
+    settings = (symbol_info, initial_balance, spread_points)
+    workers = workers or os.cpu_count() or 1
+    if not param_sets:
+        return pd.DataFrame()
+
+    started = time.perf_counter()
+    if workers == 1:
+        global _worker_bars, _worker_settings, _worker_cache
+        _worker_bars, _worker_settings, _worker_cache = bars, settings, IndicatorCache()
+        results = [_evaluate(params) for params in param_sets]
+    else:
+        shared = SharedBars(bars)
+        try:
+            chunksize = chunksize or max(1, len(param_sets) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(shared.name, shared.length, settings)) as pool:
+                results = list(pool.map(_evaluate, param_sets, chunksize=chunksize))
+        finally:
+            shared.close()
+
+    elapsed = time.perf_counter() - started
+    logging.info(f"Evaluated {len(param_sets)} parameter sets on {len(bars['time'])} bars in {elapsed:.2f}s with {workers} worker(s).")
+    return rank_results(results)
+
+def parse_space(items):
+    """Parses KEY=v1,v2,... (choices) and KEY=low:high (range) arguments into a search space."""
+    space = {}
+    for item in items:
+        key, _, values = item.partition('=')
+        key = key.strip().upper()
+        if ':' in values:
+            low, high = (parse_param(f"{key}={value}")[1] for value in values.split(':', 1))
+            space[key] = (low, high)
+        else:
+            space[key] = [parse_param(f"{key}={value}")[1] for value in values.split(',')]
+    return space
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel parameter sweep over the vectorized backtest.")
+    parser.add_argument('data', help="CSV or Parquet file with time, open, high, low, close columns")
+    parser.add_argument('--param', action='append', default=[], metavar='KEY=v1,v2|low:high',
+                        help="Search dimension, e.g. --param SMA_FAST_LENGTH=3,5,8 or --param ATR_MULTIPLIER_SL=1.0:3.0")
+    parser.add_argument('--random', type=int, default=0, help="Sample this many random sets instead of the full grid")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--symbol', default=CONFIG.SYMBOL)
+    parser.add_argument('--balance', type=float, default=10000.0)
+    parser.add_argument('--spread', type=int, default=0, help="Spread in points")
+    parser.add_argument('--sep', default=',', help="CSV separator")
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--out', default=None, help="Write all ranked results to this CSV file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s | %(levelname)s | %(message)s')
+    space = parse_space(args.param)
+    try:
+        check_param_keys(space)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.random:
+        param_sets = random_samples(space, args.random, args.seed)
+    elif any(isinstance(values, tuple) for values in space.values()):
+        parser.error("Range dimensions (low:high) need --random.")
+    else:
+        param_sets = list(grid(space))
+
+    bars = load_ohlcv(args.data, sep=args.sep)
+    results = run_sweep(bars, param_sets, make_symbol_info(args.symbol), args.balance, args.spread, args.workers)
+    with pd.option_context('display.width', 200, 'display.max_columns', 30):
+        print(results.head(args.top).to_string(index=False))
+    if args.out:
+        results.to_csv(args.out, index=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import datetime
+import logging
+import time
+import traceback
+
+from .config import CONFIG
+from .constants import SIGNAL_HOLD, SIGNAL_BUY, SIGNAL_SELL
+from .mt5_api import mt5
+from .mt5_utils import get_symbol_info, get_current_tick, get_mt5_timeframe, get_mt5_current_time, positions_snapshot, deal_confirmations
+from .data import get_bar_cache, HISTORY_BUFFER_BARS
+from .streaming_indicators import IndicatorEngine
+from .strategy import evaluate_signal
+from .execution import execute_trade, stop_manager
+from .risk import daily_profit_loss, check_and_reset_daily_pnl, update_daily_pnl_from_closed_deals, check_daily_limits, check_atr_for_trade, equity_monitor
+from .trade_logger import trade_csv_logger
+from .utils import calculate_next_candle_open
+from .schedular import Scheduler
+from .constants import TIMEFRAME_DURATIONS_SECONDS
+from .metrics import CycleTimer, register_gauge
+
+# One process trading many symbols/timeframes. Every instrument keeps a compact state
+# (bar cache, streaming indicators; positions come from mt5_utils.positions_snapshot);
+# per wake-up the runner fetches the account-wide data once (daily P/L, limits, all open
+# positions) and then only refreshes the instruments whose candle has closed. Wake-ups
+# are jobs on a schedular.Scheduler.
+#
+# Instruments come from the "SYMBOLS" config list. An entry is a symbol name or a dict
+# with "SYMBOL" and optional "TIMEFRAME" / "MAGIC_NUMBER"; the defaults are CONFIG.TIMEFRAME
+# and CONFIG.MAGIC_NUMBER + the entry's index. An empty list trades CONFIG.SYMBOL only.
+
+class Instrument:
+    """Per-symbol state of the portfolio runner."""
+    __slots__ = ('symbol', 'timeframe', 'timeframe_mt5', 'magic', 'symbol_info', 'bar_cache', 'engine')
+
+    def __init__(self, symbol, timeframe, timeframe_mt5, magic, symbol_info):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.timeframe_mt5 = timeframe_mt5
+        self.magic = magic
+        self.symbol_info = symbol_info
+        self.bar_cache = get_bar_cache(symbol, timeframe_mt5, timeframe, CONFIG.DATA_BARS_TO_FETCH + HISTORY_BUFFER_BARS)
+        self.engine = IndicatorEngine()
+
+    @property
+    def position(self):
+        """This instrument's open position in the shared positions snapshot, or None."""
+        return positions_snapshot.get(self.symbol, self.magic)
+
+    def __repr__(self):
+        return f"{self.symbol}@{self.timeframe}#{self.magic}"
+
+def load_instruments():
+    """(symbol, timeframe, magic) triples configured in "SYMBOLS" (or CONFIG.SYMBOL alone)."""
+    entries = CONFIG.get('SYMBOLS') or [CONFIG.SYMBOL]
+    instruments = []
+    for index, entry in enumerate(entries):
+        if isinstance(entry, str):
+            entry = {'SYMBOL': entry}
+        instruments.append((entry['SYMBOL'], entry.get('TIMEFRAME', CONFIG.TIMEFRAME),
+                            entry.get('MAGIC_NUMBER', CONFIG.MAGIC_NUMBER + index)))
+    magics = [magic for _, _, magic in instruments]
+    if len(set(magics)) != len(magics):
+        raise ValueError(f"Instruments in SYMBOLS need distinct magic numbers: {magics}")
+    return instruments
+
+class PortfolioRunner:
+    """Runs the strategy for every configured instrument from one terminal connection."""
+
+    def __init__(self, instruments=None):
+        self.instruments = []
+        self.magic_numbers = ()
+        self.limits_reached = False
+        self._next_open = {} # timeframe -> next candle open (MT5 time)
+        self.cycle_timer = CycleTimer('portfolio')
+        self._configured = instruments if instruments is not None else load_instruments()
+
+    def setup(self):
+        """Resolves symbol info and timeframes; instruments that fail are skipped. Returns False if none is left."""
+        for symbol, timeframe, magic in self._configured:
+            timeframe_mt5 = get_mt5_timeframe(timeframe)
+            if timeframe_mt5 is None:
+                logging.error(f"Invalid timeframe string: {timeframe} for {symbol}. Skipping instrument.")
+                continue
+            symbol_info = get_symbol_info(symbol)
+            if symbol_info is None:
+                logging.error(f"No symbol info for {symbol}. Skipping instrument.")
+                continue
+            self.instruments.append(Instrument(symbol, timeframe, timeframe_mt5, magic, symbol_info))
+        self.magic_numbers = tuple(instrument.magic for instrument in self.instruments)
+        equity_monitor.magic_numbers = set(self.magic_numbers)
+        self.cycle_timer.budget = min((TIMEFRAME_DURATIONS_SECONDS.get(instrument.timeframe, 60) for instrument in self.instruments), default=None)
+        logging.info(f"Portfolio: {len(self.instruments)} instrument(s): {', '.join(map(repr, self.instruments))}")
+        return bool(self.instruments)
+
+    def due_instruments(self, now):
+        """Instruments whose timeframe has opened a new candle since the previous cycle."""
+        due_timeframes = {timeframe for timeframe, next_open in self._next_open.items() if next_open <= now}
+        due_timeframes.update(instrument.timeframe for instrument in self.instruments
+                              if instrument.timeframe not in self._next_open)
+        for timeframe in due_timeframes:
+            self._next_open[timeframe] = calculate_next_candle_open(now, timeframe)
+        return [instrument for instrument in self.instruments if instrument.timeframe in due_timeframes]
+
+    def run_cycle(self, now):
+        """One wake-up: account-wide checks, then every due instrument."""
+        due = self.due_instruments(now)
+        if not due:
+            return
+
+        timer = self.cycle_timer
+        timer.start()
+        timer.stage('daily_pnl')
+        check_and_reset_daily_pnl(now, {})
+        update_daily_pnl_from_closed_deals(self.magic_numbers)
+        self.limits_reached = check_daily_limits({})
+        if self.limits_reached:
+            logging.info("Daily limits reached. No new trades today. Monitoring existing positions if any.")
+
+        timer.stage('positions_snapshot')
+        self.load_positions()
+        timer.stage('instruments')
+        for instrument in due:
+            try:
+                self._process(instrument, self.limits_reached)
+            except Exception as e:
+                logging.error(f"[{instrument.symbol}] Unexpected error: {e}")
+                logging.error(f"Traceback:\n{traceback.format_exc()}")
+                trade_csv_logger.log_trade_event(
+                    event='Unhandled Error',
+                    symbol=instrument.symbol,
+                    trade_type='', volume='', entry_price='', sl_price='', tp_price='',
+                    profit_loss='',
+                    daily_pnl=daily_profit_loss[0],
+                    comment=f"Unhandled Exception: {e}"
+                )
+        if CONFIG.ENABLE_TRAILING_STOP:
+            timer.stage('trailing_stops')
+            stop_manager.flush(positions_snapshot.by_ticket)
+        timer.finish()
+
+    def seconds_until_next_candle(self, now):
+        """Seconds from `now` to the earliest next candle open over all timeframes (at least 0.1)."""
+        next_open = min(self._next_open.values(), default=None)
+        if next_open is None:
+            return 60.0
+        return max((next_open - now).total_seconds(), 0.1)
+
+    def reconcile(self):
+        """Re-reads open positions and the realized daily P/L from the terminal."""
+        self.load_positions()
+        update_daily_pnl_from_closed_deals(self.magic_numbers)
+        logging.debug(f"Reconciled portfolio: {sum(1 for i in self.instruments if i.position is not None)} open position(s), daily P/L {daily_profit_loss[0]:.2f}.")
+
+    def monitor_equity(self):
+        """Revalues open positions at the latest ticks; a tripped equity monitor blocks new trades."""
+        self.load_positions()
+        if equity_monitor.update():
+            self.limits_reached = True
+
+    def load_positions(self):
+        """
+        Refreshes the shared positions snapshot with one positions_get call and re-checks
+        pending deal confirmations; returns the snapshot events.
+        """
+        events = positions_snapshot.refresh()
+        deal_confirmations.poll()
+        return events
+
+    def _process(self, instrument, limits_reached):
+        # Symbol properties can change during the session; refreshed within the cache TTL
+        instrument.symbol_info = get_symbol_info(instrument.symbol) or instrument.symbol_info
+        if not instrument.bar_cache.refresh():
+            logging.error(f"[{instrument.symbol}] No valid data for signal check. Retrying in next cycle.")
+            return
+        engine = instrument.engine
+        engine.sync(instrument.bar_cache)
+        if not engine.ready:
+            logging.error(f"[{instrument.symbol}] Not enough closed bars for streaming indicators. Retrying in next cycle.")
+            return
+
+        current_price = engine.last_bar['close']
+        current_atr = engine.last_bar['atr']
+        position = instrument.position
+        if position is not None:
+            logging.info(f"[{instrument.symbol}] Position {position.ticket} is open by this bot. Current daily P/L: {daily_profit_loss[0]:.2f}.")
+            tick_info = get_current_tick(instrument.symbol)
+            if tick_info:
+                current_market_price = tick_info.bid if position.type == mt5.ORDER_TYPE_SELL else tick_info.ask
+                if CONFIG.ENABLE_TRAILING_STOP:
+                    stop_manager.submit(position, instrument.symbol_info, current_market_price, current_atr)
+            return
+        if limits_reached:
+            return
+
+        bar_label = datetime.datetime.fromtimestamp(engine.last_time, tz=datetime.timezone.utc)
+        signal, indicator_data_at_signal = evaluate_signal(engine.last_bar, engine.prev_bar, bar_label)
+        signal_time = time.time()
+        logging.info(f"[{instrument.symbol}] Signal Check: {'BUY' if signal == SIGNAL_BUY else 'SELL' if signal == SIGNAL_SELL else 'HOLD'} | Current Price: {current_price:.5f} | ATR: {current_atr:.5f}")
+
+        if signal == SIGNAL_HOLD or not check_atr_for_trade(current_atr):
+            return
+        execute_trade(instrument.symbol_info, signal, current_atr, indicator_data_at_signal, daily_profit_loss,
+                      instrument.magic, signal_price=current_price, signal_time=signal_time)
+
+def schedule_portfolio(runner, scheduler):
+    """
+    Registers the runner's recurring jobs: one candle-close job per timeframe, the daily
+    P/L reset at midnight (MT5 time), a position/P&L reconcile every RECONCILE_SECONDS, a
+    deal confirmation poll every DEAL_CONFIRM_INITIAL_MS and, if enabled, the equity
+    monitor every TICK_INTERVAL_MS.
+    """
+    for timeframe in sorted({instrument.timeframe for instrument in runner.instruments}):
+        scheduler.at_candle_close(('*', timeframe, 'candle_close'), timeframe,
+                                  lambda: runner.run_cycle(get_mt5_current_time()))
+    scheduler.daily(('*', 'D1', 'daily_pnl_reset'), lambda: check_and_reset_daily_pnl(get_mt5_current_time(), {}))
+    scheduler.every(('*', None, 'reconcile'), CONFIG.RECONCILE_SECONDS, runner.reconcile)
+    scheduler.every(('*', None, 'deal_confirmations'), CONFIG.DEAL_CONFIRM_INITIAL_MS / 1000.0, deal_confirmations.poll)
+    if CONFIG.EQUITY_MONITOR_ENABLED:
+        scheduler.every(('*', None, 'equity_monitor'), CONFIG.TICK_INTERVAL_MS / 1000.0, runner.monitor_equity)
+    register_gauge('scheduler_queue_depth', scheduler.queue_depth, "Job runs waiting for the scheduler worker.")
+    register_gauge('scheduler_job_overruns', lambda: {'/'.join(map(str, key)): stats['overruns'] for key, stats in scheduler.stats().items()},
+                   "Runs skipped because the job was still running.", label='job')
+
+def run_portfolio():
+    """Main loop of the portfolio engine; expects MT5 to be initialized."""
+    runner = PortfolioRunner()
+    if not runner.setup():
+        logging.error("No tradable instruments configured. Exiting.")
+        return
+    logging.info("🚀 Portfolio runner started. Waiting for the next candle to check for trading signals...")
+
+    # MT5 calls are not thread-safe: one worker runs every job in order
+    scheduler = Scheduler(workers=1)
+    scheduler.once(('*', None, 'startup'), lambda: runner.run_cycle(get_mt5_current_time()))
+    schedule_portfolio(runner, scheduler)
+    try:
+        scheduler.run_forever()
+    finally:
+        scheduler.stop()
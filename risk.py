@@ -1,9 +1,11 @@
 import logging
-import MetaTrader5 as mt5
+from .mt5_api import mt5
 import datetime
+import time
 import pytz
 from .config import CONFIG
-from .mt5_utils import get_account_info, get_mt5_current_time
+from .mt5_utils import get_account_info, get_mt5_current_time, get_current_tick, get_symbol_info, positions_snapshot, deal_time
+from .execution import close_position
 from .trade_logger import trade_csv_logger
 from .constants import MT5_TIMEZONE
 
@@ -33,28 +35,158 @@ def check_and_reset_daily_pnl(current_mt5_time, indicator_data_at_signal):
         )
         daily_profit_loss[0] = 0.0
         last_daily_pnl_reset_date = current_date
+        equity_monitor.reset()
         return True
     return False
 
-def update_daily_pnl_from_closed_deals():
+class DailyPnlLedger:
     """
-    Updates the global daily_profit_loss by summing profits from closed deals
-    for the current day and our bot's magic number.
+    Realized P/L of the current broker day, kept incrementally: update() fetches only the
+    deals after the last processed (time, ticket) and adds closing deals to running totals
+    per (magic, symbol). The ledger resets when the broker day changes and re-sums the
+    whole day every `reconcile_seconds` to catch missed or amended deals.
+    Closing deals newer than the first reconcile are also kept for closed_deals(), once each,
+    so every exit (SL, TP, manual or by the bot) can be logged as a trade close; deals of the
+    previous day not seen before it ended are collected before the day's reset.
     """
-    timezone = pytz.timezone(MT5_TIMEZONE)
-    today_start = datetime.datetime.now(timezone).replace(hour=0, minute=0, second=0, microsecond=0)
-    current_time = datetime.datetime.now(timezone)
-    
-    deals = mt5.history_deals_get(today_start, current_time)
-    
-    realized_pnl_today = 0.0 
-    if deals:
-        realized_pnl_today = sum(deal.profit for deal in deals 
-                                 if deal.magic == CONFIG.MAGIC_NUMBER and deal.entry == mt5.DEAL_ENTRY_OUT)
-    
-    daily_profit_loss[0] = realized_pnl_today
+
+    def __init__(self, reconcile_seconds=None):
+        self.reconcile_seconds = reconcile_seconds if reconcile_seconds is not None else CONFIG.get('PNL_RECONCILE_SECONDS', 300)
+        self.day_start = None
+        self.cursor_time = None # time (epoch seconds) of the last processed deal
+        self.cursor_ticket = 0 # its ticket; deal tickets increase monotonically
+        self.totals = {} # (magic, symbol) -> realized P/L
+        self.deals_processed = 0
+        self.full_reconciles = 0
+        self._last_full = None
+        self._reported_ticket = None # closing deals up to this ticket were returned by closed_deals()
+        self._closed = {} # ticket -> closing deal not yet returned by closed_deals()
+
+    def update(self, now=None):
+        """Adds the deals closed since the previous update. Returns False if the deals could not be read."""
+        now = now or datetime.datetime.now(pytz.timezone(MT5_TIMEZONE))
+        day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        if day_start != self.day_start:
+            self._finish_day(day_start)
+            return self.reconcile(now, day_start)
+        if self._last_full is None or time.monotonic() - self._last_full >= self.reconcile_seconds:
+            return self.reconcile(now, day_start)
+
+        date_from = day_start if self.cursor_time is None else datetime.datetime.fromtimestamp(self.cursor_time, tz=day_start.tzinfo)
+        deals = mt5.history_deals_get(date_from, now)
+        if deals is None:
+            logging.error(f"Failed to get deals since {date_from}. Error: {mt5.last_error()}")
+            return False
+        self._add(deal for deal in deals if deal.ticket > self.cursor_ticket)
+        return True
+
+    def reconcile(self, now=None, day_start=None):
+        """Re-sums every deal of the broker day, replacing the running totals."""
+        now = now or datetime.datetime.now(pytz.timezone(MT5_TIMEZONE))
+        day_start = day_start or now.replace(hour=0, minute=0, second=0, microsecond=0)
+        deals = mt5.history_deals_get(day_start, now)
+        if deals is None:
+            logging.error(f"Failed to get today's deals for the daily P/L. Error: {mt5.last_error()}")
+            return False
+
+        previous = self.totals if self.day_start == day_start else None
+        self.day_start = day_start
+        self.cursor_time = None
+        self.cursor_ticket = 0
+        self.totals = {}
+        self._add(deals)
+        if self._reported_ticket is None:
+            self._reported_ticket = self.cursor_ticket # Closes from before start-up are not logged again
+        self._last_full = time.monotonic()
+        self.full_reconciles += 1
+        if previous is not None:
+            drift = sum(self.totals.values()) - sum(previous.values())
+            if abs(drift) > 0.005:
+                logging.warning(f"Daily P/L ledger drifted by {drift:.2f}; totals replaced by a full reconcile.")
+        return True
+
+    def total(self, magic_numbers):
+        return sum(pnl for (magic, _), pnl in self.totals.items() if magic in magic_numbers)
+
+    def by_symbol(self, magic_numbers):
+        """Realized P/L per symbol for the given magic numbers."""
+        result = {}
+        for (magic, symbol), pnl in self.totals.items():
+            if magic in magic_numbers:
+                result[symbol] = result.get(symbol, 0.0) + pnl
+        return result
+
+    def by_magic(self):
+        result = {}
+        for (magic, _), pnl in self.totals.items():
+            result[magic] = result.get(magic, 0.0) + pnl
+        return result
+
+    def closed_deals(self):
+        """Closing deals added since the previous call, oldest first."""
+        closed, self._closed = sorted(self._closed.values(), key=lambda deal: deal.ticket), {}
+        if closed:
+            self._reported_ticket = max(self._reported_ticket, closed[-1].ticket)
+        return closed
+
+    def _add(self, deals):
+        deal_entry_out = mt5.DEAL_ENTRY_OUT
+        for deal in deals:
+            if deal.ticket > self.cursor_ticket:
+                self.cursor_ticket = deal.ticket
+                self.cursor_time = deal.time
+            self.deals_processed += 1
+            if deal.entry == deal_entry_out:
+                key = (deal.magic, deal.symbol)
+                self.totals[key] = self.totals.get(key, 0.0) + deal.profit
+                if self._reported_ticket is not None and deal.ticket > self._reported_ticket:
+                    self._closed[deal.ticket] = deal
+
+    def _finish_day(self, next_day_start):
+        """Collects the closing deals of the ending day made after the last update."""
+        if self.day_start is None or self._reported_ticket is None:
+            return
+        date_from = self.day_start if self.cursor_time is None else datetime.datetime.fromtimestamp(self.cursor_time, tz=self.day_start.tzinfo)
+        deals = mt5.history_deals_get(date_from, next_day_start)
+        if deals is None:
+            logging.error(f"Failed to get the deals before {next_day_start}. Error: {mt5.last_error()}")
+            return
+        self._add(deal for deal in deals if deal.ticket > self.cursor_ticket)
+
+daily_pnl_ledger = DailyPnlLedger()
+
+def update_daily_pnl_from_closed_deals(magic_numbers=None):
+    """
+    Updates the global daily_profit_loss from closed deals of the current day for our
+    bot's magic number(s), via the incremental daily_pnl_ledger.
+    magic_numbers defaults to (CONFIG.MAGIC_NUMBER,).
+    """
+    magic_numbers = set(magic_numbers) if magic_numbers else {CONFIG.MAGIC_NUMBER}
+    daily_pnl_ledger.update()
+    daily_profit_loss[0] = daily_pnl_ledger.total(magic_numbers)
+    for deal in daily_pnl_ledger.closed_deals():
+        if deal.magic in magic_numbers:
+            log_closing_deal(deal, daily_profit_loss[0])
     logging.debug(f"Updated daily P/L from closed deals: {daily_profit_loss[0]:.2f}")
 
+def log_closing_deal(deal, daily_pnl):
+    """Logs a 'Trade Closed' event for a closing deal, whatever closed the position."""
+    reasons = {getattr(mt5, 'DEAL_REASON_SL', None): 'SL', getattr(mt5, 'DEAL_REASON_TP', None): 'TP'}
+    reason = reasons.get(getattr(deal, 'reason', None), 'closed')
+    logging.info(f"Position {deal.position_id} on {deal.symbol} closed ({reason}) at {deal.price}: P/L {deal.profit:.2f}.")
+    trade_csv_logger.log_trade_event(
+        event='Trade Closed',
+        symbol=deal.symbol,
+        trade_type='SELL' if deal.type == mt5.DEAL_TYPE_BUY else 'BUY', # A buy deal closes a short position
+        volume=deal.volume,
+        entry_price='', sl_price='', tp_price='',
+        close_price=deal.price,
+        profit_loss=deal.profit,
+        daily_pnl=daily_pnl,
+        comment=f"Deal: {deal.ticket}, position: {deal.position_id}, {reason}",
+        timestamp=deal_time(deal) # Dated by the close, not by when the bot noticed it
+    )
+
 
 def check_daily_limits(indicator_data_at_signal):
     """
@@ -68,6 +200,10 @@ def check_daily_limits(indicator_data_at_signal):
 
     current_balance = account_info.balance
 
+    if equity_monitor.tripped:
+        logging.info(f"Equity monitor tripped the daily loss limit (floating P/L {equity_monitor.floating:.2f}). No new trades today.")
+        return True
+
     if CONFIG.MAX_DAILY_LOSS_PERCENT > 0 and daily_profit_loss[0] < -(current_balance * (CONFIG.MAX_DAILY_LOSS_PERCENT / 100)):
         log_message = f"Daily loss limit reached. Bot will not open new trades today. Current daily P/L: {daily_profit_loss[0]:.2f}"
         logging.warning(log_message)
@@ -98,6 +234,91 @@ def check_daily_limits(indicator_data_at_signal):
     
     return False
 
+class EquityMonitor:
+    """
+    Watches realized + floating P/L of the bot's positions between candles. update() revalues
+    open positions at the latest ticks (only symbols whose tick changed) and trips the daily
+    loss limit once realized + floating P/L breaches MAX_DAILY_LOSS_PERCENT of the balance;
+    with `flatten` the bot's positions are closed right away. check_daily_limits() honours
+    the trip until the next daily reset.
+    """
+
+    def __init__(self, magic_numbers=None, flatten=None):
+        self.magic_numbers = set(magic_numbers) if magic_numbers else {CONFIG.MAGIC_NUMBER}
+        self.flatten = CONFIG.get('EQUITY_MONITOR_FLATTEN', False) if flatten is None else flatten
+        self.tripped = False
+        self.floating = 0.0
+        self.equity = None # balance + floating P/L of the bot's positions
+        self.trips = 0
+        self._floating = {} # ticket -> (tick time_msc, floating P/L)
+
+    def reset(self):
+        self.tripped = False
+
+    def update(self):
+        """Revalues the bot's open positions (from positions_snapshot). Returns True if the limit is tripped."""
+        floating = 0.0
+        values = {}
+        for position in positions_snapshot:
+            if position.magic not in self.magic_numbers:
+                continue
+            tick = get_current_tick(position.symbol)
+            cached = self._floating.get(position.ticket)
+            if tick is None:
+                value = cached[1] if cached else position.profit
+            elif cached is not None and cached[0] == tick.time_msc:
+                value = cached[1]
+            else:
+                value = self._position_value(position, tick)
+            values[position.ticket] = (tick.time_msc if tick else None, value)
+            floating += value
+        self._floating = values
+        self.floating = floating
+
+        account_info = get_account_info()
+        if account_info is None:
+            return self.tripped
+        self.equity = account_info.balance + floating
+        if self.tripped or CONFIG.MAX_DAILY_LOSS_PERCENT <= 0:
+            return self.tripped
+        loss_limit = account_info.balance * (CONFIG.MAX_DAILY_LOSS_PERCENT / 100)
+        if values and daily_profit_loss[0] + floating < -loss_limit:
+            self._trip(floating)
+        return self.tripped
+
+    def _position_value(self, position, tick):
+        symbol_info = get_symbol_info(position.symbol)
+        if symbol_info is None or not symbol_info.trade_tick_size:
+            return position.profit
+        if position.type == mt5.ORDER_TYPE_BUY:
+            price_move = tick.bid - position.price_open
+        else:
+            price_move = position.price_open - tick.ask
+        return price_move / symbol_info.trade_tick_size * symbol_info.trade_tick_value * position.volume + position.swap
+
+    def _trip(self, floating):
+        self.tripped = True
+        self.trips += 1
+        log_message = (f"Equity monitor: daily loss limit breached with floating P/L. Realized {daily_profit_loss[0]:.2f}, "
+                       f"floating {floating:.2f}.{' Closing open positions.' if self.flatten else ''}")
+        logging.warning(log_message)
+        trade_csv_logger.log_trade_event(
+            event='Equity Loss Limit',
+            symbol=CONFIG.SYMBOL,
+            trade_type='', volume='', entry_price='', sl_price='', tp_price='',
+            profit_loss=floating,
+            daily_pnl=daily_profit_loss[0],
+            comment=log_message
+        )
+        if self.flatten:
+            for position in list(positions_snapshot):
+                if position.magic in self.magic_numbers:
+                    symbol_info = get_symbol_info(position.symbol)
+                    if symbol_info is not None:
+                        close_position(position, symbol_info, daily_profit_loss)
+
+equity_monitor = EquityMonitor()
+
 def check_atr_for_trade(current_atr):
     """
     Checks if the current ATR value is sufficient for a trade.
@@ -0,0 +1,215 @@
+import datetime
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytz
+
+from .constants import MT5_TIMEZONE
+from .utils import calculate_next_candle_open
+
+# Recurring job scheduler. Jobs live in a binary heap ordered by their next run time,
+# so adding, cancelling (lazily) and dispatching a job costs O(log n) for any number of
+# jobs. One timer thread pops due jobs and hands them to a worker pool; a job that is
+# still running when it becomes due again is skipped and counted as an overrun; run times
+# that passed while the timer was stalled are skipped and counted as missed.
+#
+# Jobs are keyed, typically (symbol, timeframe, kind); registering an existing key
+# replaces the job. Every run records its lateness (start time - scheduled time).
+
+class Job:
+    """A recurring job and its run statistics."""
+    __slots__ = ('key', 'func', 'next_time', 'next_run', 'cancelled', 'running',
+                 'runs', 'overruns', 'missed', 'errors', 'last_lateness', 'max_lateness', 'total_lateness')
+
+    def __init__(self, key, func, next_time, first_run):
+        self.key = key
+        self.func = func
+        self.next_time = next_time # scheduled time -> following scheduled time
+        self.next_run = first_run
+        self.cancelled = False
+        self.running = False
+        self.runs = 0
+        self.overruns = 0
+        self.missed = 0
+        self.errors = 0
+        self.last_lateness = 0.0
+        self.max_lateness = 0.0
+        self.total_lateness = 0.0
+
+    def stats(self):
+        return {
+            'next_run': self.next_run,
+            'runs': self.runs,
+            'overruns': self.overruns,
+            'missed': self.missed,
+            'errors': self.errors,
+            'last_lateness_ms': self.last_lateness * 1000.0,
+            'mean_lateness_ms': self.total_lateness / self.runs * 1000.0 if self.runs else 0.0,
+            'max_lateness_ms': self.max_lateness * 1000.0,
+        }
+
+class Scheduler:
+    """Heap-based scheduler dispatching recurring jobs to `workers` threads."""
+
+    def __init__(self, workers=1, clock=time.time):
+        self.clock = clock
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scheduler')
+        self._jobs = {}
+        self._heap = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+        self._queued = 0 # runs submitted to the worker pool that have not started yet
+
+    # --- Registration -------------------------------------------------------------
+
+    def every(self, key, seconds, func, first_run=None):
+        """Runs `func` every `seconds`, first at `first_run` (epoch seconds, default: now + seconds)."""
+        first_run = first_run if first_run is not None else self.clock() + seconds
+        return self.add(key, func, lambda scheduled: scheduled + seconds, first_run)
+
+    def at_candle_close(self, key, timeframe_str, func, delay=0.0):
+        """Runs `func` `delay` seconds after every candle open of `timeframe_str` (MT5 time)."""
+        timezone = pytz.timezone(MT5_TIMEZONE)
+
+        def next_time(scheduled):
+            candle_open = datetime.datetime.fromtimestamp(scheduled - delay, tz=timezone).replace(microsecond=0)
+            return calculate_next_candle_open(candle_open, timeframe_str).timestamp() + delay
+
+        first = calculate_next_candle_open(datetime.datetime.fromtimestamp(self.clock(), tz=timezone), timeframe_str)
+        return self.add(key, func, next_time, first.timestamp() + delay)
+
+    def daily(self, key, func, hour=0, minute=0):
+        """Runs `func` every day at hour:minute (MT5 time)."""
+        timezone = pytz.timezone(MT5_TIMEZONE)
+        now = datetime.datetime.fromtimestamp(self.clock(), tz=timezone)
+        first = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if first <= now:
+            first += datetime.timedelta(days=1)
+        return self.add(key, func, lambda scheduled: scheduled + 86400, first.timestamp())
+
+    def once(self, key, func, when=None):
+        """Runs `func` once at `when` (epoch seconds, default: now)."""
+        return self.add(key, func, lambda scheduled: None, when if when is not None else self.clock())
+
+    def add(self, key, func, next_time, first_run):
+        """
+        Registers a job with a custom `next_time(scheduled) -> next scheduled time` rule;
+        a rule returning None ends the job.
+        """
+        job = Job(key, func, next_time, first_run)
+        with self._cond:
+            previous = self._jobs.get(key)
+            if previous is not None:
+                previous.cancelled = True
+            self._jobs[key] = job
+            self._push(job)
+            self._cond.notify()
+        return job
+
+    def cancel(self, key):
+        """Cancels a job; its heap entry is dropped when it surfaces."""
+        with self._cond:
+            job = self._jobs.pop(key, None)
+            if job is not None:
+                job.cancelled = True
+        return job is not None
+
+    # --- Running ------------------------------------------------------------------
+
+    def start(self):
+        """Starts the timer thread."""
+        if self._thread is None:
+            self._stopped = False
+            self._thread = threading.Thread(target=self.run_forever, name='scheduler-timer', daemon=True)
+            self._thread.start()
+
+    def stop(self, wait=True):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        self.executor.shutdown(wait=wait)
+
+    def run_forever(self):
+        """Timer loop: sleeps until the earliest job is due and dispatches it."""
+        with self._cond:
+            while not self._stopped:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                delay = self._heap[0][0] - self.clock()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                self._dispatch_due(self.clock())
+
+    def run_pending(self):
+        """Dispatches every due job once (for callers driving their own loop)."""
+        with self._cond:
+            self._dispatch_due(self.clock())
+
+    def stats(self):
+        """Per-job run counts and lateness, keyed by job key."""
+        with self._cond:
+            return {key: job.stats() for key, job in self._jobs.items()}
+
+    def queue_depth(self):
+        """Job runs handed to the worker pool that have not started yet."""
+        return self._queued
+
+    def __len__(self):
+        return len(self._jobs)
+
+    # --- Internals ----------------------------------------------------------------
+
+    def _push(self, job):
+        heapq.heappush(self._heap, (job.next_run, next(self._sequence), job))
+
+    def _dispatch_due(self, now):
+        while self._heap and self._heap[0][0] <= now:
+            scheduled, _, job = heapq.heappop(self._heap)
+            if job.cancelled:
+                continue
+            if job.running:
+                job.overruns += 1
+                logging.warning(f"Scheduler job {job.key} is still running; skipping the run due at {scheduled:.3f}.")
+            else:
+                job.running = True
+                self._queued += 1
+                self.executor.submit(self._run, job, scheduled)
+
+            # Skip run times that already passed (e.g. after a long stall) instead of bursting
+            next_run = job.next_time(scheduled)
+            while next_run is not None and next_run <= now:
+                job.missed += 1
+                next_run = job.next_time(next_run)
+            if next_run is None:
+                if self._jobs.get(job.key) is job:
+                    del self._jobs[job.key]
+                continue
+            job.next_run = next_run
+            self._push(job)
+
+    def _run(self, job, scheduled):
+        with self._cond:
+            self._queued -= 1
+        lateness = self.clock() - scheduled
+        job.runs += 1
+        job.last_lateness = lateness
+        job.total_lateness += lateness
+        job.max_lateness = max(job.max_lateness, lateness)
+        try:
+            job.func()
+        except Exception as e:
+            job.errors += 1
+            logging.error(f"Scheduler job {job.key} failed: {e}", exc_info=True)
+        finally:
+            job.running = False
@@ -0,0 +1,337 @@
+import logging
+from collections import namedtuple
+
+# Simulated MetaTrader5 broker. An instance exposes the subset of the MetaTrader5
+# module API used by this project (constants and functions with the same names),
+# so it can be installed as the `mt5` backend (see mt5_api.use_backend).
+# Prices are pushed in by the caller (e.g. the backtester) with set_price();
+# mt5_sim builds a self-driving terminal with price feeds on top of it.
+
+# MT5 constants (values match the MetaTrader5 package)
+TIMEFRAME_M1 = 1
+TIMEFRAME_M5 = 5
+TIMEFRAME_M15 = 15
+TIMEFRAME_M30 = 30
+TIMEFRAME_H1 = 16385
+TIMEFRAME_H4 = 16388
+TIMEFRAME_D1 = 16408
+TIMEFRAME_W1 = 32769
+TIMEFRAME_MN1 = 49153
+ORDER_TYPE_BUY = 0
+ORDER_TYPE_SELL = 1
+POSITION_TYPE_BUY = 0
+POSITION_TYPE_SELL = 1
+TRADE_ACTION_DEAL = 1
+TRADE_ACTION_SLTP = 6
+ORDER_FILLING_FOK = 0
+ORDER_FILLING_IOC = 1
+ORDER_FILLING_RETURN = 2
+ORDER_TIME_GTC = 0
+DEAL_TYPE_BUY = 0
+DEAL_TYPE_SELL = 1
+DEAL_ENTRY_IN = 0
+DEAL_ENTRY_OUT = 1
+DEAL_REASON_CLIENT = 0
+DEAL_REASON_EXPERT = 3
+DEAL_REASON_SL = 4
+DEAL_REASON_TP = 5
+TRADE_RETCODE_REQUOTE = 10004
+TRADE_RETCODE_REJECT = 10006
+TRADE_RETCODE_DONE = 10009
+TRADE_RETCODE_TIMEOUT = 10012
+TRADE_RETCODE_INVALID = 10013
+TRADE_RETCODE_INVALID_VOLUME = 10014
+TRADE_RETCODE_INVALID_PRICE = 10015
+TRADE_RETCODE_INVALID_STOPS = 10016
+TRADE_RETCODE_MARKET_CLOSED = 10018
+TRADE_RETCODE_NO_MONEY = 10019
+TRADE_RETCODE_PRICE_CHANGED = 10020
+TRADE_RETCODE_PRICE_OFF = 10021
+TRADE_RETCODE_TOO_MANY_REQUESTS = 10024
+TRADE_RETCODE_CONNECTION = 10031
+TRADE_RETCODE_POSITION_CLOSED = 10036
+RES_S_OK = 1
+RES_E_INVALID_PARAMS = -2
+RES_E_NOT_FOUND = -4
+
+Tick = namedtuple('Tick', ['time', 'bid', 'ask', 'last', 'volume', 'time_msc', 'flags', 'volume_real'])
+AccountInfo = namedtuple('AccountInfo', ['login', 'balance', 'equity', 'profit', 'margin', 'margin_free', 'leverage', 'currency'])
+SymbolInfo = namedtuple('SymbolInfo', ['name', 'visible', 'digits', 'point', 'spread', 'trade_stops_level',
+                                       'trade_tick_value', 'trade_tick_size', 'volume_min', 'volume_max', 'volume_step'])
+TradePosition = namedtuple('TradePosition', ['ticket', 'time', 'type', 'magic', 'identifier', 'volume', 'price_open',
+                                             'sl', 'tp', 'price_current', 'swap', 'profit', 'symbol', 'comment'])
+TradeDeal = namedtuple('TradeDeal', ['ticket', 'order', 'time', 'time_msc', 'type', 'entry', 'magic', 'position_id',
+                                     'reason', 'volume', 'price', 'commission', 'swap', 'profit', 'symbol', 'comment'])
+OrderSendResult = namedtuple('OrderSendResult', ['retcode', 'deal', 'order', 'volume', 'price', 'bid', 'ask',
+                                                 'comment', 'request_id', 'retcode_external', 'request'])
+
+def make_symbol_info(name, digits=3, point=0.001, spread=0, trade_stops_level=0, trade_tick_value=0.1,
+                     trade_tick_size=0.001, volume_min=0.01, volume_max=200.0, volume_step=0.01):
+    """Builds a SymbolInfo; the defaults describe a gold CFD quoted with 3 digits."""
+    return SymbolInfo(name, True, digits, point, spread, trade_stops_level,
+                      trade_tick_value, trade_tick_size, volume_min, volume_max, volume_step)
+
+class SimulatedBroker:
+    """
+    In-memory broker with instant fills at the current bid/ask, server-side SL/TP
+    execution via check_stops() and a deal history. `symbol_info` is one SymbolInfo
+    or a list of them; the first one is the default symbol for set_price/check_stops.
+    """
+
+    def __init__(self, symbol_info, initial_balance=10000.0, leverage=100, currency='USD'):
+        infos = [symbol_info] if isinstance(symbol_info, SymbolInfo) else list(symbol_info)
+        self.symbols = {}
+        self.quotes = {} # symbol -> (time, bid, ask)
+        for info in infos:
+            self.add_symbol(info)
+        self.symbol = infos[0] if infos else None
+        self.balance = float(initial_balance)
+        self.leverage = leverage
+        self.currency = currency
+        self.time = 0
+        self.time_msc = 0 # self.time in milliseconds, kept at the resolution of the price feed's clock
+        self.bid = 0.0 # Quote of the default symbol
+        self.ask = 0.0
+        self.positions = {}
+        self.deals = []
+        self._deals_by_ticket = {}
+        self._next_ticket = 1
+
+    def __getattr__(self, name):
+        # Module-level constants (ORDER_TYPE_BUY, TRADE_RETCODE_DONE, ...) are reachable
+        # as attributes, like on the MetaTrader5 module.
+        value = globals().get(name)
+        if value is None or name.startswith('_') or not name.isupper():
+            raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{name}'")
+        return value
+
+    def add_symbol(self, symbol_info):
+        self.symbols[symbol_info.name] = symbol_info
+        self.quotes.setdefault(symbol_info.name, (0, 0.0, 0.0))
+
+    # --- Price feed -------------------------------------------------------------
+
+    def set_price(self, time, bid, spread_points=None, symbol=None):
+        """Moves the market of `symbol` (default symbol if None) to `bid` at `time`; ask = bid + spread."""
+        info = self.symbol if symbol is None else self.symbols[symbol]
+        spread = info.spread if spread_points is None else spread_points
+        ask = bid + spread * info.point
+        self.time = int(time)
+        self.time_msc = int(time * 1000)
+        self.quotes[info.name] = (self.time, bid, ask)
+        if info is self.symbol:
+            self.bid = bid
+            self.ask = ask
+
+    def check_stops(self, time, open_, high, low, spread_points=None, symbol=None):
+        """
+        Executes SL/TP of open positions in `symbol` against one bid-based OHLC bar.
+        Gaps through a level fill at the bar open. If both levels lie inside the bar,
+        the stop loss is assumed to be hit first. Returns the closing deals.
+        """
+        if not self.positions:
+            return []
+        info = self.symbol if symbol is None else self.symbols[symbol]
+        spread = (info.spread if spread_points is None else spread_points) * info.point
+        closed = []
+        for position in list(self.positions.values()):
+            if position.symbol != info.name:
+                continue
+            if position.type == POSITION_TYPE_BUY:
+                # Long positions close on the bid
+                if position.sl and low <= position.sl:
+                    price, reason = min(open_, position.sl), DEAL_REASON_SL
+                elif position.tp and high >= position.tp:
+                    price, reason = max(open_, position.tp), DEAL_REASON_TP
+                else:
+                    continue
+            else:
+                # Short positions close on the ask
+                if position.sl and high + spread >= position.sl:
+                    price, reason = max(open_ + spread, position.sl), DEAL_REASON_SL
+                elif position.tp and low + spread <= position.tp:
+                    price, reason = min(open_ + spread, position.tp), DEAL_REASON_TP
+                else:
+                    continue
+            closed.append(self._close(position, price, time, reason, 'sl' if reason == DEAL_REASON_SL else 'tp'))
+        return closed
+
+    # --- MetaTrader5 API ----------------------------------------------------------
+
+    def initialize(self, *args, **kwargs):
+        return True
+
+    def shutdown(self):
+        return True
+
+    def last_error(self):
+        return (RES_S_OK, 'Success')
+
+    def symbol_select(self, symbol, enable=True):
+        return symbol in self.symbols
+
+    def symbol_info(self, symbol):
+        return self.symbols.get(symbol)
+
+    def symbol_info_tick(self, symbol):
+        if symbol not in self.symbols:
+            return None
+        quote_time, bid, ask = self.quotes[symbol]
+        return Tick(quote_time, bid, ask, 0.0, 0, quote_time * 1000, 0, 0.0)
+
+    def account_info(self):
+        floating = sum(self._floating_profit(p) for p in self.positions.values())
+        equity = self.balance + floating
+        return AccountInfo(0, self.balance, equity, floating, 0.0, equity, self.leverage, self.currency)
+
+    def positions_total(self):
+        return len(self.positions)
+
+    def positions_get(self, symbol=None, ticket=None, group=None):
+        positions = self.positions.values()
+        if ticket is not None:
+            positions = [p for p in positions if p.ticket == ticket]
+        elif symbol is not None:
+            positions = [p for p in positions if p.symbol == symbol]
+        return tuple(self._mark(p) for p in positions)
+
+    def history_deals_get(self, date_from=None, date_to=None, group=None, ticket=None, position=None):
+        if ticket is not None:
+            deal = self._deals_by_ticket.get(ticket)
+            return (deal,) if deal else ()
+        if position is not None:
+            return tuple(d for d in self.deals if d.position_id == position)
+        start = _to_epoch(date_from) if date_from is not None else None
+        end = _to_epoch(date_to) if date_to is not None else None
+        return tuple(d for d in self.deals
+                     if (start is None or d.time >= start) and (end is None or d.time <= end))
+
+    def history_deal_get(self, ticket):
+        return self._deals_by_ticket.get(ticket)
+
+    def order_send(self, request):
+        action = request.get('action')
+        if action == TRADE_ACTION_SLTP:
+            return self._modify(request)
+        if action != TRADE_ACTION_DEAL:
+            return self._result(TRADE_RETCODE_INVALID, request, comment='Unsupported action')
+        if request.get('symbol') not in self.symbols:
+            return self._result(TRADE_RETCODE_INVALID, request, comment='Unknown symbol')
+        if request.get('position'):
+            position = self.positions.get(request['position'])
+            if position is None:
+                return self._result(TRADE_RETCODE_POSITION_CLOSED, request, comment='Position not found')
+            close_type = ORDER_TYPE_SELL if position.type == POSITION_TYPE_BUY else ORDER_TYPE_BUY
+            price, retcode = self._fill_price(position.symbol, close_type, request)
+            if retcode != TRADE_RETCODE_DONE:
+                return self._result(retcode, request, symbol=position.symbol, comment='Requote')
+            deal = self._close(position, price, self.quotes[position.symbol][0], DEAL_REASON_EXPERT,
+                               request.get('comment', ''))
+            return self._result(TRADE_RETCODE_DONE, request, deal=deal.ticket, order=deal.order,
+                                volume=deal.volume, price=deal.price, symbol=position.symbol)
+        return self._open(request)
+
+    # --- Internals ---------------------------------------------------------------
+
+    def _fill_price(self, symbol, order_type, request):
+        """Execution price of a market order and its retcode; subclasses add slippage/requotes."""
+        _, bid, ask = self.quotes[symbol]
+        return (ask if order_type == ORDER_TYPE_BUY else bid), TRADE_RETCODE_DONE
+
+    def _open(self, request):
+        symbol = request['symbol']
+        info = self.symbols[symbol]
+        volume = request.get('volume', 0.0)
+        if volume < info.volume_min or volume > info.volume_max:
+            return self._result(TRADE_RETCODE_INVALID_VOLUME, request, symbol=symbol, comment='Invalid volume')
+        order_type = request.get('type')
+        sl = request.get('sl', 0.0) or 0.0
+        tp = request.get('tp', 0.0) or 0.0
+        if not self._stops_valid(symbol, order_type, sl, tp):
+            return self._result(TRADE_RETCODE_INVALID_STOPS, request, symbol=symbol, comment='Invalid stops')
+        price, retcode = self._fill_price(symbol, order_type, request)
+        if retcode != TRADE_RETCODE_DONE:
+            return self._result(retcode, request, symbol=symbol, comment='Requote')
+
+        ticket = self._take_ticket()
+        open_time = self.quotes[symbol][0]
+        position = TradePosition(ticket, open_time, order_type, request.get('magic', 0), ticket, volume, price,
+                                 sl, tp, price, 0.0, 0.0, symbol, request.get('comment', ''))
+        self.positions[ticket] = position
+        deal = self._add_deal(ticket, order_type, DEAL_ENTRY_IN, position, volume, price, 0.0,
+                              DEAL_REASON_EXPERT, request.get('comment', ''), open_time)
+        return self._result(TRADE_RETCODE_DONE, request, deal=deal.ticket, order=ticket, volume=volume,
+                            price=price, symbol=symbol)
+
+    def _modify(self, request):
+        position = self.positions.get(request.get('position'))
+        if position is None:
+            return self._result(TRADE_RETCODE_POSITION_CLOSED, request, comment='Position not found')
+        sl = request.get('sl', position.sl) or 0.0
+        tp = request.get('tp', position.tp) or 0.0
+        if not self._stops_valid(position.symbol, position.type, sl, tp):
+            return self._result(TRADE_RETCODE_INVALID_STOPS, request, symbol=position.symbol, comment='Invalid stops')
+        self.positions[position.ticket] = position._replace(sl=sl, tp=tp)
+        return self._result(TRADE_RETCODE_DONE, request, order=position.ticket, symbol=position.symbol)
+
+    def _close(self, position, price, time, reason, comment):
+        del self.positions[position.ticket]
+        profit = self._profit(position, price)
+        self.balance += profit
+        close_type = DEAL_TYPE_SELL if position.type == POSITION_TYPE_BUY else DEAL_TYPE_BUY
+        self.time = max(self.time, int(time))
+        self.time_msc = max(self.time_msc, int(time * 1000))
+        return self._add_deal(self._take_ticket(), close_type, DEAL_ENTRY_OUT, position, position.volume,
+                              price, profit, reason, comment, self.time)
+
+    def _add_deal(self, order, deal_type, entry, position, volume, price, profit, reason, comment, deal_time):
+        deal_time = int(deal_time)
+        time_msc = self.time_msc if self.time_msc // 1000 == deal_time else deal_time * 1000
+        deal = TradeDeal(self._take_ticket(), order, deal_time, time_msc, deal_type, entry, position.magic,
+                         position.ticket, reason, volume, price, 0.0, 0.0, profit, position.symbol, comment)
+        self.deals.append(deal)
+        self._deals_by_ticket[deal.ticket] = deal
+        return deal
+
+    def _stops_valid(self, symbol, order_type, sl, tp):
+        info = self.symbols[symbol]
+        _, bid, ask = self.quotes[symbol]
+        min_distance = info.trade_stops_level * info.point
+        if order_type == ORDER_TYPE_BUY:
+            return (not sl or sl <= bid - min_distance) and (not tp or tp >= bid + min_distance)
+        return (not sl or sl >= ask + min_distance) and (not tp or tp <= ask - min_distance)
+
+    def _profit(self, position, close_price):
+        info = self.symbols[position.symbol]
+        direction = 1.0 if position.type == POSITION_TYPE_BUY else -1.0
+        per_price_unit = info.trade_tick_value / info.trade_tick_size
+        return round(direction * (close_price - position.price_open) * per_price_unit * position.volume, 2)
+
+    def _close_price(self, position):
+        _, bid, ask = self.quotes[position.symbol]
+        return bid if position.type == POSITION_TYPE_BUY else ask
+
+    def _floating_profit(self, position):
+        return self._profit(position, self._close_price(position))
+
+    def _mark(self, position):
+        price = self._close_price(position)
+        return position._replace(price_current=price, profit=self._profit(position, price))
+
+    def _take_ticket(self):
+        ticket = self._next_ticket
+        self._next_ticket += 1
+        return ticket
+
+    def _result(self, retcode, request, deal=0, order=0, volume=0.0, price=0.0, symbol=None, comment='Request executed'):
+        if retcode != TRADE_RETCODE_DONE:
+            logging.debug(f"Simulated broker rejected request (retcode={retcode}): {comment}")
+        _, bid, ask = self.quotes.get(symbol or request.get('symbol'), (0, 0.0, 0.0))
+        return OrderSendResult(retcode, deal, order, volume, price, bid, ask,
+                               comment, 0, 0, request)
+
+def _to_epoch(value):
+    """Converts a datetime or number to epoch seconds."""
+    if hasattr(value, 'timestamp'):
+        return int(value.timestamp())
+    return int(value)
@@ -14,9 +14,25 @@ def generate_signal(df):
         indicator_data = {key: '' for key in TRADE_LOG_CSV_HEADER if any(k in key for k in ['SMA', 'ATR', 'RSI', 'Cond'])}
         return SIGNAL_HOLD, indicator_data
 
-    last_bar = df.iloc[-1]
-    prev_bar = df.iloc[-2]
+    return evaluate_signal(df.iloc[-1], df.iloc[-2], df.index[-1])
 
+def sma_crossover(last_bar, prev_bar):
+    """
+    (buy, sell) crossover conditions of the last bar: sma_fast crossing above sma_slow
+    (golden cross) or below it (death cross). A signal needs one of them, so callers
+    such as the backtester can skip evaluate_signal when neither holds.
+    """
+    buy = (prev_bar['sma_fast'] < prev_bar['sma_slow']) and (last_bar['sma_fast'] > last_bar['sma_slow'])
+    sell = (prev_bar['sma_fast'] > prev_bar['sma_slow']) and (last_bar['sma_fast'] < last_bar['sma_slow'])
+    return buy, sell
+
+def evaluate_signal(last_bar, prev_bar, bar_label=''):
+    """
+    Applies the signal rules to the last two bars.
+    `last_bar` and `prev_bar` can be DataFrame rows or plain dicts keyed like the indicator
+    columns (e.g. streaming_indicators.IndicatorEngine.last_bar), so no DataFrame is needed.
+    Returns the signal (BUY, SELL, HOLD) and a dictionary of current indicator values/conditions.
+    """
     # Initialize indicator data dictionary
     indicator_data = {
         'SMA Fast': f"{last_bar['sma_fast']:.5f}",
@@ -26,25 +42,26 @@ def generate_signal(df):
         'RSI': f"{last_bar['rsi']:.2f}" if 'rsi' in last_bar and CONFIG.ENABLE_RSI_FILTER else ''
     }
 
-    logging.debug(f"--- Signal Check for {df.index[-1]} ---")
-    logging.debug(f"  Last Close: {last_bar['close']:.5f}")
-    logging.debug(f"  SMA Fast ({CONFIG.SMA_FAST_LENGTH}): {last_bar['sma_fast']:.5f} (Prev: {prev_bar['sma_fast']:.5f})")
-    logging.debug(f"  SMA Slow ({CONFIG.SMA_SLOW_LENGTH}): {last_bar['sma_slow']:.5f} (Prev: {prev_bar['sma_slow']:.5f})")
-    logging.debug(f"  SMA Trend ({CONFIG.SMA_TREND_LENGTH}): {last_bar['sma_trend']:.5f}")
-    if CONFIG.ENABLE_RSI_FILTER and 'rsi' in last_bar:
-        logging.debug(f"  RSI ({CONFIG.RSI_PERIOD}): {last_bar['rsi']:.2f}")
-    logging.debug(f"  Current ATR ({CONFIG.ATR_PERIOD}): {last_bar['atr']:.5f}")
+    # Debug output is formatted lazily and only when DEBUG is enabled: this runs every candle
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    if debug:
+        logging.debug("--- Signal Check for %s ---", bar_label)
+        logging.debug("  Last Close: %.5f", last_bar['close'])
+        logging.debug("  SMA Fast (%s): %.5f (Prev: %.5f)", CONFIG.SMA_FAST_LENGTH, last_bar['sma_fast'], prev_bar['sma_fast'])
+        logging.debug("  SMA Slow (%s): %.5f (Prev: %.5f)", CONFIG.SMA_SLOW_LENGTH, last_bar['sma_slow'], prev_bar['sma_slow'])
+        logging.debug("  SMA Trend (%s): %.5f", CONFIG.SMA_TREND_LENGTH, last_bar['sma_trend'])
+        if CONFIG.ENABLE_RSI_FILTER and 'rsi' in last_bar:
+            logging.debug("  RSI (%s): %.2f", CONFIG.RSI_PERIOD, last_bar['rsi'])
+        logging.debug("  Current ATR (%s): %.5f", CONFIG.ATR_PERIOD, last_bar['atr'])
 
     # --- Crossover Condition (Golden Cross / Death Cross) ---
-    sma_buy_crossover = (prev_bar['sma_fast'] < prev_bar['sma_slow']) and \
-                        (last_bar['sma_fast'] > last_bar['sma_slow'])
-    sma_sell_crossover = (prev_bar['sma_fast'] > prev_bar['sma_slow']) and \
-                         (last_bar['sma_fast'] < last_bar['sma_slow'])
+    sma_buy_crossover, sma_sell_crossover = sma_crossover(last_bar, prev_bar)
     
     indicator_data['SMA Buy Cond'] = sma_buy_crossover
     indicator_data['SMA Sell Cond'] = sma_sell_crossover
-    logging.debug(f"  SMA Buy Crossover Condition: {sma_buy_crossover}")
-    logging.debug(f"  SMA Sell Crossover Condition: {sma_sell_crossover}")
+    if debug:
+        logging.debug("  SMA Buy Crossover Condition: %s", sma_buy_crossover)
+        logging.debug("  SMA Sell Crossover Condition: %s", sma_sell_crossover)
 
     # --- Trend Filter (Price vs. Long-term SMA) ---
     trend_buy_condition = last_bar['close'] > last_bar['sma_trend']
@@ -52,18 +69,20 @@ def generate_signal(df):
     
     indicator_data['Trend Buy Cond'] = trend_buy_condition
     indicator_data['Trend Sell Cond'] = trend_sell_condition
-    logging.debug(f"  Trend Buy Condition (Close > SMA Trend): {trend_buy_condition}")
-    logging.debug(f"  Trend Sell Condition (Close < SMA Trend): {trend_sell_condition}")
+    if debug:
+        logging.debug("  Trend Buy Condition (Close > SMA Trend): %s", trend_buy_condition)
+        logging.debug("  Trend Sell Condition (Close < SMA Trend): %s", trend_sell_condition)
 
     # --- RSI Filter (Optional) ---
     rsi_buy_condition = True
     rsi_sell_condition = True
     if CONFIG.ENABLE_RSI_FILTER:
-        if 'rsi' in df.columns and pd.notna(last_bar['rsi']):
+        if 'rsi' in last_bar and pd.notna(last_bar['rsi']):
             rsi_buy_condition = last_bar['rsi'] < CONFIG.RSI_OVERBOUGHT
             rsi_sell_condition = last_bar['rsi'] > CONFIG.RSI_OVERSOLD
-            logging.debug(f"  RSI Buy Condition (RSI < {CONFIG.RSI_OVERBOUGHT}): {rsi_buy_condition}")
-            logging.debug(f"  RSI Sell Condition (RSI > {CONFIG.RSI_OVERSOLD}): {rsi_sell_condition}")
+            if debug:
+                logging.debug("  RSI Buy Condition (RSI < %s): %s", CONFIG.RSI_OVERBOUGHT, rsi_buy_condition)
+                logging.debug("  RSI Sell Condition (RSI > %s): %s", CONFIG.RSI_OVERSOLD, rsi_sell_condition)
         else:
             logging.warning("RSI filter enabled but 'rsi' column is missing or NaN. Temporarily ignoring RSI filter.")
             # Do NOT modify CONFIG.ENABLE_RSI_FILTER here, as it's a global setting.
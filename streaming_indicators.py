@@ -0,0 +1,182 @@
+import math
+import logging
+from collections import deque
+from .config import CONFIG
+
+# Streaming (O(1) per closed bar) versions of the indicators in indicators.py.
+#
+# Parity with pandas_ta (non TA-Lib code path):
+# - SMA matches ta.sma exactly up to float rounding (< 1e-9).
+# - ATR and RSI use pandas_ta's "rma" smoothing, i.e. Wilder's alpha = 1/length
+#   with pandas' bias-corrected (adjust=True) start, so fed the same bars they
+#   match ta.atr / ta.rsi to < 1e-9. A stream that started before the pandas_ta
+#   window differs by at most (1 - 1/length) ** window relative, which is below
+#   1e-12 for length 14 over the default 400 bar window.
+
+# The running SMA sum is re-summed from the window every this many updates to
+# stop floating point drift from accumulating over very long streams.
+_SMA_RESYNC_INTERVAL = 4096
+
+class StreamingSMA:
+    """Simple moving average over the last `length` values using a running sum."""
+    __slots__ = ('length', 'value', '_window', '_sum', '_updates')
+
+    def __init__(self, length):
+        self.length = int(length)
+        self.value = math.nan
+        self._window = deque(maxlen=self.length)
+        self._sum = 0.0
+        self._updates = 0
+
+    def update(self, x):
+        window = self._window
+        if len(window) == self.length:
+            self._sum -= window[0]
+        window.append(x)
+        self._sum += x
+        self._updates += 1
+        if self._updates % _SMA_RESYNC_INTERVAL == 0:
+            self._sum = math.fsum(window)
+        if len(window) == self.length:
+            self.value = self._sum / self.length
+        return self.value
+
+class WilderSmoother:
+    """
+    Wilder smoothing (alpha = 1/length) in the form pandas_ta uses for its "rma":
+    an adjusted exponential mean that only reports a value after `length` inputs.
+    """
+    __slots__ = ('length', 'value', '_decay', '_num', '_den', '_count')
+
+    def __init__(self, length):
+        self.length = int(length)
+        self.value = math.nan
+        self._decay = 1.0 - 1.0 / self.length
+        self._num = 0.0
+        self._den = 0.0
+        self._count = 0
+
+    def update(self, x):
+        self._num = x + self._decay * self._num
+        self._den = 1.0 + self._decay * self._den
+        self._count += 1
+        if self._count >= self.length:
+            self.value = self._num / self._den
+        return self.value
+
+class StreamingATR:
+    """Average True Range with Wilder smoothing. The first bar only seeds the previous close."""
+    __slots__ = ('length', '_smoother', '_prev_close')
+
+    def __init__(self, length):
+        self.length = int(length)
+        self._smoother = WilderSmoother(length)
+        self._prev_close = None
+
+    @property
+    def value(self):
+        return self._smoother.value
+
+    def update(self, high, low, close):
+        prev_close = self._prev_close
+        self._prev_close = close
+        if prev_close is None:
+            return self._smoother.value
+        true_range = max(high - low, abs(high - prev_close), abs(prev_close - low))
+        return self._smoother.update(true_range)
+
+class StreamingRSI:
+    """Relative Strength Index with Wilder smoothing of gains and losses."""
+    __slots__ = ('length', 'value', '_gains', '_losses', '_prev_close')
+
+    def __init__(self, length):
+        self.length = int(length)
+        self.value = math.nan
+        self._gains = WilderSmoother(length)
+        self._losses = WilderSmoother(length)
+        self._prev_close = None
+
+    def update(self, close):
+        prev_close = self._prev_close
+        self._prev_close = close
+        if prev_close is None:
+            return self.value
+        change = close - prev_close
+        avg_gain = self._gains.update(change if change > 0 else 0.0)
+        avg_loss = self._losses.update(-change if change < 0 else 0.0)
+        if avg_gain == avg_gain: # Not NaN: both smoothers are warmed up together
+            total = avg_gain + avg_loss
+            self.value = 100.0 * avg_gain / total if total > 0 else math.nan
+        return self.value
+
+class IndicatorEngine:
+    """
+    Keeps the configured strategy indicators up to date one closed bar at a time.
+
+    `last_bar` and `prev_bar` expose the two most recent closed bars with the
+    same keys as the DataFrame columns produced by indicators.calculate_all_indicators,
+    so they can be passed straight to strategy.evaluate_signal.
+    """
+
+    def __init__(self, sma_fast_length=None, sma_slow_length=None, sma_trend_length=None,
+                 atr_period=None, rsi_period=None, enable_rsi=None):
+        self.enable_rsi = CONFIG.ENABLE_RSI_FILTER if enable_rsi is None else enable_rsi
+        self.sma_fast = StreamingSMA(sma_fast_length or CONFIG.SMA_FAST_LENGTH)
+        self.sma_slow = StreamingSMA(sma_slow_length or CONFIG.SMA_SLOW_LENGTH)
+        self.sma_trend = StreamingSMA(sma_trend_length or CONFIG.SMA_TREND_LENGTH)
+        self.atr = StreamingATR(atr_period or CONFIG.ATR_PERIOD)
+        self.rsi = StreamingRSI(rsi_period or CONFIG.RSI_PERIOD) if self.enable_rsi else None
+        self.last_time = None
+        self.last_bar = None
+        self.prev_bar = None
+        self.bars_processed = 0
+        self.ready = False # True once the last two closed bars have every indicator value (no warm-up NaNs)
+        self._last_complete = False
+
+    def update(self, bar_time, high, low, close):
+        """Feeds one closed bar and returns the updated indicator snapshot."""
+        bar = {
+            'close': close,
+            'sma_fast': self.sma_fast.update(close),
+            'sma_slow': self.sma_slow.update(close),
+            'sma_trend': self.sma_trend.update(close),
+            'atr': self.atr.update(high, low, close),
+        }
+        if self.rsi is not None:
+            bar['rsi'] = self.rsi.update(close)
+        self.prev_bar = self.last_bar
+        self.last_bar = bar
+        complete = self._complete(bar)
+        self.ready = complete and self._last_complete
+        self._last_complete = complete
+        self.last_time = bar_time
+        self.bars_processed += 1
+        return bar
+
+    def sync(self, bar_cache):
+        """
+        Feeds every closed bar of `bar_cache` (a data.BarCache) that is newer than
+        the last processed bar. The newest cached bar is still forming and is skipped.
+        Returns the number of bars processed.
+        """
+        rates = bar_cache.rates
+        if rates is None or len(rates) < 2:
+            return 0
+        closed = rates[:-1]
+        start = 0
+        if self.last_time is not None:
+            start = int(closed['time'].searchsorted(self.last_time, side='right'))
+            if start == 0 and len(closed) and closed['time'][0] > self.last_time:
+                logging.warning(f"Bar cache for {bar_cache.symbol} does not reach back to the last streamed bar. Indicators continue across the gap.")
+        new_bars = closed[start:]
+        for bar_time, high, low, close in zip(new_bars['time'].tolist(), new_bars['high'].tolist(),
+                                              new_bars['low'].tolist(), new_bars['close'].tolist()):
+            self.update(bar_time, high, low, close)
+        return len(new_bars)
+
+    @staticmethod
+    def _complete(bar):
+        for value in bar.values():
+            if value != value: # NaN
+                return False
+        return True
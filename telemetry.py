@@ -0,0 +1,146 @@
+import datetime
+import logging
+import time
+from collections import deque
+
+import pytz
+
+from .config import CONFIG
+from .constants import MT5_TIMEZONE
+from .metrics import observe, percentile
+from .mt5_utils import deal_time
+
+# Execution-quality telemetry. Every order placed by execution.execute_trade gets an
+# OrderRecord with the wall-clock timestamps of its path (signal, tick fetch, order_send
+# start/end, deal confirmation) and the signal, requested and filled prices. The last
+# TELEMETRY_HISTORY records are kept in memory; summary() aggregates them per symbol
+# and/or per hour of the signal (MT5 time) into distributions.
+#
+# Slippage is in points and signed so that positive is against us: filled above the
+# requested/signal price for a BUY, below it for a SELL.
+
+FIELDS = ('slippage_points', 'signal_slippage_points', 'signal_to_tick_ms', 'tick_to_send_ms',
+          'send_ms', 'confirm_ms', 'signal_to_fill_ms', 'attempts')
+
+class OrderRecord:
+    """Timestamps and prices of one order."""
+    __slots__ = ('symbol', 'side', 'point', 'signal_time', 'signal_price', 'tick_time', 'send_started',
+                 'send_ended', 'confirm_time', 'fill_time', 'requested_price', 'fill_price', 'attempts',
+                 'retcode', 'deal')
+
+    def __init__(self, symbol, side, point, signal_time, signal_price):
+        self.symbol = symbol
+        self.side = side # +1 BUY, -1 SELL
+        self.point = point
+        self.signal_time = signal_time
+        self.signal_price = signal_price
+        self.tick_time = self.send_started = self.send_ended = self.confirm_time = self.fill_time = None
+        self.requested_price = self.fill_price = None
+        self.attempts = 0
+        self.retcode = None
+        self.deal = None
+
+    @property
+    def filled(self):
+        return self.fill_price is not None
+
+    def hour(self):
+        return datetime.datetime.fromtimestamp(self.signal_time, tz=pytz.timezone(MT5_TIMEZONE)).hour
+
+    def values(self):
+        """The FIELDS of this record (None where a timestamp or price is missing)."""
+        def ms(start, end):
+            return (end - start) * 1000.0 if start is not None and end is not None else None
+
+        def points(reference):
+            if reference is None or self.fill_price is None or not self.point:
+                return None
+            return (self.fill_price - reference) * self.side / self.point
+
+        return {
+            'slippage_points': points(self.requested_price),
+            'signal_slippage_points': points(self.signal_price),
+            'signal_to_tick_ms': ms(self.signal_time, self.tick_time),
+            'tick_to_send_ms': ms(self.tick_time, self.send_started),
+            'send_ms': ms(self.send_started, self.send_ended),
+            'confirm_ms': ms(self.send_ended, self.confirm_time),
+            'signal_to_fill_ms': ms(self.signal_time, self.fill_time or self.send_ended) if self.filled else None,
+            'attempts': self.attempts,
+        }
+
+class ExecutionTelemetry:
+    """Keeps recent OrderRecords and summarizes them per symbol and hour."""
+
+    def __init__(self, history=None):
+        self.records = deque(maxlen=history or CONFIG.get('TELEMETRY_HISTORY', 10000))
+
+    def start(self, symbol, side, point, signal_time=None, signal_price=None):
+        record = OrderRecord(symbol, side, point, signal_time or time.time(), signal_price)
+        self.records.append(record)
+        return record
+
+    def filled(self, record, retcode, requested_price, fill_price, deal):
+        record.retcode = retcode
+        record.requested_price = requested_price
+        record.fill_price = fill_price or requested_price
+        record.deal = deal
+        observe('execution', 'signal_to_send_end', record.send_ended - record.signal_time)
+        slippage = record.values()['slippage_points']
+        if slippage is not None and abs(slippage) > CONFIG.MIN_DEVIATION:
+            logging.warning(f"{record.symbol}: filled {slippage:+.0f} points from the requested price (MIN_DEVIATION {CONFIG.MIN_DEVIATION}).")
+
+    def confirmed(self, record, deal):
+        """
+        Deal confirmation callback: the deal's price is the actual fill and its time_msc the
+        fill time (send_ended when the server clock is out of line with ours).
+        """
+        if deal is None:
+            return
+        record.confirm_time = time.time()
+        record.fill_price = deal.price
+        executed = deal_time(deal)
+        record.fill_time = executed if record.send_started - 1.0 <= executed <= record.confirm_time else record.send_ended
+        observe('execution', 'signal_to_fill', record.fill_time - record.signal_time)
+
+    def failed(self, record, retcode):
+        record.retcode = retcode
+
+    def summary(self, symbol=None, hour=None, by=('symbol', 'hour')):
+        """
+        Distributions (count, mean, p50, p90, p99, max) of every FIELD over the filled
+        orders, grouped by `by` (any of 'symbol', 'hour'; empty for one overall group) and
+        optionally restricted to one symbol and/or hour.
+        """
+        groups = {}
+        for record in list(self.records):
+            if not record.filled or (symbol is not None and record.symbol != symbol):
+                continue
+            record_hour = record.hour()
+            if hour is not None and record_hour != hour:
+                continue
+            key = tuple(record.symbol if name == 'symbol' else record_hour for name in by)
+            groups.setdefault(key, []).append(record.values())
+
+        result = {}
+        for key, rows in groups.items():
+            result[key] = {field: _distribution([row[field] for row in rows if row[field] is not None])
+                           for field in FIELDS}
+        return result
+
+    def failure_counts(self):
+        """Failed orders per (symbol, retcode)."""
+        counts = {}
+        for record in list(self.records):
+            if not record.filled and record.retcode is not None:
+                counts[(record.symbol, record.retcode)] = counts.get((record.symbol, record.retcode), 0) + 1
+        return counts
+
+def _distribution(values):
+    if not values:
+        return {'count': 0}
+    ordered = sorted(values)
+    return {'count': len(ordered), 'mean': sum(ordered) / len(ordered), 'p50': percentile(ordered, 0.5),
+            'p90': percentile(ordered, 0.9), 'p99': percentile(ordered, 0.99), 'max': ordered[-1]}
+
+# Global instance for easy import
+execution_telemetry = ExecutionTelemetry()
@@ -0,0 +1,25 @@
+import os
+import shutil
+import sys
+import tempfile
+
+# The bot is a directory of modules with relative imports, so the tests import it as a
+# package (named after the checkout directory) with its parent directory on sys.path.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if os.path.dirname(ROOT) not in sys.path:
+    sys.path.insert(0, os.path.dirname(ROOT))
+
+# The tests run against the simulated terminal, which is never picked implicitly
+os.environ.setdefault('MT5_BACKEND', 'sim')
+
+_workdir = None
+
+def pytest_configure(config):
+    # Importing trade_logger creates trade_events.csv / .sqlite in the working directory
+    global _workdir
+    _workdir = tempfile.mkdtemp(prefix='bot-tests-')
+    os.chdir(_workdir)
+
+def pytest_unconfigure(config):
+    os.chdir(ROOT)
+    shutil.rmtree(_workdir, ignore_errors=True)
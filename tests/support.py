@@ -0,0 +1,44 @@
+import importlib
+import os
+
+import numpy as np
+import pandas as pd
+
+PACKAGE = os.path.basename(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def bot(module):
+    """Imports a bot module, e.g. bot('indicators')."""
+    return importlib.import_module(f"{PACKAGE}.{module}")
+
+def random_bars(count, seed=7, start=1_700_000_000, step=60, price=2000.0):
+    """A random-walk OHLC DataFrame indexed by time (like data.get_historical_data)."""
+    rng = np.random.default_rng(seed)
+    close = price + np.cumsum(rng.normal(0, 1.0, count))
+    open_ = np.concatenate(([price], close[:-1]))
+    high = np.maximum(open_, close) + rng.uniform(0, 1.0, count)
+    low = np.minimum(open_, close) - rng.uniform(0, 1.0, count)
+    index = pd.to_datetime(start + step * np.arange(count), unit='s')
+    return pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close,
+                         'tick_volume': np.ones(count, dtype=np.int64)}, index=index)
+
+# pandas_ta's formulas (non TA-Lib path), used as the reference when pandas_ta is not installed
+
+def _rma(series, length):
+    return series.ewm(alpha=1.0 / length, min_periods=length).mean()
+
+def reference_sma(close, length):
+    return close.rolling(length).mean()
+
+def reference_atr(high, low, close, length):
+    prev_close = close.shift(1)
+    true_range = pd.concat([high - low, high - prev_close, prev_close - low], axis=1).abs().max(axis=1)
+    true_range.iloc[:1] = np.nan
+    return _rma(true_range, length)
+
+def reference_rsi(close, length):
+    change = close.diff(1)
+    positive = change.clip(lower=0)
+    negative = change.clip(upper=0)
+    positive_avg = _rma(positive, length)
+    negative_avg = _rma(negative, length)
+    return 100 * positive_avg / (positive_avg + negative_avg.abs())
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from support import bot, random_bars
+
+backtest = bot('backtest')
+bv = bot('backtest_vectorized')
+sim_broker = bot('sim_broker')
+
+# No trailing stops or daily limits: the vectorized mode does not model them
+OVERRIDES = {'MIN_ATR_FOR_TRADE': 0.1, 'RISK_PERCENT_PER_TRADE': 5.0, 'ENABLE_TRAILING_STOP': False,
+             'MAX_DAILY_LOSS_PERCENT': 1e9, 'MAX_DAILY_PROFIT_PERCENT': 1e9}
+
+def test_vectorized_backtest_matches_event_driven_backtest():
+    bars = backtest.load_ohlcv(random_bars(20000, seed=3).rename_axis('time'))
+    # A small tick value keeps the lots well above volume_min, so they follow the balance
+    symbol_info = sim_broker.make_symbol_info('TEST', trade_tick_value=0.001)
+    with backtest.config_overrides(OVERRIDES):
+        expected = backtest.run_backtest(bars, symbol_info).trades_dataframe()
+        result = bv.run_vectorized(bars, symbol_info=symbol_info)
+    trades = result.trades_dataframe()
+    trades = trades[trades['exit_reason'] != 'Open'].reset_index(drop=True)
+
+    assert len(expected) > 50
+    # Position sizes compound with the balance, so they vary over the run
+    assert expected['volume'].nunique() > 1
+    assert len(trades) == len(expected)
+    assert (trades['entry_time'].to_numpy() == expected['entry_time'].to_numpy()).all()
+    assert (trades['exit_time'].to_numpy() == expected['exit_time'].to_numpy()).all()
+    assert np.allclose(trades['volume'], expected['volume'], rtol=0, atol=1e-9)
+    assert np.allclose(trades['profit'], expected['profit'], rtol=0, atol=1e-9)
+    assert abs(result.stats['net_profit'] - expected['profit'].sum()) < 1e-6
+
+def test_sweeping_a_parameter_the_vectorized_engine_does_not_model_is_an_error():
+    optimizer = bot('optimizer')
+    bars = backtest.load_ohlcv(random_bars(500, seed=1).rename_axis('time'))
+    with pytest.raises(ValueError, match='TRAILING_STOP_ATR_FACTOR.*run_backtest'):
+        optimizer.run_sweep(bars, optimizer.grid({'TRAILING_STOP_ATR_FACTOR': [1.0, 2.0]}), workers=1)
+    with pytest.raises(ValueError, match='SMA_FAST'):
+        bv.run_vectorized(bars, {'SMA_FAST': 5})
@@ -0,0 +1,62 @@
+import time
+from collections import namedtuple
+
+import pytest
+
+from support import bot
+
+mt5_api = bot('mt5_api')
+mt5_utils = bot('mt5_utils')
+metrics = bot('metrics')
+telemetry = bot('telemetry')
+
+Deal = namedtuple('Deal', ['ticket', 'time', 'time_msc', 'price'])
+
+class FakeTerminal:
+    """Deals become visible in the history only once added to `deals`."""
+
+    def __init__(self):
+        self.deals = {}
+
+    def history_deals_get(self, ticket=None):
+        deal = self.deals.get(ticket)
+        return (deal,) if deal else ()
+
+    def last_error(self):
+        return (1, 'Success')
+
+@pytest.fixture
+def terminal():
+    fake = FakeTerminal()
+    previous = mt5_api.use_backend(fake)
+    yield fake
+    mt5_api.use_backend(previous)
+
+def test_a_late_deal_is_confirmed_on_the_next_due_poll_and_timed_from_the_deal(terminal):
+    confirmations = mt5_utils.DealConfirmations()
+    record = telemetry.OrderRecord('XAU', 1, 0.01, time.time() - 0.05, 2000.0)
+    record.send_started = record.send_ended = time.time()
+    confirmations.expect(42, lambda deal: telemetry.ExecutionTelemetry().confirmed(record, deal))
+    assert len(confirmations) == 1
+
+    executed = time.time()
+    terminal.deals[42] = Deal(42, int(executed), int(executed * 1000), 2000.5)
+    confirmations.poll() # Not due yet: the first re-check waits DEAL_CONFIRM_INITIAL_MS
+    assert len(confirmations) == 1
+
+    due = confirmations.seconds_until_due()
+    assert due is not None and due <= 0.5
+    time.sleep(due + 0.02)
+    confirmations.poll()
+    assert len(confirmations) == 0 and confirmations.seconds_until_due() is None
+    assert record.fill_price == 2000.5
+    # The fill happened when the deal executed, not when the poll noticed it
+    assert record.fill_time == pytest.approx(int(executed * 1000) / 1000.0)
+    assert record.confirm_time - record.fill_time >= due
+
+def test_a_deal_from_an_out_of_line_server_clock_falls_back_to_the_send_time(terminal):
+    record = telemetry.OrderRecord('XAU', 1, 0.01, time.time() - 0.05, 2000.0)
+    record.send_started = record.send_ended = time.time()
+    terminal.deals[7] = Deal(7, int(time.time()) + 3600, 0, 2000.0) # Server clock an hour ahead
+    mt5_utils.DealConfirmations().expect(7, lambda deal: telemetry.ExecutionTelemetry().confirmed(record, deal))
+    assert record.fill_time == record.send_ended
@@ -0,0 +1,77 @@
+import datetime
+import time
+
+import pytest
+import pytz
+
+from support import bot
+
+constants = bot('constants')
+mt5_api = bot('mt5_api')
+sim_broker = bot('sim_broker')
+risk = bot('risk')
+trade_logger = bot('trade_logger')
+
+MAGIC = 4242
+
+@pytest.fixture
+def broker():
+    fake = sim_broker.SimulatedBroker(sim_broker.make_symbol_info('XAU'))
+    previous = mt5_api.use_backend(fake)
+    yield fake
+    mt5_api.use_backend(previous)
+
+def test_a_stop_loss_exit_counts_as_a_closed_trade(broker, tmp_path, monkeypatch):
+    logger = trade_logger.TradeCsvLogger(str(tmp_path / 'events.csv'), event_store_file=str(tmp_path / 'events.sqlite'))
+    monkeypatch.setattr(risk, 'trade_csv_logger', logger)
+    monkeypatch.setattr(risk, 'daily_pnl_ledger', risk.DailyPnlLedger())
+    try:
+        now = time.time() - 5 # The ledger reads deals up to the current time
+        broker.set_price(now, 2000.0)
+        risk.update_daily_pnl_from_closed_deals([MAGIC]) # Start-up: nothing closed yet
+
+        broker.order_send({'action': broker.TRADE_ACTION_DEAL, 'symbol': 'XAU', 'volume': 0.1,
+                           'type': broker.ORDER_TYPE_BUY, 'price': 2000.0, 'sl': 1990.0, 'tp': 2020.0, 'magic': MAGIC})
+        # The server closes the position at its stop; the bot sends no close request
+        (deal,) = broker.check_stops(now + 1, 1995.0, 1996.0, 1985.0)
+        assert deal.reason == sim_broker.DEAL_REASON_SL
+
+        risk.update_daily_pnl_from_closed_deals([MAGIC])
+        risk.daily_pnl_ledger.reconcile() # Re-walking the day's deals logs nothing twice
+        risk.update_daily_pnl_from_closed_deals([MAGIC])
+        assert logger.flush(timeout=2.0)
+
+        closed = logger.event_store.events(event='Trade Closed')
+        assert len(closed) == 1
+        assert closed[0]['close_price'] == 1990.0 and closed[0]['trade_type'] == 'BUY'
+        assert closed[0]['profit_loss'] == pytest.approx(deal.profit) and deal.profit < 0
+        stats = logger.event_store.win_rate()
+        assert stats['trades'] == 1 and stats['wins'] == 0 and stats['profit_loss'] == pytest.approx(deal.profit)
+        assert [row[2] for row in logger.event_store.daily_pnl()] == [1]
+    finally:
+        logger.close()
+
+def test_a_close_before_midnight_first_seen_after_it_is_logged_on_its_own_day(broker, tmp_path, monkeypatch):
+    logger = trade_logger.TradeCsvLogger(str(tmp_path / 'events.csv'), event_store_file=str(tmp_path / 'events.sqlite'))
+    monkeypatch.setattr(risk, 'trade_csv_logger', logger)
+    ledger = risk.DailyPnlLedger()
+    timezone = pytz.timezone(constants.MT5_TIMEZONE)
+    evening = timezone.localize(datetime.datetime(2024, 3, 4, 23, 0))
+    try:
+        broker.set_price(evening.timestamp(), 2000.0)
+        ledger.update(now=evening) # Last update of the day
+        broker.order_send({'action': broker.TRADE_ACTION_DEAL, 'symbol': 'XAU', 'volume': 0.1,
+                           'type': broker.ORDER_TYPE_BUY, 'price': 2000.0, 'sl': 1990.0, 'tp': 2020.0, 'magic': MAGIC})
+        (deal,) = broker.check_stops(evening.timestamp() + 1800, 1995.0, 1996.0, 1985.0) # 23:30
+
+        ledger.update(now=timezone.localize(datetime.datetime(2024, 3, 5, 0, 0, 5)))
+        closed = ledger.closed_deals()
+        assert [d.ticket for d in closed] == [deal.ticket]
+        risk.log_closing_deal(closed[0], 0.0)
+        assert logger.flush(timeout=2.0)
+
+        (row,) = logger.event_store.events(event='Trade Closed')
+        assert row['ts'] == deal.time and row['day'] == '2024-03-04'
+        assert logger.event_store.daily_pnl() == [('2024-03-04', pytest.approx(deal.profit), 1)]
+    finally:
+        logger.close()
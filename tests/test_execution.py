@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+from support import bot
+
+execution = bot('execution')
+constants = bot('constants')
+
+def test_a_retry_that_cannot_be_priced_is_recorded_as_a_failed_trade(monkeypatch):
+    prices = iter([(2000.0, 1990.0, 2020.0, 0.1), None]) # The tick is gone on the retry
+    events = []
+    monkeypatch.setattr(execution, 'get_account_info', lambda: SimpleNamespace(balance=10000.0))
+    monkeypatch.setattr(execution, '_price_entry', lambda *args: next(prices))
+    requote = SimpleNamespace(retcode=execution.mt5.TRADE_RETCODE_REQUOTE, comment='Requote', request=None)
+    monkeypatch.setattr(execution, 'send_order', lambda request: requote)
+    monkeypatch.setattr(execution.trade_csv_logger, 'log_trade_event', lambda **row: events.append(row))
+    symbol_info = SimpleNamespace(name='XAU', point=0.01)
+
+    execution.execute_trade(symbol_info, constants.SIGNAL_BUY, 5.0, {}, [0.0])
+
+    assert [row['event'] for row in events] == ['Trade Failed']
+    assert events[0]['entry_price'] == 2000.0
+    record = execution.execution_telemetry.records[-1]
+    assert not record.filled and record.attempts == 1
+    assert record.retcode == execution.mt5.TRADE_RETCODE_REQUOTE
+
+def test_a_stale_snapshot_never_loosens_a_stop_already_sent(monkeypatch):
+    sent = []
+    monkeypatch.setattr(execution, 'send_stop_update', lambda position, symbol_info, sl: sent.append(sl) or True)
+    monkeypatch.setattr(execution, 'compute_trailing_stop', lambda position, symbol_info, price, atr: price - atr)
+    manager = execution.StopManager(min_step_points=10, min_interval_ms=0)
+    symbol_info = SimpleNamespace(point=0.0001, digits=4)
+    # The snapshot still shows the original stop after each modification
+    position = SimpleNamespace(ticket=1, type=execution.mt5.ORDER_TYPE_BUY, sl=1.0)
+
+    manager.submit(position, symbol_info, 1.0150, 0.01)
+    assert manager.flush({1}) == 1
+    manager.submit(position, symbol_info, 1.0130, 0.01) # Price fell back: 1.0030 would loosen 1.0050
+    assert manager.flush({1}) == 0
+    assert sent == [1.0050] and len(manager) == 0 and manager.counters['superseded'] == 1
+
+    sell = SimpleNamespace(ticket=2, type=execution.mt5.ORDER_TYPE_SELL, sl=2.0)
+    monkeypatch.setattr(execution, 'compute_trailing_stop', lambda position, symbol_info, price, atr: price + atr)
+    manager.submit(sell, symbol_info, 1.9850, 0.01)
+    manager.submit(sell, symbol_info, 1.9870, 0.01) # Supersedes the pending 1.9950 before it is sent
+    assert manager.flush({2}) == 1
+    manager.submit(sell, symbol_info, 1.9890, 0.01)
+    assert manager.flush({2}) == 0
+    assert sent == [1.0050, 1.9970]
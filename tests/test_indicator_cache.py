@@ -0,0 +1,18 @@
+import gc
+
+from support import bot, random_bars
+
+backtest = bot('backtest')
+indicator_cache = bot('indicator_cache')
+
+def test_the_cache_does_not_keep_dropped_datasets_alive():
+    cache = indicator_cache.IndicatorCache()
+    bars = backtest.load_ohlcv(random_bars(1000, seed=5).rename_axis('time'))
+    for start in range(0, 800, 100):
+        window = {col: values[start:start + 200] for col, values in bars.items()}
+        first = cache.get('sma', 10, window)
+        assert cache.get('sma', 10, window) is first # Same window: hash and series reused
+    del window
+    gc.collect()
+    assert len(cache._hashes) == 0
+    assert cache.stats()['hits'] == 8 and cache.stats()['misses'] == 8
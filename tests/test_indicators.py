@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from support import bot, random_bars, reference_sma, reference_atr, reference_rsi
+
+indicators = bot('indicators')
+npi = bot('numpy_indicators')
+
+LENGTHS = (5, 14, 50)
+
+def _assert_parity(values, reference):
+    reference = reference.to_numpy(dtype=np.float64)
+    # Same warm-up: the leading values are NaN in both
+    assert np.array_equal(np.isnan(values), np.isnan(reference))
+    assert np.nanmax(np.abs(values - reference)) < 1e-9
+
+@pytest.mark.parametrize('length', LENGTHS)
+def test_numpy_indicators_match_reference_formulas(length):
+    df = random_bars(2000)
+    close, high, low = df['close'].to_numpy(), df['high'].to_numpy(), df['low'].to_numpy()
+    _assert_parity(npi.sma(close, length), reference_sma(df['close'], length))
+    _assert_parity(npi.atr(high, low, close, length), reference_atr(df['high'], df['low'], df['close'], length))
+    _assert_parity(npi.rsi(close, length), reference_rsi(df['close'], length))
+
+@pytest.mark.parametrize('length', LENGTHS)
+def test_numpy_indicators_match_pandas_ta(length):
+    ta = pytest.importorskip('pandas_ta')
+    df = random_bars(2000)
+    close, high, low = df['close'].to_numpy(), df['high'].to_numpy(), df['low'].to_numpy()
+    _assert_parity(npi.sma(close, length), ta.sma(df['close'], length=length))
+    _assert_parity(npi.atr(high, low, close, length), ta.atr(df['high'], df['low'], df['close'], length=length))
+    _assert_parity(npi.rsi(close, length), ta.rsi(df['close'], length=length))
+
+def test_compare_backends_reports_no_difference():
+    pytest.importorskip('pandas_ta')
+    differences = indicators.compare_backends(random_bars(1000))
+    assert differences and max(differences.values()) < 1e-9
+
+def test_numpy_indicators_on_short_input_are_all_nan():
+    df = random_bars(10)
+    close = df['close'].to_numpy()
+    assert np.isnan(npi.sma(close, 14)).all()
+    assert np.isnan(npi.atr(df['high'].to_numpy(), df['low'].to_numpy(), close, 14)).all()
+    assert np.isnan(npi.rsi(close, 14)).all()
@@ -0,0 +1,17 @@
+import importlib.util
+
+import pytest
+
+from support import bot
+
+mt5_api = bot('mt5_api')
+
+@pytest.mark.skipif(importlib.util.find_spec('MetaTrader5') is not None, reason="MetaTrader5 is installed")
+def test_a_missing_metatrader5_package_is_an_error_not_the_simulator():
+    with pytest.raises(ImportError, match='MT5_BACKEND=sim'):
+        mt5_api._load_backend('metatrader5')
+
+def test_the_simulator_is_only_used_when_selected():
+    assert mt5_api._load_backend('sim').__name__.endswith('.mt5_sim')
+    with pytest.raises(ValueError):
+        mt5_api._load_backend('auto')
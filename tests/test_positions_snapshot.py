@@ -0,0 +1,52 @@
+from collections import namedtuple
+
+import pytest
+
+from support import bot
+
+mt5_api = bot('mt5_api')
+mt5_utils = bot('mt5_utils')
+
+Position = namedtuple('Position', ['ticket', 'symbol', 'magic', 'sl', 'tp'])
+
+class FakeTerminal:
+    def __init__(self):
+        self.positions = []
+
+    def positions_get(self):
+        return tuple(self.positions)
+
+    def last_error(self):
+        return (1, 'Success')
+
+@pytest.fixture
+def terminal():
+    fake = FakeTerminal()
+    previous = mt5_api.use_backend(fake)
+    yield fake
+    mt5_api.use_backend(previous)
+
+def test_every_consumer_sees_a_close_whoever_refreshed(terminal):
+    snapshot = mt5_utils.PositionsSnapshot()
+    terminal.positions = [Position(1, 'XAU', 7, 1.0, 2.0)]
+    snapshot.refresh()
+    tick_cursor = snapshot.sequence
+
+    # The candle cycle's refresh detects the close and gets the event...
+    terminal.positions = []
+    assert [event.kind for event in snapshot.refresh()] == [mt5_utils.POSITION_CLOSED]
+    # ...and the tick task's own refresh finds nothing new, but its cursor still has it
+    assert snapshot.refresh() == []
+    events, tick_cursor = snapshot.events_since(tick_cursor)
+    assert [(event.kind, event.position.ticket) for event in events] == [(mt5_utils.POSITION_CLOSED, 1)]
+    assert snapshot.events_since(tick_cursor) == ([], tick_cursor)
+
+def test_events_since_skips_events_before_the_cursor(terminal):
+    snapshot = mt5_utils.PositionsSnapshot()
+    terminal.positions = [Position(1, 'XAU', 7, 1.0, 2.0)]
+    snapshot.refresh()
+    cursor = snapshot.sequence
+    terminal.positions = [Position(1, 'XAU', 7, 1.5, 2.0), Position(2, 'EUR', 8, 0.0, 0.0)]
+    snapshot.refresh()
+    events, _ = snapshot.events_since(cursor)
+    assert sorted(event.kind for event in events) == [mt5_utils.POSITION_OPENED, mt5_utils.POSITION_SL_MODIFIED]
@@ -0,0 +1,40 @@
+import datetime
+import threading
+
+from support import bot
+
+schedular = bot('schedular')
+
+# 2024-01-02 10:02:30 UTC (MT5_TIMEZONE is Etc/UTC)
+NOW = datetime.datetime(2024, 1, 2, 10, 2, 30, tzinfo=datetime.timezone.utc).timestamp()
+
+def test_first_runs_follow_the_injected_clock():
+    scheduler = schedular.Scheduler(clock=lambda: NOW)
+    try:
+        candle = scheduler.at_candle_close(('*', 'M5', 'candle_close'), 'M5', lambda: None, delay=0.5)
+        daily = scheduler.daily(('*', 'D1', 'reset'), lambda: None)
+    finally:
+        scheduler.stop()
+    assert candle.next_run == NOW + 150 + 0.5
+    assert daily.next_run == datetime.datetime(2024, 1, 3, tzinfo=datetime.timezone.utc).timestamp()
+
+def test_queue_depth_counts_runs_waiting_for_a_worker():
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(5)
+
+    scheduler = schedular.Scheduler(workers=1, clock=lambda: NOW)
+    try:
+        scheduler.once('blocker', blocker, when=NOW)
+        scheduler.once('a', lambda: None, when=NOW)
+        scheduler.once('b', lambda: None, when=NOW)
+        scheduler.run_pending()
+        assert started.wait(5)
+        assert scheduler.queue_depth() == 2
+        release.set()
+    finally:
+        scheduler.stop()
+    assert scheduler.queue_depth() == 0
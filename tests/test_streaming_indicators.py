@@ -0,0 +1,70 @@
+import math
+
+import numpy as np
+import pytest
+
+from support import bot, random_bars, reference_sma, reference_atr, reference_rsi
+
+streaming = bot('streaming_indicators')
+data = bot('data')
+indicators = bot('indicators')
+strategy = bot('strategy')
+
+LENGTH = 14
+
+def _stream(df, make, feed):
+    indicator = make(LENGTH)
+    return np.array([feed(indicator, row) for row in df.itertuples()], dtype=np.float64)
+
+def _assert_parity(values, reference):
+    reference = reference.to_numpy(dtype=np.float64)
+    assert np.array_equal(np.isnan(values), np.isnan(reference))
+    assert np.nanmax(np.abs(values - reference)) < 1e-9
+
+def _references():
+    try:
+        import pandas_ta as ta
+    except ImportError:
+        ta = None
+    yield 'formulas', reference_sma, reference_atr, reference_rsi
+    if ta is None:
+        yield pytest.param('pandas_ta', None, None, None, marks=pytest.mark.skip(reason="pandas_ta not installed"))
+    else:
+        yield ('pandas_ta', lambda close, length: ta.sma(close, length=length),
+               lambda high, low, close, length: ta.atr(high, low, close, length=length),
+               lambda close, length: ta.rsi(close, length=length))
+
+@pytest.mark.parametrize('name, sma, atr, rsi', list(_references()))
+def test_streaming_indicators_match_reference(name, sma, atr, rsi):
+    df = random_bars(500)
+    _assert_parity(_stream(df, streaming.StreamingSMA, lambda i, row: i.update(row.close)),
+                   sma(df['close'], LENGTH))
+    _assert_parity(_stream(df, streaming.StreamingATR, lambda i, row: i.update(row.high, row.low, row.close)),
+                   atr(df['high'], df['low'], df['close'], LENGTH))
+    _assert_parity(_stream(df, streaming.StreamingRSI, lambda i, row: i.update(row.close)),
+                   rsi(df['close'], LENGTH))
+
+def _cache(df):
+    cache = data.BarCache('TEST', 1, 'M1', len(df))
+    rates = np.zeros(len(df), dtype=[('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'),
+                                     ('close', '<f8'), ('tick_volume', '<u8')])
+    rates['time'] = [int(t.timestamp()) for t in df.index]
+    for column in ('open', 'high', 'low', 'close', 'tick_volume'):
+        rates[column] = df[column].to_numpy()
+    cache._rates = rates
+    return cache
+
+def test_streaming_and_dataframe_paths_evaluate_the_same_closed_bar():
+    df = random_bars(400, seed=11)
+    cache = _cache(df)
+
+    engine = streaming.IndicatorEngine()
+    engine.sync(cache)
+    frame = indicators.calculate_all_indicators(cache.to_dataframe(closed_only=True))
+
+    # The newest cached bar is forming: neither path evaluates it
+    assert engine.last_time == int(df.index[-2].timestamp())
+    assert frame.index[-1] == df.index[-2]
+    for column, value in engine.last_bar.items():
+        assert math.isclose(value, frame[column].iloc[-1], rel_tol=0, abs_tol=1e-9)
+    assert strategy.generate_signal(frame) == strategy.evaluate_signal(engine.last_bar, engine.prev_bar)
@@ -0,0 +1,26 @@
+import time
+
+from support import bot
+
+config = bot('config')
+trade_logger = bot('trade_logger')
+
+def test_the_last_rows_are_synced_once_the_writer_is_idle(tmp_path, monkeypatch):
+    monkeypatch.setitem(config.CONFIG._config_data, 'TRADE_LOG_FSYNC', 'interval')
+    monkeypatch.setitem(config.CONFIG._config_data, 'TRADE_LOG_FSYNC_SECONDS', 0.2)
+    monkeypatch.setitem(config.CONFIG._config_data, 'TRADE_LOG_FLUSH_MS', 10)
+    synced = []
+    monkeypatch.setattr(trade_logger.os, 'fsync', lambda fd: synced.append(time.monotonic()))
+    logger = trade_logger.TradeCsvLogger(str(tmp_path / 'events.csv'), event_store_file='')
+    try:
+        # Written right after the logger's start, so the interval policy leaves it unsynced
+        logger.log_trade_event('Trade Opened', 'XAU', 'BUY', 0.1, 2000.0, 1990.0, 2020.0)
+        assert logger.flush(timeout=1.0) and logger.written == 1
+        assert synced == []
+        # No later batch arrives; the idle writer syncs it when the interval is up
+        deadline = time.monotonic() + 2.0
+        while not synced and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(synced) == 1
+    finally:
+        logger.close()
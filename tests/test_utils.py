@@ -0,0 +1,28 @@
+import datetime
+import time
+
+from support import bot
+
+utils = bot('utils')
+
+def test_sleep_until_next_candle_runs_idle_while_waiting():
+    calls = []
+
+    def idle():
+        calls.append(time.monotonic())
+        return 0.05
+
+    # 0.3 s before the next M1 candle
+    now = datetime.datetime(2024, 1, 2, 10, 0, 59, 700000, tzinfo=datetime.timezone.utc)
+    started = time.monotonic()
+    utils.sleep_until_next_candle(now, 'M1', idle)
+    elapsed = time.monotonic() - started
+
+    assert 0.25 < elapsed < 0.6
+    assert len(calls) >= 4
+    assert max(b - a for a, b in zip(calls, calls[1:])) < 0.15
+
+def test_sleep_with_idle_never_oversleeps_the_deadline():
+    started = time.monotonic()
+    utils.sleep_with_idle(0.1, lambda: 10.0)
+    assert time.monotonic() - started < 0.3
@@ -1,13 +1,48 @@
+import atexit
 import csv
 import os
 import datetime
 import logging
+import queue
+import threading
+import time
+from .config import CONFIG
 from .constants import TRADE_LOG_CSV_HEADER
+from .metrics import register_gauge
+from .event_store import open_event_store
+
+# Events are formatted on the caller's thread and handed to a bounded queue; a background
+# writer appends them in batches (TRADE_LOG_BATCH_SIZE rows or every TRADE_LOG_FLUSH_MS),
+# so order placement never waits on disk I/O. TRADE_LOG_FSYNC sets when written batches
+# are forced to disk: "always" (every batch), "interval" (at most every
+# TRADE_LOG_FSYNC_SECONDS; rows left unsynced are synced once the writer has been idle
+# that long, and at close) or "never" (left to the OS). A full queue drops the event and
+# counts it. The queue is drained at exit, including exits by an unhandled exception.
+# With EVENT_STORE_FILE set, every batch is also appended to an event_store.EventStore.
+
+_STOP = object()
+_EVENT_KEYS = ('Timestamp', 'Event', 'Symbol', 'Trade Type', 'Volume', 'Entry Price', 'SL Price', 'TP Price',
+               'Close Price', 'Profit/Loss', 'Daily P/L', 'Comment')
+
+def _number(values, key, digits):
+    """values[key] formatted with `digits` decimals, or '' if it is not a number."""
+    value = values.get(key)
+    return f"{value:.{digits}f}" if isinstance(value, (float, int)) else ''
 
 class TradeCsvLogger:
-    def __init__(self, filename='trade_events.csv'):
+    def __init__(self, filename='trade_events.csv', event_store_file=None):
         self.filename = filename
+        event_store_file = CONFIG.get('EVENT_STORE_FILE', '') if event_store_file is None else event_store_file
+        self.event_store = open_event_store(event_store_file) if event_store_file else None
+        self.dropped = 0
+        self.written = 0
+        self._queue = queue.Queue(maxsize=CONFIG.get('TRADE_LOG_QUEUE_SIZE', 10000))
+        self._thread = None
+        self._lock = threading.Lock()
+        self._last_fsync = time.monotonic()
+        self._unsynced = False # Rows written since the last fsync ("interval" policy)
         self._ensure_header()
+        atexit.register(self.close)
 
     def _ensure_header(self):
         """Ensures the CSV file exists and has the correct header."""
@@ -22,40 +57,164 @@ class TradeCsvLogger:
 
     def log_trade_event(self, event, symbol, trade_type, volume, entry_price,
                         sl_price, tp_price, close_price='', profit_loss='', daily_pnl='',
-                        indicator_data=None, comment=''):
+                        indicator_data=None, comment='', timestamp=None):
         """
-        Logs a trade event to the CSV file.
+        Logs a trade event to the CSV file (and the event store, if configured).
         `indicator_data` should be a dictionary containing keys from TRADE_LOG_CSV_HEADER.
+        `timestamp` (epoch seconds) dates the event; defaults to now.
+        Only the raw values are queued here; the writer thread formats them.
         """
-        if indicator_data is None:
-            indicator_data = {}
-
-        row_data = {key: '' for key in TRADE_LOG_CSV_HEADER} # Initialize all with empty string
-
-        row_data.update({
-            'Timestamp': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        values = dict(indicator_data) if indicator_data else {}
+        values.update({
             'Event': event,
             'Symbol': symbol,
             'Trade Type': trade_type,
-            'Volume': f"{volume:.2f}" if isinstance(volume, (float, int)) else '',
-            'Entry Price': f"{entry_price:.5f}" if isinstance(entry_price, (float, int)) else '',
-            'SL Price': f"{sl_price:.5f}" if isinstance(sl_price, (float, int)) else '',
-            'TP Price': f"{tp_price:.5f}" if isinstance(tp_price, (float, int)) else '',
-            'Close Price': f"{close_price:.5f}" if isinstance(close_price, (float, int)) else '',
-            'Profit/Loss': f"{profit_loss:.2f}" if isinstance(profit_loss, (float, int)) else '',
-            'Daily P/L': f"{daily_pnl:.2f}" if isinstance(daily_pnl, (float, int)) else '',
+            'Volume': volume,
+            'Entry Price': entry_price,
+            'SL Price': sl_price,
+            'TP Price': tp_price,
+            'Close Price': close_price,
+            'Profit/Loss': profit_loss,
+            'Daily P/L': daily_pnl,
             'Comment': comment
         })
+        row_data = (time.time() if timestamp is None else timestamp, values)
+
+        self._start_writer()
+        try:
+            self._queue.put_nowait(row_data)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logging.warning(f"Trade log queue full: {self.dropped} event(s) dropped so far.")
+            return
+        logging.debug(f"Logged event to CSV: {event} for {symbol}")
+
+    def flush(self, timeout=None):
+        """Blocks until every queued event has been written (or `timeout` seconds passed)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout=5.0):
+        """Drains the queue and stops the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logging.error("Trade log queue still full at shutdown; pending events are lost.")
+            return
+        thread.join(timeout)
+
+    def _start_writer(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._writer, name='trade-csv-writer', daemon=True)
+                    self._thread.start()
+
+    def _writer(self):
+        batch_size = CONFIG.get('TRADE_LOG_BATCH_SIZE', 100)
+        flush_interval = CONFIG.get('TRADE_LOG_FLUSH_MS', 500) / 1000.0
+        stopping = False
+        while not stopping:
+            try:
+                rows = [self._queue.get(timeout=self._seconds_until_fsync())]
+            except queue.Empty:
+                self._sync() # Idle with rows still unsynced
+                continue
+            deadline = time.monotonic() + flush_interval
+            while len(rows) < batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    rows.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            received = len(rows)
+            stopping = any(row is _STOP for row in rows)
+            rows = [row for row in rows if row is not _STOP]
+            try:
+                if rows:
+                    self._write(rows)
+            except Exception as e:
+                logging.error(f"Failed to write {len(rows)} event(s) to {self.filename}: {e}")
+            finally:
+                if stopping:
+                    self._sync()
+                for _ in range(received):
+                    self._queue.task_done()
+
+    def _seconds_until_fsync(self):
+        """How long the idle writer may wait before the pending fsync is due (None: nothing pending)."""
+        if not self._unsynced:
+            return None
+        return max(0.0, self._last_fsync + CONFIG.get('TRADE_LOG_FSYNC_SECONDS', 5) - time.monotonic())
+
+    def _sync(self):
+        if not self._unsynced:
+            return
+        try:
+            with open(self.filename, mode='a', encoding='utf-8') as file:
+                os.fsync(file.fileno())
+        except OSError as e:
+            logging.error(f"Failed to fsync {self.filename}: {e}")
+        self._last_fsync = time.monotonic()
+        self._unsynced = False
+
+    @staticmethod
+    def _format_row(timestamp, values):
+        row_data = {key: '' for key in TRADE_LOG_CSV_HEADER} # Initialize all with empty string
+
+        row_data.update({
+            'Timestamp': datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S'),
+            'Event': values['Event'],
+            'Symbol': values['Symbol'],
+            'Trade Type': values['Trade Type'],
+            'Volume': _number(values, 'Volume', 2),
+            'Entry Price': _number(values, 'Entry Price', 5),
+            'SL Price': _number(values, 'SL Price', 5),
+            'TP Price': _number(values, 'TP Price', 5),
+            'Close Price': _number(values, 'Close Price', 5),
+            'Profit/Loss': _number(values, 'Profit/Loss', 2),
+            'Daily P/L': _number(values, 'Daily P/L', 2),
+            'Comment': values['Comment']
+        })
 
         # Add indicator data, ensuring keys exist in header
-        for key, value in indicator_data.items():
-            if key in TRADE_LOG_CSV_HEADER:
+        for key, value in values.items():
+            if key in TRADE_LOG_CSV_HEADER and key not in _EVENT_KEYS:
                 row_data[key] = str(value) # Convert to string for CSV
+        return row_data
 
+    def _write(self, rows):
+        if self.event_store is not None:
+            try:
+                self.event_store.append(rows)
+            except Exception as e:
+                logging.error(f"Failed to append {len(rows)} event(s) to the event store: {e}")
         with open(self.filename, mode='a', newline='', encoding='utf-8') as file:
             writer = csv.DictWriter(file, fieldnames=TRADE_LOG_CSV_HEADER)
-            writer.writerow(row_data)
-        logging.debug(f"Logged event to CSV: {event} for {symbol}")
+            writer.writerows(self._format_row(timestamp, values) for timestamp, values in rows)
+            file.flush()
+            policy = CONFIG.get('TRADE_LOG_FSYNC', 'interval')
+            now = time.monotonic()
+            if policy == 'always' or (policy == 'interval' and now - self._last_fsync >= CONFIG.get('TRADE_LOG_FSYNC_SECONDS', 5)):
+                os.fsync(file.fileno())
+                self._last_fsync = now
+                self._unsynced = False
+            elif policy == 'interval':
+                self._unsynced = True
+        self.written += len(rows)
 
 # Global instance for easy import
-trade_csv_logger = TradeCsvLogger()
\ No newline at end of file
+trade_csv_logger = TradeCsvLogger()
+register_gauge('trade_log_queue_depth', lambda: trade_csv_logger._queue.qsize(), "Trade events waiting for the CSV writer.")
+register_gauge('trade_log_dropped', lambda: trade_csv_logger.dropped, "Trade events dropped because the queue was full.")
\ No newline at end of file
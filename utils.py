@@ -1,16 +1,17 @@
 import datetime
-import pytz
 import time
 import logging
-from .constants import TIMEFRAME_DURATIONS_SECONDS, MT5_TIMEZONE
+from collections import deque
+from .config import CONFIG
+from .constants import TIMEFRAME_DURATIONS_SECONDS
+from .mt5_api import mt5
+from .metrics import percentile
 
 def calculate_next_candle_open(current_mt5_time, timeframe_str):
     """
     Calculates the exact datetime of the next candle's open,
     accounting for different timeframes.
     """
-    timezone = pytz.timezone(MT5_TIMEZONE)
-    
     timeframe_duration_in_seconds = TIMEFRAME_DURATIONS_SECONDS.get(timeframe_str)
     if timeframe_duration_in_seconds is None:
         logging.error(f"Unsupported timeframe duration for '{timeframe_str}'. Cannot calculate next candle open.")
@@ -41,32 +42,44 @@ def calculate_next_candle_open(current_mt5_time, timeframe_str):
             else:
                 next_candle_open = (current_mt5_time + datetime.timedelta(days=days_until_next_monday)).replace(hour=0, minute=0, second=0, microsecond=0)
         elif timeframe_str == "MN1":
-            # Get start of current month
-            start_of_current_month = current_mt5_time.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            if current_mt5_time >= start_of_current_month and current_mt5_time.microsecond == 0:
-                # If current time is past or at start of current month
-                if current_mt5_time.month == 12:
-                    next_month = 1
-                    next_year = current_mt5_time.year + 1
-                else:
-                    next_month = current_mt5_time.month + 1
-                    next_year = current_mt5_time.year
-                next_candle_open = datetime.datetime(next_year, next_month, 1, 0, 0, 0, tzinfo=timezone)
-            else: # If current time is before the start of the current month (unlikely with "now")
-                next_candle_open = start_of_current_month
+            # Monthly candles open on the 1st; the next one is always next month's
+            if current_mt5_time.month == 12:
+                next_candle_open = current_mt5_time.replace(year=current_mt5_time.year + 1, month=1, day=1,
+                                                            hour=0, minute=0, second=0, microsecond=0)
+            else:
+                next_candle_open = current_mt5_time.replace(month=current_mt5_time.month + 1, day=1,
+                                                            hour=0, minute=0, second=0, microsecond=0)
         else:
             logging.error(f"Unsupported timeframe: {timeframe_str}. Cannot calculate next candle open.")
             return None
     
     return next_candle_open
 
-def sleep_until_next_candle(current_mt5_time, timeframe_str):
-    """Calculates sleep duration and pauses execution until the next candle opens."""
+def sleep_with_idle(seconds, idle=None):
+    """
+    Sleeps `seconds`. With `idle`, calls it on this thread meanwhile: idle() does any
+    work that is due and returns the seconds until it wants to be called again.
+    """
+    if idle is None:
+        time.sleep(seconds)
+        return
+    deadline = time.monotonic() + seconds
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        time.sleep(max(0.001, min(idle(), remaining)))
+
+def sleep_until_next_candle(current_mt5_time, timeframe_str, idle=None):
+    """
+    Calculates sleep duration and pauses execution until the next candle opens.
+    `idle` runs periodically while waiting (see sleep_with_idle).
+    """
     next_candle_open = calculate_next_candle_open(current_mt5_time, timeframe_str)
     
     if next_candle_open is None:
         logging.warning("Could not determine next candle open time. Sleeping for 60 seconds.")
-        time.sleep(60)
+        sleep_with_idle(60, idle)
         return
 
     sleep_seconds = (next_candle_open - current_mt5_time).total_seconds()
@@ -81,4 +94,126 @@ def sleep_until_next_candle(current_mt5_time, timeframe_str):
     if sleep_seconds > 5:
         logging.info(f"Sleeping for {int(sleep_seconds)} seconds until next candle open ({next_candle_open.strftime('%Y-%m-%d %H:%M:%S %Z')})...")
     
-    time.sleep(sleep_seconds)
\ No newline at end of file
+    sleep_with_idle(sleep_seconds, idle)
+
+class CandleCloseDetector:
+    """
+    Detects candle closes from the server's own bars instead of the local clock.
+
+    wait_for_close() sleeps until `lead_ms` before the expected boundary (server time
+    mapped to the local clock with a learned offset), then polls the latest bar with
+    copy_rates_from_pos(symbol, timeframe, 0, 1) every `poll_ms` until a new bar opens.
+    If no bar appears (quiet market, weekend) the poll interval backs off to 5 seconds.
+
+    Every detection gives a lower bound of the server-local clock offset
+    (new bar time - local detection time); the largest recent bound is used, which
+    absorbs broker timezone and clock skew. record_signal() stores the latency from
+    the (estimated) close to the moment the signal was ready.
+    """
+
+    MAX_POLL_SECONDS = 5.0
+
+    def __init__(self, symbol, timeframe_mt5, timeframe_str, lead_ms=None, poll_ms=None, history=500):
+        self.symbol = symbol
+        self.timeframe_mt5 = timeframe_mt5
+        self.timeframe_str = timeframe_str
+        self.lead = (lead_ms if lead_ms is not None else CONFIG.CANDLE_DETECTOR_LEAD_MS) / 1000.0
+        self.poll = (poll_ms if poll_ms is not None else CONFIG.CANDLE_DETECTOR_POLL_MS) / 1000.0
+        self.clock_offset = None # server time - local time, seconds
+        self.last_bar_time = None
+        self.last_close_local = None # local time at which the last detected bar opened on the server
+        self.polls = 0
+        self.detection_lags = deque(maxlen=history) # seconds from boundary to detection
+        self.signal_latencies = deque(maxlen=history) # seconds from boundary to signal
+        self._offset_samples = deque(maxlen=20)
+
+    def wait_for_close(self, idle=None):
+        """
+        Blocks until a new bar opens on the server; returns its open time (server epoch seconds).
+        `idle` runs periodically while waiting (see sleep_with_idle).
+        """
+        if self.last_bar_time is None:
+            self.last_bar_time = self._latest_bar_time()
+        if self.clock_offset is None:
+            self._estimate_offset()
+
+        expected = self._expected_next_open(self.last_bar_time)
+        if expected is not None and self.clock_offset is not None:
+            sleep_seconds = expected - self.clock_offset - self.lead - time.time()
+            if sleep_seconds > 5:
+                logging.info(f"Sleeping for {int(sleep_seconds)} seconds until shortly before the next {self.timeframe_str} close...")
+            if sleep_seconds > 0:
+                sleep_with_idle(sleep_seconds, idle)
+
+        interval = self.poll
+        while True:
+            bar_time = self._latest_bar_time()
+            self.polls += 1
+            if bar_time is not None and (self.last_bar_time is None or bar_time > self.last_bar_time):
+                break
+            local_now = time.time()
+            if expected is not None and self.clock_offset is not None and local_now < expected - self.clock_offset + 1.0:
+                interval = self.poll # Still around the expected boundary: keep polling fast
+            else:
+                interval = min(interval * 2, self.MAX_POLL_SECONDS)
+            sleep_with_idle(interval, idle)
+
+        detected = time.time()
+        # The lag is measured with the offset known before this detection; the new sample
+        # is a lower bound of the offset and would make every lag zero.
+        offset = self.clock_offset if self.clock_offset is not None else bar_time - detected
+        self.last_close_local = min(bar_time - offset, detected)
+        self.detection_lags.append(detected - self.last_close_local)
+        self._offset_samples.append(bar_time - detected)
+        self.clock_offset = max(self._offset_samples)
+        self.last_bar_time = bar_time
+        logging.debug(f"New {self.timeframe_str} bar {bar_time} detected {(detected - self.last_close_local) * 1000:.0f} ms after the close "
+                      f"(clock offset {self.clock_offset:.3f}s, {self.polls} polls so far).")
+        return bar_time
+
+    def record_signal(self):
+        """Records the close-to-signal latency of the current candle; returns it in seconds."""
+        if self.last_close_local is None:
+            return None
+        latency = time.time() - self.last_close_local
+        self.signal_latencies.append(latency)
+        return latency
+
+    def stats(self):
+        """Detection lag and close-to-signal latency percentiles in milliseconds."""
+        return {
+            'candles': len(self.detection_lags),
+            'polls': self.polls,
+            'clock_offset_s': self.clock_offset,
+            'detection_ms': _percentiles_ms(self.detection_lags),
+            'signal_ms': _percentiles_ms(self.signal_latencies),
+        }
+
+    def _latest_bar_time(self):
+        rates = mt5.copy_rates_from_pos(self.symbol, self.timeframe_mt5, 0, 1)
+        if rates is None or len(rates) == 0:
+            logging.debug(f"No latest bar for {self.symbol} on {self.timeframe_str}. Error: {mt5.last_error()}")
+            return None
+        return int(rates['time'][-1])
+
+    def _estimate_offset(self):
+        # Initial guess from the last tick (whole seconds); replaced once a bar close is observed
+        tick = mt5.symbol_info_tick(self.symbol)
+        if tick is not None and tick.time:
+            self.clock_offset = round(tick.time - time.time())
+
+    def _expected_next_open(self, bar_time):
+        if bar_time is None:
+            return None
+        duration = TIMEFRAME_DURATIONS_SECONDS.get(self.timeframe_str)
+        if self.timeframe_str == "MN1":
+            bar_open = datetime.datetime.fromtimestamp(bar_time, tz=datetime.timezone.utc)
+            return int(calculate_next_candle_open(bar_open, "MN1").timestamp())
+        return bar_time + duration if duration else None
+
+def _percentiles_ms(values):
+    if not values:
+        return {}
+    ordered = sorted(values)
+    return {'p50': percentile(ordered, 0.5) * 1000.0, 'p95': percentile(ordered, 0.95) * 1000.0,
+            'max': ordered[-1] * 1000.0}
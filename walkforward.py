@@ -0,0 +1,154 @@
+import argparse
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from .config import CONFIG
+from .backtest import load_ohlcv, summarize, daily_returns
+from .backtest_vectorized import run_vectorized, compute_indicators, strategy_params, check_param_keys, EXIT_NONE
+from .indicator_cache import IndicatorCache, DEFAULT_MAX_BYTES
+from .optimizer import grid, random_samples, parse_space
+from .sim_broker import make_symbol_info
+
+# Walk-forward optimization: every fold picks the best parameter set on an in-sample
+# window and trades it on the following out-of-sample window.
+#
+# Indicator series only depend on past bars, so they are computed once over the whole
+# dataset (through an IndicatorCache shared by all candidates and folds) and sliced
+# per window. That also gives each window fully warmed-up indicators from its first bar.
+
+def fold_bounds(n, in_sample_bars, out_sample_bars, step=None, anchored=False):
+    """
+    (in_start, in_end, out_end) index triples of consecutive folds over `n` bars.
+    Windows advance by `step` (default: the out-of-sample length); anchored folds
+    keep the in-sample window starting at bar 0.
+    """
+    step = step or out_sample_bars
+    folds = []
+    in_start = 0
+    in_end = in_sample_bars
+    while in_end + out_sample_bars <= n:
+        folds.append((0 if anchored else in_start, in_end, in_end + out_sample_bars))
+        in_start += step
+        in_end += step
+    return folds
+
+def _window(bars, columns, start, end):
+    return ({key: values[start:end] for key, values in bars.items()},
+            {key: values[start:end] for key, values in columns.items()})
+
+def walk_forward(bars, param_sets, in_sample_bars, out_sample_bars, step=None, anchored=False,
+                 metric='sharpe', symbol_info=None, initial_balance=10000.0, spread_points=None,
+                 cache=None, min_trades=1):
+    """
+    Runs the walk-forward over `bars` (see backtest.load_ohlcv) for the candidate
+    `param_sets`. The in-sample winner is the candidate with the highest `metric`
+    (lowest for max_drawdown) among those with at least `min_trades` trades.
+    Returns (folds DataFrame, combined out-of-sample stats).
+    """
+    param_sets = list(param_sets)
+    symbol_info = symbol_info or make_symbol_info(CONFIG.SYMBOL)
+    cache = cache if cache is not None else IndicatorCache()
+    folds = fold_bounds(len(bars['time']), in_sample_bars, out_sample_bars, step, anchored)
+    if not folds or not param_sets:
+        logging.warning("Walk-forward has no folds or no parameter sets to evaluate.")
+        return pd.DataFrame(), {}
+
+    started = time.perf_counter()
+    rows = []
+    oos_profits = []
+    oos_times = []
+    for number, (in_start, in_end, out_end) in enumerate(folds, start=1):
+        best = None
+        for params in param_sets:
+            full_params = strategy_params(params)
+            columns = compute_indicators(bars, full_params, cache)
+            window_bars, window_columns = _window(bars, columns, in_start, in_end)
+            stats = run_vectorized(window_bars, full_params, symbol_info, initial_balance, spread_points,
+                                   columns=window_columns).stats
+            if stats['trades'] < min_trades:
+                continue
+            score = -stats[metric] if metric == 'max_drawdown' else stats[metric]
+            if best is None or score > best[0]:
+                best = (score, params, stats)
+
+        if best is None:
+            logging.info(f"Fold {number}: no candidate reached {min_trades} in-sample trade(s). Skipping.")
+            continue
+
+        _, params, in_stats = best
+        full_params = strategy_params(params)
+        columns = compute_indicators(bars, full_params, cache)
+        window_bars, window_columns = _window(bars, columns, in_end, out_end)
+        result = run_vectorized(window_bars, full_params, symbol_info, initial_balance, spread_points,
+                                columns=window_columns)
+        closed = result.trades['exit_reason'] != EXIT_NONE
+        oos_profits.append(result.trades['profit'][closed])
+        oos_times.append(result.trades['exit_time'][closed])
+
+        row = {'fold': number, 'in_start': int(bars['time'][in_start]), 'in_end': int(bars['time'][in_end - 1]),
+               'out_end': int(bars['time'][out_end - 1])}
+        row.update(params)
+        row.update({f'is_{key}': value for key, value in in_stats.items()})
+        row.update({f'oos_{key}': value for key, value in result.stats.items()})
+        rows.append(row)
+        logging.info(f"Fold {number}: best {params} | IS {metric}={in_stats[metric]:.3f} | OOS net={result.stats['net_profit']:.2f}, {metric}={result.stats[metric]:.3f}")
+
+    profits = np.concatenate(oos_profits) if oos_profits else np.empty(0)
+    exit_times = np.concatenate(oos_times) if oos_times else np.empty(0, dtype=np.int64)
+    equity_curve = initial_balance + np.cumsum(profits)
+    combined = summarize(profits, np.concatenate(([initial_balance], equity_curve)),
+                         daily_returns(exit_times, equity_curve, initial_balance), initial_balance)
+    cache_stats = cache.stats()
+    logging.info(f"Walk-forward: {len(folds)} folds x {len(param_sets)} candidates in {time.perf_counter() - started:.2f}s. "
+                 f"Indicator cache: {cache_stats['misses']} computed, {cache_stats['hits']} reused, {cache_stats['evictions']} evicted.")
+    return pd.DataFrame(rows), combined
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Walk-forward optimization over the vectorized backtest.")
+    parser.add_argument('data', help="CSV or Parquet file with time, open, high, low, close columns")
+    parser.add_argument('--param', action='append', default=[], metavar='KEY=v1,v2|low:high',
+                        help="Search dimension, e.g. --param SMA_FAST_LENGTH=3,5,8")
+    parser.add_argument('--random', type=int, default=0, help="Sample this many random sets instead of the full grid")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--in-sample', type=int, required=True, help="In-sample window length in bars")
+    parser.add_argument('--out-sample', type=int, required=True, help="Out-of-sample window length in bars")
+    parser.add_argument('--step', type=int, default=None, help="Bars between folds (default: out-of-sample length)")
+    parser.add_argument('--anchored', action='store_true', help="Keep every in-sample window starting at the first bar")
+    parser.add_argument('--metric', default='sharpe', choices=('sharpe', 'net_profit', 'profit_factor', 'max_drawdown'))
+    parser.add_argument('--min-trades', type=int, default=1)
+    parser.add_argument('--cache-mb', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024))
+    parser.add_argument('--symbol', default=CONFIG.SYMBOL)
+    parser.add_argument('--balance', type=float, default=10000.0)
+    parser.add_argument('--spread', type=int, default=0, help="Spread in points")
+    parser.add_argument('--sep', default=',', help="CSV separator")
+    parser.add_argument('--out', default=None, help="Write the per-fold results to this CSV file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s | %(levelname)s | %(message)s')
+    space = parse_space(args.param)
+    try:
+        check_param_keys(space)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.random:
+        param_sets = random_samples(space, args.random, args.seed)
+    elif any(isinstance(values, tuple) for values in space.values()):
+        parser.error("Range dimensions (low:high) need --random.")
+    else:
+        param_sets = list(grid(space))
+
+    bars = load_ohlcv(args.data, sep=args.sep)
+    folds, combined = walk_forward(bars, param_sets, args.in_sample, args.out_sample, args.step, args.anchored,
+                                   args.metric, make_symbol_info(args.symbol), args.balance, args.spread,
+                                   IndicatorCache(args.cache_mb * 1024 * 1024), args.min_trades)
+    with pd.option_context('display.width', 200, 'display.max_columns', 40):
+        print(folds.to_string(index=False))
+    print(f"Out-of-sample: {combined}")
+    if args.out:
+        folds.to_csv(args.out, index=False)
+
+if __name__ == "__main__":
+    main()